@@ -0,0 +1,288 @@
+import asyncio
+import itertools
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+import yaml
+from numba import njit
+
+from benchmarks.exchange import ExchangeStub
+from benchmarks.synthetic import make_ohlcv, make_signals
+from src.app.analyser.analyser import TradingAnalyser
+from src.app.backtester.combination_generation import BatchIterator, ParamCombinationsGenerator
+from src.app.backtester.engine import MultiParamPortfolioBacktest
+from src.app.backtester.risk_managment import _get_exits
+from src.app.data.csv_handler import DataHandler
+from src.app.data.downloader import BinanceDataDownloader
+from src.app.data.types import COLUMNS_RESULT
+from src.app.indicators import standart, aroon
+from src.app.models import BackTestResult, EntryExitResult, MainConfig
+from src.app.strategies.registry import register_indicator
+from src.app.utils.helpers import product_multiindex
+
+REPO_DIR = Path(__file__).resolve().parents[1]
+BENCH_STRATEGY = 'bench_cross'
+INDICATOR_LENGTH = 50
+BATCH_ITERATOR_WINDOW = 10_000  # ordinals walked per batch_iterator case
+DOWNLOAD_LATENCY = 0.02  # seconds per stand-in response
+# stand-in weight per 1 s window, downloader weight_limit, share of 503: 'over_limit' runs into 429 + Retry-After
+DOWNLOAD_LIMITS = {'free': (100_000, 90_000, 0.0), 'throttled': (40, 36, 0.05), 'over_limit': (40, 80, 0.0)}
+
+
+@register_indicator(BENCH_STRATEGY)
+@njit
+def bench_cross(close: np.ndarray, fast_len: int = 10, slow_len: int = 30):
+    fast = standart.ema(close, fast_len)
+    slow = standart.ema(close, slow_len)
+    return standart.crossover(fast, slow), standart.crossunder(fast, slow)
+
+
+BENCH_PARAMS = {'settings': {'flag_forbidden': False},
+                'multi': {'fast_len': {'min': 2, 'max': 201, 'step': 1},
+                          'slow_len': {'min': 20, 'max': 219, 'step': 1}},
+                'single': {'fast_len': 10, 'slow_len': 30}}
+
+INDICATORS: Dict[str, Callable] = {
+    'sma': lambda d: standart.sma(d['close'], INDICATOR_LENGTH),
+    'ema': lambda d: standart.ema(d['close'], INDICATOR_LENGTH),
+    'wma': lambda d: standart.wma(d['close'], INDICATOR_LENGTH),
+    'rma': lambda d: standart.rma(d['close'], INDICATOR_LENGTH),
+    'vwma': lambda d: standart.vwma(d['close'], d['volume'], INDICATOR_LENGTH),
+    'atr': lambda d: standart.atr(d['high'], d['low'], d['close'], INDICATOR_LENGTH),
+    'roc': lambda d: standart.roc_calc(d['close'], INDICATOR_LENGTH),
+    'highest': lambda d: standart.highest(d['high'], INDICATOR_LENGTH),
+    'lowest': lambda d: standart.lowest(d['low'], INDICATOR_LENGTH),
+    'crossover': lambda d: standart.crossover(d['close'], d['open']),
+    'zero_lag': lambda d: aroon.zero_lag(d['close'], INDICATOR_LENGTH, 50),
+    'aroon_oscillator': lambda d: aroon.aroon_oscillator(d['high'], d['low'], INDICATOR_LENGTH, 10, 50),
+    'sig_line': lambda d: aroon.get_sig_line(d['close'], d['close'], INDICATOR_LENGTH),
+}
+
+
+@dataclass
+class Case:
+    '''run() is timed; work / seconds is the throughput in unit per second'''
+    name: str
+    params: Dict[str, Any]
+    run: Callable[[], Any]
+    work: int
+    unit: str
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}[{','.join(f'{k}={v}' for k, v in self.params.items())}]"
+
+
+@dataclass
+class Sweep:
+    bars: List[int]
+    combos: List[int]
+    stops: List[int]  # target size of the TP/SL grid, the closest square n x n is used
+    volatility: float = 0.01
+    gap_share: float = 0.0
+    seed: int = 0
+    symbols: int = 4
+
+
+def write_strategy_config():
+    '''Cases run in a scratch working directory: config/ and data/ are relative there'''
+    Path('config').mkdir(exist_ok=True)
+    with open(f'config/{BENCH_STRATEGY}_strategy_config.yaml', 'w') as f:
+        yaml.safe_dump(BENCH_PARAMS, f, sort_keys=False)
+
+
+def make_config(engine: str = 'numba', stops: int = 1, signals: str = 'vectorbt') -> MainConfig:
+    with open(REPO_DIR / 'config' / 'config.yaml') as f:
+        data = yaml.safe_load(f)
+    data['strategy']['name'] = BENCH_STRATEGY
+    data['strategy']['size'].update(use_fast=True, use_only_tp_sl=True, trailing=False, break_even=False)
+    axis = max(int(round(stops ** 0.5)), 1)
+    for key in ('tp_pct', 'sl_pct'):
+        data['strategy']['size'][key].update(use_fix=axis == 1, fix=0.03, min=0.01, max=round(0.01 * axis, 4), step=0.01)
+    data['processor'].update(engine=engine, signals=signals, telemetry=False, memory_budget_mb=None)
+    return MainConfig(**data)
+
+
+def _arrays(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    return {column.lower(): df[column].values.astype(np.float64) for column in df.columns}
+
+
+def _entry_exits(bt: MultiParamPortfolioBacktest, df: pd.DataFrame, n_combos: int) -> EntryExitResult:
+    params = bt.params_comb.get_space().take(np.arange(n_combos))
+    return bt._get_entries_and_exists(params, **{column.lower(): df[column].values for column in df.columns})
+
+
+def _copy(entry_exits: EntryExitResult) -> EntryExitResult:
+    return EntryExitResult(long_entries=entry_exits.long_entries.copy(), short_entries=entry_exits.short_entries.copy())
+
+
+def _fake_result(ticker: str, n_combos: int, stops: int, seed: int) -> BackTestResult:
+    bt = MultiParamPortfolioBacktest(make_config(stops=stops))
+    params = bt.params_comb.get_space().take(np.arange(n_combos))
+    columns = pd.MultiIndex.from_arrays([params[name] for name in params],
+                                        names=[f'{BENCH_STRATEGY}_{name}' for name in params])
+    index = product_multiindex(columns, bt.config.strategy.size.get_combinations())
+    rng = np.random.default_rng(seed)
+    result = pd.DataFrame({COLUMNS_RESULT[0]: rng.integers(0, 500, len(index)),
+                           COLUMNS_RESULT[1]: rng.random(len(index)) * 100,
+                           COLUMNS_RESULT[2]: rng.normal(0, 50, len(index))}, index=index)
+    return BackTestResult(ticker=ticker, result=result)
+
+
+def indicator_cases(sweep: Sweep) -> Iterator[Case]:
+    for bars in sweep.bars:
+        data = _arrays(make_ohlcv(bars, sweep.volatility, sweep.gap_share, sweep.seed))
+        for name, func in INDICATORS.items():
+            yield Case(f'indicator.{name}', {'bars': bars}, lambda func=func, data=data: func(data), bars, 'bars')
+
+
+def exits_cases(sweep: Sweep) -> Iterator[Case]:
+    for bars, combos in itertools.product(sweep.bars, sweep.combos):
+        data = _arrays(make_ohlcv(bars, sweep.volatility, sweep.gap_share, sweep.seed))
+        long_entries, short_entries = make_signals(bars, combos, seed=sweep.seed)
+        kwargs = dict(close=data['close'], high=data['high'], low=data['low'],
+                      long_entries=long_entries, short_entries=short_entries,
+                      tp_pct=np.array([0.03]), sl_pct=np.array([0.03]))
+        yield Case('exits', {'bars': bars, 'combos': combos}, lambda kwargs=kwargs: _get_exits(**kwargs), combos, 'combos')
+
+
+def signals_cases(sweep: Sweep) -> Iterator[Case]:
+    '''IndicatorFactory.run vs the compiled batch driver, signals only'''
+    for bars, combos in itertools.product(sweep.bars, sweep.combos):
+        df = make_ohlcv(bars, sweep.volatility, sweep.gap_share, sweep.seed)
+        for signals in ('vectorbt', 'kernel'):
+            bt = MultiParamPortfolioBacktest(make_config(signals=signals))
+            params = bt.params_comb.get_space().take(np.arange(combos))
+            inputs = {column.lower(): df[column].values for column in df.columns}
+            yield Case(f'signals.{signals}', {'bars': bars, 'combos': combos},
+                       lambda bt=bt, params=params, inputs=inputs: bt._get_entries_and_exists(params, **inputs),
+                       combos, 'combos')
+
+
+def grid_cases(sweep: Sweep) -> Iterator[Case]:
+    '''_get_tp_sl and both portfolio engines over bars x combos x stop grid'''
+    for bars, combos, stops in itertools.product(sweep.bars, sweep.combos, sweep.stops):
+        df = make_ohlcv(bars, sweep.volatility, sweep.gap_share, sweep.seed)
+        bt_vbt = MultiParamPortfolioBacktest(make_config('vectorbt', stops))
+        bt_nb = MultiParamPortfolioBacktest(make_config('numba', stops))
+        n_stops = len(bt_nb.config.strategy.size.get_combinations())
+        params = {'bars': bars, 'combos': combos, 'stops': n_stops}
+        entry_exits = _entry_exits(bt_nb, df, combos)
+        columns = combos * n_stops
+
+        yield Case('tp_sl_expand', params, lambda bt=bt_vbt, ee=entry_exits: bt._get_tp_sl(_copy(ee)), columns, 'columns')
+        expanded, tp_sl = bt_vbt._get_tp_sl(_copy(entry_exits))
+        yield Case('portfolio.vectorbt', params,
+                   lambda bt=bt_vbt, df=df, ee=expanded, tp_sl=tp_sl: bt.run_portfolio(df, ee, tp_sl), columns, 'columns')
+        yield Case('portfolio.numba', params,
+                   lambda bt=bt_nb, df=df, ee=entry_exits: bt.run_portfolio_grid(df, ee), columns, 'columns')
+
+
+def batch_iterator_cases(sweep: Sweep) -> Iterator[Case]:
+    space = ParamCombinationsGenerator(MultiParamPortfolioBacktest(make_config()).params).get_space()
+    stop = min(space.size, BATCH_ITERATOR_WINDOW)
+    done = np.arange(0, stop, 3)  # a resumed run: every third combination is already stored
+
+    def run(batch_size: int) -> int:
+        return sum(len(batch['fast_len']) for batch in BatchIterator(space, batch_size, done, 0, stop))
+
+    for batch_size in sorted({max(min(combos, stop), 1) for combos in sweep.combos}):
+        yield Case('batch_iterator', {'batch_size': batch_size, 'window': stop},
+                   lambda batch_size=batch_size: run(batch_size), stop - len(done), 'combos')
+
+
+async def _download(stub: ExchangeStub, config: MainConfig, weight_limit: int):
+    url = await stub.start()
+    try:
+        config.download.base_url = url
+        config.download.weight_limit = weight_limit
+        async with BinanceDataDownloader(config) as downloader:
+            await downloader.download_multiple_symbols()
+    finally:
+        await stub.stop()
+
+
+def download_cases(sweep: Sweep) -> Iterator[Case]:
+    '''BinanceDataDownloader against the local stand-in: every run starts with an empty raw store'''
+    for bars, (mode, limits) in itertools.product(sweep.bars, DOWNLOAD_LIMITS.items()):
+        config = make_config()
+        config.strategy.symbols.use_all = True
+        config.strategy.time.timeframe = '1m'
+        config.strategy.time.start_date = pd.Timestamp('2025-01-01').to_pydatetime()
+        config.strategy.time.end_date = (pd.Timestamp('2025-01-01') + pd.Timedelta(minutes=bars - 1)).to_pydatetime()
+        config.download.weight_window = 1.0
+        config.download.backoff = 0.05
+        extra: Dict[str, Any] = {}
+
+        def run(config=config, limits=limits, extra=extra):
+            stub_limit, weight_limit, error_rate = limits
+            shutil.rmtree('data/raw', ignore_errors=True)
+            stub = ExchangeStub(n_symbols=sweep.symbols, latency=DOWNLOAD_LATENCY, weight_limit=stub_limit,
+                                window=1.0, error_rate=error_rate, seed=sweep.seed)
+            asyncio.run(_download(stub, config, weight_limit))
+            extra.update(stub.stats)
+
+        yield Case('download', {'bars': bars, 'symbols': sweep.symbols, 'limits': mode}, run,
+                   bars * sweep.symbols, 'klines', extra)
+
+
+def resample_cases(sweep: Sweep) -> Iterator[Case]:
+    '''get_or_empty_df of a 1h timeframe over a 1m base store: cold rebuilds the resample cache, warm reads it'''
+    for bars, cache in itertools.product(sweep.bars, ['cold', 'warm']):
+        config = make_config()
+        config.strategy.time.timeframe = '1h'
+        config.strategy.time.base_timeframe = '1m'
+        data_handler = DataHandler(config)
+        shutil.rmtree(data_handler.get_raw_store().folder, ignore_errors=True)
+        data_handler.get_raw_store().write('RESAMPLE', make_ohlcv(bars * 60, seed=sweep.seed, freq='1min'))
+        store = data_handler.get_bar_store()
+        store.read_records('RESAMPLE')  # compiles the kernel
+
+        def run(data_handler=data_handler, store=store, cold=cache == 'cold'):
+            if cold:
+                store._get_filepaths('RESAMPLE')[1].unlink(missing_ok=True)
+            data_handler.get_or_empty_df('RESAMPLE')
+
+        yield Case('resample', {'bars': bars, 'cache': cache}, run, bars, 'bars')
+
+
+def save_result_cases(sweep: Sweep) -> Iterator[Case]:
+    data_handler = DataHandler(make_config())
+    for combos, stops in itertools.product(sweep.combos, sweep.stops):
+        result = _fake_result('SAVE', combos, stops, sweep.seed)
+        extra: Dict[str, Any] = {}
+        yield Case('save_result', {'combos': combos, 'stops': stops},
+                   lambda result=result, extra=extra: extra.update(bytes=data_handler.save_result(result)),
+                   len(result.result), 'rows', extra)
+
+
+def analyser_cases(sweep: Sweep) -> Iterator[Case]:
+    config = make_config()
+    data_handler = DataHandler(config)
+    combos = max(sweep.combos)
+    stops = max(sweep.stops)
+    n_rows = 0
+    for idx in range(sweep.symbols):
+        result = _fake_result(f'SYM{idx}USDT', combos, stops, sweep.seed + idx)
+        data_handler.save_result(result)
+        n_rows += len(result.result)
+    yield Case('analyser', {'symbols': sweep.symbols, 'combos': combos, 'stops': stops},
+               lambda: TradingAnalyser(config).start_analysis(), n_rows, 'rows')
+
+
+SUITES: Dict[str, Callable[[Sweep], Iterator[Case]]] = {
+    'indicators': indicator_cases,
+    'exits': exits_cases,
+    'signals': signals_cases,
+    'grid': grid_cases,
+    'batch_iterator': batch_iterator_cases,
+    'save_result': save_result_cases,
+    'download': download_cases,
+    'resample': resample_cases,
+    'analyser': analyser_cases,
+}
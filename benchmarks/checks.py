@@ -0,0 +1,172 @@
+'''
+Correctness checks on seeded synthetic data, the counterpart of the timings in benchmarks.run.
+
+    python -m benchmarks.checks                 # all checks
+    python -m benchmarks.checks --check window
+
+Every check runs in its own scratch directory and raises AssertionError on a mismatch;
+the exit code is the number of failed checks.
+'''
+import argparse
+import io
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Callable, Dict
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.cases import make_config, write_strategy_config
+from benchmarks.synthetic import make_ohlcv
+from src.app.backtester.engine import MultiParamPortfolioBacktest
+from src.app.data.archives import ArchiveIngestor
+from src.app.data.csv_handler import DataHandler
+from src.app.data.raw_store import RawStore, to_ms
+from src.app.data.resample import resample_records
+from src.app.data.shared_data import SharedDataStore, load_shared_df
+from src.app.data.types import COLUMNS_RESULT
+from src.app.models import BackTestData
+from src.common.loggers import console
+
+WINDOW_SYMBOL = 'WINDOWUSDT'
+HISTORY_BARS = 2 * 365 * 24  # two years of 1h archives in the raw store
+WINDOW = ('2025-03-01', '2025-04-01')
+ENGINE_BARS = 5_000
+ENGINE_COMBOS = 40
+ENGINE_STOPS = 25  # 5 x 5 TP/SL grid
+ENGINE_RTOL = 1e-8  # win rate and return: the kernel and vbt sum the same trades in a different order
+RESAMPLE_SYMBOL = 'RESAMPLEUSDT'
+RESAMPLE_READERS = 4  # processes building the same resample cache at once
+
+
+def _write_archives(df: pd.DataFrame, folder: Path, symbol: str, interval: str):
+    '''One monthly data.binance.vision style archive (headerless CSV, ms open times) per month of df'''
+    folder.mkdir(parents=True, exist_ok=True)
+    for month, part in df.groupby(df.index.to_period('M')):
+        name = f'{symbol}-{interval}-{month}'
+        csv = pd.DataFrame({'open_time': part.index.map(to_ms), **{column: part[column] for column in part.columns}})
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr(f'{name}.csv', csv.to_csv(header=False, index=False))
+        (folder / f'{name}.zip').write_bytes(buffer.getvalue())
+
+
+def _assert_window(df: pd.DataFrame, expected: pd.DataFrame, where: str):
+    assert df is not None and not df.empty, f'{where}: nothing read'
+    assert df.index[0] >= expected.index[0] and df.index[-1] <= expected.index[-1], \
+        f'{where}: bars outside the window, {df.index[0]} .. {df.index[-1]}'
+    assert len(df) == len(expected), f'{where}: {len(df)} bars instead of {len(expected)}'
+    np.testing.assert_array_equal(df.values, expected.values, err_msg=where)
+
+
+def check_window():
+    '''Years of ingested archives, the backtest reads only the bars of strategy.time'''
+    config = make_config()
+    config.strategy.time.timeframe = '1h'
+    config.strategy.time.start_date, config.strategy.time.end_date = (pd.Timestamp(day).to_pydatetime()
+                                                                      for day in WINDOW)
+    history = make_ohlcv(HISTORY_BARS, freq='1h', start='2024-01-01')
+    _write_archives(history, Path('archives'), WINDOW_SYMBOL, '1h')
+    ArchiveIngestor(config).ingest(Path('archives'))
+    expected = history.loc[pd.Timestamp(WINDOW[0]):pd.Timestamp(WINDOW[1])]
+
+    bt = MultiParamPortfolioBacktest(config, [WINDOW_SYMBOL])
+    _assert_window(bt.data_handler.get_df_with_datetime(WINDOW_SYMBOL, *config.get_date()), expected,
+                   'get_df_with_datetime')
+    _assert_window(bt.get_df(WINDOW_SYMBOL), expected, 'worker read')
+    with SharedDataStore(bt.data_handler) as store:
+        shared = store.load([WINDOW_SYMBOL])
+        _assert_window(load_shared_df(shared, WINDOW_SYMBOL), expected, 'shared read')
+
+
+def _run_engine(engine: str, use_only_tp_sl: bool, df: pd.DataFrame) -> pd.DataFrame:
+    config = make_config(engine, ENGINE_STOPS)
+    config.strategy.size.use_only_tp_sl = use_only_tp_sl
+    bt = MultiParamPortfolioBacktest(config)
+    data = BackTestData(ticker='ENGINES', df=df)
+    bt.prepare_symbol(data)
+    params = bt.params_comb.get_space().take(np.arange(ENGINE_COMBOS))
+    return bt.get_result_from_backtest(data, params).result[COLUMNS_RESULT].sort_index()
+
+
+def check_engines():
+    '''Numba grid kernel against vbt.Portfolio: same rows, same trades, metrics within ENGINE_RTOL'''
+    df = make_ohlcv(ENGINE_BARS, volatility=0.02, seed=1)
+    for use_only_tp_sl in (True, False):
+        where = f'use_only_tp_sl={use_only_tp_sl}'
+        expected = _run_engine('vectorbt', use_only_tp_sl, df)
+        result = _run_engine('numba', use_only_tp_sl, df)
+        assert result.index.equals(expected.index), f'{where}: rows differ'
+        np.testing.assert_array_equal(result[COLUMNS_RESULT[0]].values, expected[COLUMNS_RESULT[0]].values,
+                                      err_msg=f'{where}: {COLUMNS_RESULT[0]}')
+        for column in COLUMNS_RESULT[1:]:
+            np.testing.assert_allclose(result[column].values.astype(float), expected[column].values.astype(float),
+                                       rtol=ENGINE_RTOL, atol=ENGINE_RTOL, err_msg=f'{where}: {column}')
+
+
+def _resample_config():
+    config = make_config()
+    config.strategy.time.timeframe = '1h'
+    config.strategy.time.base_timeframe = '1m'
+    config.strategy.time.start_date, config.strategy.time.end_date = (pd.Timestamp(day).to_pydatetime()
+                                                                      for day in WINDOW)
+    return config
+
+
+def _read_resampled(_) -> np.ndarray:
+    config = _resample_config()
+    return DataHandler(config).get_bar_store().read_records(RESAMPLE_SYMBOL, *map(to_ms, config.get_date())).copy()
+
+
+def check_resample():
+    '''Processes reading the same 1m base at once all get the window of one resample build'''
+    base = RawStore.df_to_records(make_ohlcv(60 * 24 * 90, freq='1min', start='2025-02-01'))
+    DataHandler(_resample_config()).get_raw_store().write_records(RESAMPLE_SYMBOL, base)
+    expected = resample_records(base, 60 * 60 * 1000)
+    expected = expected[(expected['time'] >= to_ms(WINDOW[0])) & (expected['time'] <= to_ms(WINDOW[1]))]
+    with mp.get_context('spawn').Pool(RESAMPLE_READERS) as pool:
+        results = pool.map(_read_resampled, range(RESAMPLE_READERS))
+    for records in results:
+        np.testing.assert_array_equal(records, expected)
+    leftovers = [path.name for path in Path(DataHandler.FOLDER_PATH['resampled']).rglob('*.tmp')]
+    assert not leftovers, f'temporary files left: {leftovers}'
+
+
+CHECKS: Dict[str, Callable[[], None]] = {
+    'window': check_window,
+    'resample': check_resample,
+    'engines': check_engines,
+}
+
+
+def run_checks(names) -> int:
+    failed = 0
+    cwd = os.getcwd()
+    for name in names:
+        with tempfile.TemporaryDirectory(prefix=f'check_{name}_') as workdir:
+            os.chdir(workdir)
+            try:
+                write_strategy_config()
+                CHECKS[name]()
+                console.print(f'{name:<20} ok', markup=False)
+            except AssertionError as e:
+                failed += 1
+                console.print(f'{name:<20} FAILED: {e}', markup=False, soft_wrap=True)
+            finally:
+                os.chdir(cwd)
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Correctness checks on synthetic OHLCV')
+    parser.add_argument('--check', action='append', choices=list(CHECKS), help='default: all checks')
+    args = parser.parse_args()
+    sys.exit(run_checks(args.check or list(CHECKS)))
+
+
+if __name__ == '__main__':
+    main()
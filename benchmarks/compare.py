@@ -0,0 +1,66 @@
+import argparse
+import json
+import sys
+from typing import Dict, List
+
+from rich.markup import escape
+from rich.table import Table
+
+from src.common.loggers import console
+
+DEFAULT_THRESHOLD = 0.1  # throughput drop (share of the baseline) reported as a regression
+
+
+def load_results(path: str) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline: Dict, current: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    '''One row per case present in both runs; ratio = current / baseline throughput'''
+    old = {result['key']: result for result in baseline['results']}
+    rows = []
+    for result in current['results']:
+        base = old.get(result['key'])
+        if base is None or not base['throughput']:
+            continue
+        ratio = result['throughput'] / base['throughput']
+        rows.append({'key': result['key'], 'unit': result['unit'], 'baseline': base['throughput'],
+                     'current': result['throughput'], 'ratio': ratio, 'regression': ratio < 1 - threshold})
+    return rows
+
+
+def get_compare_table(rows: List[Dict], baseline: Dict, current: Dict) -> Table:
+    table = Table(title=f"{baseline['meta'].get('commit')} -> {current['meta'].get('commit')}")
+    for column in ('Case', 'Unit/s', 'Baseline', 'Current', 'Ratio'):
+        table.add_column(column, justify='left' if column in ('Case', 'Unit/s') else 'right')
+    for row in rows:
+        style = 'red' if row['regression'] else ('green' if row['ratio'] > 1 else None)
+        table.add_row(escape(row['key']), row['unit'], f"{row['baseline']:,.1f}", f"{row['current']:,.1f}",
+                      f"{row['ratio']:.2f}x", style=style)
+    return table
+
+
+def report(baseline: Dict, current: Dict, threshold: float = DEFAULT_THRESHOLD) -> int:
+    '''Print the comparison, return the number of regressions'''
+    rows = compare(baseline, current, threshold)
+    console.print(get_compare_table(rows, baseline, current))
+    regressions = [row for row in rows if row['regression']]
+    if regressions:
+        console.print(f'[red]{len(regressions)} of {len(rows)} cases are slower than {1 - threshold:.0%} of the baseline[/red]')
+    else:
+        console.print(f'[green]No regressions beyond {threshold:.0%} in {len(rows)} cases[/green]')
+    return len(regressions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark runs')
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+    sys.exit(1 if report(load_results(args.baseline), load_results(args.current), args.threshold) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+'''
+Local stand-in of the Binance futures REST endpoints the downloader uses, for offline tests and benchmarks.
+
+    python -m benchmarks.exchange --symbols 50 --latency 0.05 --weight-limit 2400
+    python -m benchmarks.exchange --recorded data/raw/1m          # serve a raw store instead of synthetic klines
+    # config.yaml: download.base_url: http://127.0.0.1:8765
+
+/fapi/v1/exchangeInfo lists the symbols, /fapi/v1/klines serves deterministic klines: a symbol returns the same bars
+however the range is split into requests. Request weight is counted per window as the exchange does,
+a request over the limit gets 429 with Retry-After.
+'''
+import argparse
+import asyncio
+import math
+import time
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from aiohttp import web
+
+from benchmarks.synthetic import make_ohlcv
+from src.app.data.downloader import EXCHANGE_INFO_PATH, EXCHANGE_INFO_WEIGHT, KLINES_PATH
+from src.app.data.rate_limit import USED_WEIGHT_HEADER, kline_weight
+from src.app.data.raw_store import RAW_DTYPE, RawStore, timeframe_to_ms
+from src.app.data.types import COLUMNS_RAW
+
+BLOCK_BARS = 10_000  # synthetic klines are generated (and cached) in blocks of this many bars
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 1500
+
+
+@lru_cache(maxsize=256)
+def _synthetic_block(symbol: str, step: int, block: int, gap_share: float) -> np.ndarray:
+    seed = zlib.crc32(f'{symbol}:{step}:{block}'.encode())
+    price = 10.0 + seed % 1000
+    df = make_ohlcv(BLOCK_BARS, gap_share=gap_share, seed=seed, freq=f'{step}ms',
+                    start=np.datetime64(block * BLOCK_BARS * step, 'ms'), price=price)
+    return RawStore.df_to_records(df)
+
+
+class ExchangeStub:
+    def __init__(self, symbols: Optional[List[str]] = None, n_symbols: int = 10, latency: float = 0.0,
+                 jitter: float = 0.0, weight_limit: int = 2400, window: float = 60.0, error_rate: float = 0.0,
+                 gap_share: float = 0.0, recorded: Optional[str] = None, seed: int = 0):
+        self.recorded = RawStore(Path(recorded), Path(recorded).name) if recorded else None
+        if symbols is None:
+            symbols = (sorted(path.stem for path in Path(recorded).glob('*.bin')) if recorded
+                       else [f'SYM{idx}USDT' for idx in range(n_symbols)])
+        self.symbols = symbols
+        self.latency = latency
+        self.jitter = jitter
+        self.weight_limit = weight_limit
+        self.window = window
+        self.error_rate = error_rate
+        self.gap_share = gap_share
+        self.rng = np.random.default_rng(seed)
+        self.used = 0
+        self.window_start = 0.0
+        self.stats: Dict[str, int] = {'requests': 0, 'rejected': 0, 'errors': 0, 'klines': 0, 'max_used': 0}
+        self._runner: Optional[web.AppRunner] = None
+
+    def _take_weight(self, weight: int) -> Optional[float]:
+        '''None when admitted, otherwise seconds until the window resets'''
+        now = time.time()
+        window_start = now - now % self.window
+        if window_start != self.window_start:
+            self.window_start, self.used = window_start, 0
+        if self.used + weight > self.weight_limit:
+            return window_start + self.window - now
+        self.used += weight
+        self.stats['max_used'] = max(self.stats['max_used'], self.used)
+        return None
+
+    async def _handle(self, request: web.Request, weight: int) -> Optional[web.Response]:
+        '''Latency, injected 5xx and the weight limit; None when the request may be served'''
+        self.stats['requests'] += 1
+        await asyncio.sleep(self.latency + self.jitter * self.rng.random())
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.stats['errors'] += 1
+            return web.json_response({'code': -1001, 'msg': 'Internal error'}, status=503)
+        retry_after = self._take_weight(weight)
+        if retry_after is not None:
+            self.stats['rejected'] += 1
+            return web.json_response({'code': -1003, 'msg': 'Too many requests'}, status=429,
+                                     headers={'Retry-After': str(math.ceil(retry_after)),
+                                              USED_WEIGHT_HEADER: str(self.used)})
+        return None
+
+    def get_records(self, symbol: str, step: int, start: int, end: int, limit: int) -> np.ndarray:
+        '''Klines with start <= open time <= end, at most limit'''
+        if self.recorded is not None:
+            return np.asarray(self.recorded.read_records(symbol, start, end)[:limit])
+        blocks = []
+        n = 0
+        for block in range(max(start, 0) // (step * BLOCK_BARS), end // (step * BLOCK_BARS) + 1):
+            records = _synthetic_block(symbol, step, block, self.gap_share)
+            records = records[(records['time'] >= start) & (records['time'] <= end)]
+            blocks.append(records)
+            n += len(records)
+            if n >= limit:
+                break
+        return np.concatenate(blocks)[:limit] if blocks else np.empty(0, dtype=RAW_DTYPE)
+
+    async def exchange_info(self, request: web.Request) -> web.Response:
+        error = await self._handle(request, EXCHANGE_INFO_WEIGHT)
+        if error is not None:
+            return error
+        return web.json_response({'symbols': [{'symbol': symbol, 'status': 'TRADING', 'quoteAsset': 'USDT'}
+                                              for symbol in self.symbols]})
+
+    async def klines(self, request: web.Request) -> web.Response:
+        query = request.query
+        limit = min(int(query.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        error = await self._handle(request, kline_weight(limit))
+        if error is not None:
+            return error
+        step = timeframe_to_ms(query.get('interval', ''))
+        if query.get('symbol') not in self.symbols or step is None:
+            return web.json_response({'code': -1121, 'msg': 'Invalid symbol or interval.'}, status=400)
+        end = int(query.get('endTime', time.time() * 1000))
+        start = int(query.get('startTime', end - (limit - 1) * step))
+        records = self.get_records(query['symbol'], step, start, end, limit)
+        self.stats['klines'] += len(records)
+        times = records['time'].tolist()
+        values = [records[column].astype(str).tolist() for column in COLUMNS_RAW[1:]]
+        rows = [[t, o, h, l, c, v, t + step - 1, '0', 0, '0', '0', '0'] for t, o, h, l, c, v in zip(times, *values)]
+        return web.json_response(rows, headers={USED_WEIGHT_HEADER: str(self.used)})
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get(EXCHANGE_INFO_PATH, self.exchange_info)
+        app.router.add_get(KLINES_PATH, self.klines)
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        '''Serve in the running loop, port 0 picks a free one; returns the base URL for download.base_url'''
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        host, port = site._server.sockets[0].getsockname()[:2]
+        return f'http://{host}:{port}'
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in of the Binance futures klines API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--symbols', type=int, default=10, help='number of synthetic symbols')
+    parser.add_argument('--recorded', help='raw store folder (data/raw/<timeframe>) to serve instead')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='up to this many seconds more, uniform')
+    parser.add_argument('--weight-limit', type=int, default=2400)
+    parser.add_argument('--window', type=float, default=60.0, help='seconds the weight limit is counted over')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with 503')
+    parser.add_argument('--gap-share', type=float, default=0.0, help='share of synthetic bars missing')
+    args = parser.parse_args()
+    stub = ExchangeStub(n_symbols=args.symbols, latency=args.latency, jitter=args.jitter,
+                        weight_limit=args.weight_limit, window=args.window, error_rate=args.error_rate,
+                        gap_share=args.gap_share, recorded=args.recorded)
+    web.run_app(stub.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
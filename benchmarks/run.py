@@ -0,0 +1,124 @@
+'''
+Offline benchmarks of the backtest pipeline on seeded synthetic OHLCV.
+
+    python -m benchmarks.run                                   # full sweep -> benchmarks/results/<commit>.json
+    python -m benchmarks.run --quick --suite grid --suite exits
+    python -m benchmarks.run --baseline benchmarks/results/<commit>.json --threshold 0.15
+    python -m benchmarks.compare <old>.json <new>.json
+
+Every case is run once to compile numba, then timed --repeat times; the best time is kept.
+'''
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numba
+import numpy as np
+import pandas as pd
+import vectorbt as vbt
+
+from benchmarks.cases import REPO_DIR, SUITES, Case, Sweep, write_strategy_config
+from benchmarks.compare import DEFAULT_THRESHOLD, load_results, report
+from src.common.loggers import console
+
+RESULTS_DIR = REPO_DIR / 'benchmarks' / 'results'
+FULL_SWEEP = Sweep(bars=[2_000, 10_000, 50_000], combos=[10, 100], stops=[1, 9, 25])
+QUICK_SWEEP = Sweep(bars=[1_000, 5_000], combos=[10, 50], stops=[1, 9])
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(['git', *args], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_meta(sweep: Sweep, repeat: int) -> Dict:
+    return {'commit': _git('rev-parse', '--short', 'HEAD'),
+            'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'numba': numba.__version__,
+            'vectorbt': vbt.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'numba_threads': numba.config.NUMBA_NUM_THREADS,
+            'repeat': repeat,
+            'sweep': vars(sweep)}
+
+
+def time_case(case: Case, repeat: int) -> Dict:
+    case.run()  # compile / warm caches
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        case.run()
+        best = min(best, time.perf_counter() - start)
+    return {'key': case.key, 'name': case.name, 'params': case.params, 'work': case.work, 'unit': case.unit,
+            'seconds': best, 'throughput': case.work / best if best else 0.0, **case.extra}
+
+
+def run_suites(suites: List[str], sweep: Sweep, repeat: int) -> List[Dict]:
+    '''Each suite runs in its own scratch directory, data/ and config/ of the repo are never touched'''
+    results = []
+    cwd = os.getcwd()
+    for suite in suites:
+        with tempfile.TemporaryDirectory(prefix=f'bench_{suite}_') as workdir:
+            os.chdir(workdir)
+            try:
+                write_strategy_config()
+                for case in SUITES[suite](sweep):
+                    result = time_case(case, repeat)
+                    console.print(f"{result['key']:<60} {result['seconds'] * 1000:>10.2f} ms "
+                                  f"{result['throughput']:>14,.1f} {result['unit']}/s", markup=False, soft_wrap=True)
+                    results.append(result)
+            finally:
+                os.chdir(cwd)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks on synthetic OHLCV')
+    parser.add_argument('--suite', action='append', choices=list(SUITES), help='default: all suites')
+    parser.add_argument('--quick', action='store_true', help='small sweep for a fast check')
+    parser.add_argument('--bars', type=int, nargs='+')
+    parser.add_argument('--combos', type=int, nargs='+')
+    parser.add_argument('--stops', type=int, nargs='+', help='TP/SL grid sizes, rounded to n x n')
+    parser.add_argument('--volatility', type=float, default=0.01)
+    parser.add_argument('--gap-share', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--out', help='default: benchmarks/results/<commit>.json')
+    parser.add_argument('--baseline', help='earlier result JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+    if not 0 <= args.gap_share < 1:
+        parser.error('--gap-share must be in [0, 1)')
+
+    base = QUICK_SWEEP if args.quick else FULL_SWEEP
+    sweep = Sweep(bars=args.bars or base.bars, combos=args.combos or base.combos, stops=args.stops or base.stops,
+                  volatility=args.volatility, gap_share=args.gap_share, seed=args.seed)
+    current = {'meta': get_meta(sweep, args.repeat), 'results': run_suites(args.suite or list(SUITES), sweep, args.repeat)}
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{current['meta']['commit'] or 'local'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(current, f, indent=2)
+    console.print(f'Saved {len(current["results"])} cases to {out}')
+
+    if args.baseline:
+        sys.exit(1 if report(load_results(args.baseline), current, args.threshold) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from src.app.data.types import COLUMNS_RAW
+
+
+def make_ohlcv(n_bars: int, volatility: float = 0.01, gap_share: float = 0.0, seed: int = 0,
+               freq: str = '1h', start: str = '2024-01-01', price: float = 100.0) -> pd.DataFrame:
+    '''
+    Seeded geometric random walk in the raw store layout (float32 OHLCV, 'Open Time' index).
+    gap_share (0 <= gap_share < 1) of the bars is dropped in runs of up to 24 bars, as exchange outages leave them;
+    the first and last bars are always kept.
+    '''
+    if not 0 <= gap_share < 1:
+        raise ValueError(f'gap_share must be in [0, 1), got {gap_share}')
+    rng = np.random.default_rng(seed)
+    log_returns = rng.normal(0.0, volatility, n_bars)
+    close = price * np.exp(np.cumsum(log_returns))
+    open_ = np.concatenate(([price], close[:-1]))
+    wick = np.abs(rng.normal(0.0, volatility / 2, (2, n_bars)))
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+    volume = rng.lognormal(10.0, 1.0, n_bars)
+    index = pd.date_range(start, periods=n_bars, freq=freq, name=COLUMNS_RAW[0])
+    df = pd.DataFrame(dict(zip(COLUMNS_RAW[1:], (open_, high, low, close, volume))), index=index, dtype=np.float32)
+    n_gap_bars = min(int(n_bars * gap_share), n_bars - 2)
+    if n_gap_bars <= 0:
+        df.index.freq = freq
+        return df
+    keep = np.ones(n_bars, dtype=bool)
+    for _ in range(n_bars):  # runs hit mostly dropped bars near gap_share 1, the rest is dropped bar by bar below
+        if n_gap_bars <= 0:
+            break
+        length = min(int(rng.integers(1, 25)), n_gap_bars)
+        begin = int(rng.integers(1, max(n_bars - length, 2)))
+        n_gap_bars -= int(keep[begin:begin + length].sum())
+        keep[begin:begin + length] = False
+    if n_gap_bars > 0:
+        keep[rng.choice(np.flatnonzero(keep[1:-1]) + 1, n_gap_bars, replace=False)] = False
+    return df[keep]
+
+
+def make_signals(n_bars: int, n_cols: int, density: float = 0.02, seed: int = 0):
+    '''Random long/short entry matrices (n_bars, n_cols) with roughly density share of True'''
+    rng = np.random.default_rng(seed)
+    long_entries = rng.random((n_bars, n_cols)) < density
+    short_entries = (rng.random((n_bars, n_cols)) < density) & ~long_entries
+    return long_entries, short_entries
@@ -1,63 +1,106 @@
+from typing import Dict, List, Optional
+
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
 
 from src.common.loggers import get_logger
 
 from src.app.data.csv_handler import DataHandler
+from src.app.data.result_store import SYMBOL_FIELD
 from src.app.models.config_schema import MainConfig
 from src.app.data.types import COLUMNS_RESULT
 
 
 logger=get_logger('analyser',False)
 
+SORT_COLUMN='Total Return [%]'
+TOP_ROWS=100
+BATCH_ROWS=1<<18 # rows per scanned batch
+
+
 class TradingAnalyser:
+    '''
+    Streams the result dataset (ResultStore.get_dataset) symbol by symbol and batch by batch: only the param and
+    metric columns are read, analysis.min_trades is pushed down into the parquet scan. Memory follows the number
+    of combinations, not symbols x combinations: per symbol only its TOP_ROWS best rows are kept, per combination
+    the sums and counts of every metric, partial aggregates of the batches are merged once they outgrow the merged one.
+    '''
     def __init__(self, config: MainConfig):
         self.config=config
         self.data_handler=DataHandler(config)
-        self.df:pd.DataFrame = self.data_handler.get_all_result()
-
+        store=self.data_handler.get_result_store()
+        self.symbols=store.get_symbols()
+        self.dataset:Optional[ds.Dataset]=store.get_dataset(self.symbols)
+        names=self.dataset.schema.names if self.dataset is not None else []
+        self.metrics=[column for column in COLUMNS_RESULT if column in names]
+        self.param_names=[name for name in names if name not in COLUMNS_RESULT and name!=SYMBOL_FIELD] # stored index order
+        self.top:Dict[str,pd.DataFrame]={}
+        self.agg:Optional[pd.DataFrame]=None
+
+    def _filter(self,symbol:str) -> ds.Expression:
+        expression=ds.field(SYMBOL_FIELD)==symbol
+        if self.config.analysis.min_trades:
+            expression&=ds.field(COLUMNS_RESULT[0])>=self.config.analysis.min_trades
+        return expression
+
+    def _get_top(self,table:pa.Table) -> pa.Table:
+        '''Best TOP_ROWS rows by SORT_COLUMN, missing values last as sort_values puts them'''
+        indices=pc.sort_indices(table,sort_keys=[(SORT_COLUMN,'descending')],null_placement='at_end')
+        return table.take(indices[:TOP_ROWS])
+
+    def _merge(self,partials:List[pa.Table]) -> pa.Table:
+        '''Partial sums and counts of the same combinations added up'''
+        merged=pa.concat_tables(partials).group_by(self.param_names).aggregate(
+            [(f'{metric}_{op}','sum') for metric in self.metrics for op in ('sum','count')])
+        return merged.rename_columns([name[:-len('_sum')] if name not in self.param_names else name
+                                      for name in merged.column_names])
+
+    def scan(self):
+        columns=self.param_names+self.metrics
+        merged,partials,partial_rows=None,[],0
+        for symbol in self.symbols:
+            top=None
+            for batch in self.dataset.to_batches(columns=columns,filter=self._filter(symbol),batch_size=BATCH_ROWS):
+                if not batch.num_rows:
+                    continue
+                table=pa.Table.from_batches([batch])
+                top=self._get_top(table if top is None else pa.concat_tables([top,table]))
+                partials.append(table.group_by(self.param_names).aggregate(
+                    [(metric,op) for metric in self.metrics for op in ('sum','count')]))
+                partial_rows+=partials[-1].num_rows
+                if partial_rows>=max(merged.num_rows if merged is not None else 0,BATCH_ROWS):
+                    merged=self._merge(partials+([merged] if merged is not None else []))
+                    partials,partial_rows=[],0
+            if top is not None:
+                self.top[symbol]=top.replace_schema_metadata().to_pandas().set_index(self.param_names)
+        if partials:
+            merged=self._merge(partials+([merged] if merged is not None else []))
+        if merged is None:
+            return
+        sums=merged.to_pandas().set_index(self.param_names).sort_index()
+        self.agg=pd.DataFrame({metric:sums[f'{metric}_sum']/sums[f'{metric}_count'] for metric in self.metrics})
 
     def get_aggregate_analysis(self):
-        param_levels = self.df.index.names[:-1]
-
-        agg =(self.df.groupby(level=param_levels)
-              ).mean(numeric_only=True)
-
-        top100 = agg.sort_values("Total Return [%]", ascending=False).head(100)
+        top100 = self.agg.sort_values(SORT_COLUMN, ascending=False).head(100)
         self.data_handler.save_analysis(top100,'top100_total')
 
-
-
     def get_aggregate_by_symbol(self):
-        param_levels = self.df.index.names[:-1]
-        symbol_level = "symbol"
-
-        best_per_symbol = (
-            self.df.groupby(level=symbol_level, group_keys=False)
-            .apply(lambda x: x.sort_values("Total Return [%]", ascending=False).head(1))
-        )
-
-        best_combos = best_per_symbol.index.droplevel("symbol").unique()
-        filtered = self.df.loc[self.df.index.droplevel("symbol").isin(best_combos)]
-        agg = filtered.groupby(level=param_levels).mean(numeric_only=True)
-        self.data_handler.save_analysis(agg,'by_symbol')
-
+        '''Means over all symbols of the combinations that were the best on at least one symbol'''
+        best_combos=[df.index[0] for df in self.top.values()]
+        self.data_handler.save_analysis(self.agg.loc[self.agg.index.isin(best_combos)],'by_symbol')
 
     def save_grouped_by_symbol(self):
-        grouped=self.df.groupby(level="symbol", group_keys=False)
-        best_per_symbol = (
-            grouped
-            .apply(lambda x: x.sort_values("Total Return [%]", ascending=False).head(100))
-        )
-
-        for symbol,df_sym in best_per_symbol.groupby(level='symbol'):
-            df_sym=df_sym.droplevel(level='symbol')
+        for symbol,df_sym in self.top.items():
             self.data_handler.save_analysis(df_sym,str(symbol),True)
 
-
-
-
     def start_analysis(self):
+        if self.dataset is None:
+            logger.warning('No results to analyse')
+            return
         try:
+            self.scan()
             self.save_grouped_by_symbol()
             self.get_aggregate_by_symbol()
             self.get_aggregate_analysis()
@@ -0,0 +1,104 @@
+import os
+from typing import Optional
+
+import psutil
+
+from src.app.models import MainConfig
+from src.common.loggers import get_logger
+
+log = get_logger('batch_planner', False)
+
+MB = 1024 ** 2
+AUTO_BUDGET_SHARE = 0.8  # memory_budget_mb: 0 -> this share of available RAM split between the workers
+VBT_FLOAT_ARRAYS = 6  # float64 arrays per column vbt keeps for a portfolio + stats (price, cash, value, returns...)
+INDICATOR_FLOAT_ARRAYS = 2  # float64 intermediates of the indicator per signal column
+RESULT_ROW_BYTES = 64  # one row of the result frame: metrics + MultiIndex codes
+PRICE_FLOAT_ARRAYS = 4  # float64 copies of open/high/low/close every batch makes, whatever its size
+SAFETY = 1.5
+
+
+class BatchPlanner:
+    '''
+    Sizes parameter batches to a per-worker RAM budget.
+    The first size comes from an estimate of bytes per combination (bars, stop grid, direction, engine);
+    afterwards the estimate follows the RSS observed through log_mem: it grows at once and shrinks slowly.
+    What a batch allocates whatever its size (fixed_bytes) is kept out of the per combination estimate;
+    the data held for the whole symbol (bars, stop tables) is in the RSS before the first batch.
+    Without memory_budget_mb the batch is the fixed processor.max_chunks.
+    '''
+    def __init__(self, config: MainConfig, n_bars: int):
+        self.config = config
+        self.max_chunks = config.processor.max_chunks
+        self.budget = self._get_budget()
+        self.bytes_per_combo = self.estimate_bytes_per_combo(n_bars)
+        self.fixed_bytes = self.estimate_fixed_bytes(n_bars)
+        self.process = psutil.Process(os.getpid())
+        self._baseline = 0
+        self._peak = 0
+        self._batch_size = 0
+        self._cap: Optional[int] = None  # lowered after a MemoryError
+
+    def _get_budget(self) -> Optional[int]:
+        budget_mb = self.config.processor.memory_budget_mb
+        if budget_mb is None:
+            return None
+        if budget_mb == 0:
+            return int(psutil.virtual_memory().available * AUTO_BUDGET_SHARE / self.config.processor.max_processors)
+        return budget_mb * MB
+
+    def estimate_bytes_per_combo(self, n_bars: int) -> float:
+        size = self.config.strategy.size
+        n_stops = len(size.get_combinations())
+        sides = 2 if self.config.strategy.type.get_direction() == 'both' else 1
+        signals = 2 * n_bars + INDICATOR_FLOAT_ARRAYS * 8 * n_bars  # long/short entries + indicator intermediates
+        if not size.use_only_tp_sl:
+            signals += 2 * n_bars  # long/short exits
+        if self.config.processor.engine == 'numba':
+            portfolio = 0  # the kernel keeps one column state per thread
+        elif self.config.use_fast():
+            portfolio = n_stops * n_bars * (4 + sides * VBT_FLOAT_ARRAYS * 8)  # signals tiled to every stop
+        else:
+            portfolio = n_bars * sides * VBT_FLOAT_ARRAYS * 8  # stops are run one after another
+        return (signals + portfolio + n_stops * RESULT_ROW_BYTES) * SAFETY
+
+    @staticmethod
+    def estimate_fixed_bytes(n_bars: int) -> float:
+        return PRICE_FLOAT_ARRAYS * 8 * n_bars * SAFETY
+
+    def get_batch_size(self) -> int:
+        if self.budget is None:
+            size = self.max_chunks
+        else:
+            available = max(self.budget - self._rss() - self.fixed_bytes, 0)
+            size = int(available // max(self.bytes_per_combo, 1))
+        if self._cap is not None:
+            size = min(size, self._cap)
+        return max(size, 1)
+
+    def _rss(self) -> int:
+        return self.process.memory_info().rss
+
+    def start_batch(self, batch_size: int):
+        self._baseline = self._peak = self._rss()
+        self._batch_size = batch_size
+
+    def observe(self) -> int:
+        rss = self._rss()
+        self._peak = max(self._peak, rss)
+        return rss
+
+    def end_batch(self):
+        self.observe()
+        if not self._batch_size or self.budget is None:
+            return
+        observed = max(self._peak - self._baseline - self.fixed_bytes, 0) / self._batch_size
+        if observed > self.bytes_per_combo:
+            self.bytes_per_combo = observed
+        else:
+            self.bytes_per_combo = 0.8 * self.bytes_per_combo + 0.2 * max(observed, self.bytes_per_combo / 4)
+
+    def on_oom(self, batch_size: int):
+        self._cap = max(batch_size // 2, 1)
+        if self.budget is not None:
+            self.bytes_per_combo *= 2
+        log.warning(f'MemoryError on a batch of {batch_size}, batch size capped to {self._cap}')
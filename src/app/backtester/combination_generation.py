@@ -1,61 +1,208 @@
-import itertools
+import hashlib
 from math import prod
-from typing import Any, Dict, Generator, Iterator, List,Optional
+from typing import Any, Dict, Generator, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 from src.app.models import ParamConfig
+import numpy as np
 import pandas as pd
 
-import itertools
-from typing import Any, Dict, Iterator, List
+
+class ParamSpace:
+    '''
+    Lazy view over the product of parameter values (same order as itertools.product, last key fastest).
+    Combos are addressed by ordinal and decoded arithmetically (mixed radix), so the product is never built.
+    With flag_forbidden, combos where every flag_key is falsy are skipped and ordinals cover valid combos only.
+    '''
+    def __init__(self, params: Dict[str, List[Any]], flag_forbidden: bool = False, flag_keys: List[str] = None):
+        self.keys = list(params.keys())
+        self.values = [list(params[k]) for k in self.keys]
+        self.radix = [len(v) for v in self.values]
+        flag_keys = (flag_keys or []) if flag_forbidden else []
+        self._constrained = bool(flag_keys)
+        self._truthy = [[bool(v) if k in flag_keys else False for v in vals] for k, vals in zip(self.keys, self.values)]
+        self._lookup = [{v: i for i, v in enumerate(vals)} for vals in self.values]
+        # _total[d]: completions of digits d.., _falsy[d]: completions of digits d.. with every flag falsy
+        n = len(self.keys)
+        self._total = [1] * (n + 1)
+        self._falsy = [1] * (n + 1)
+        for d in range(n - 1, -1, -1):
+            self._total[d] = self._total[d + 1] * self.radix[d]
+            self._falsy[d] = self._falsy[d + 1] * (self.radix[d] - sum(self._truthy[d]))
+        self._size = self._total[0] - self._falsy[0] if self._constrained else self._total[0]
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return self._size
+
+    def fingerprint(self) -> str:
+        '''Changes whenever the ordinal -> combo mapping changes'''
+        return hashlib.md5(repr((self.keys, self.values, self._truthy if self._constrained else None)).encode()).hexdigest()
+
+    def _completions(self, d: int, satisfied):
+        return np.where(satisfied, self._total[d], self._total[d] - self._falsy[d]) if isinstance(satisfied, np.ndarray) \
+            else (self._total[d] if satisfied else self._total[d] - self._falsy[d])
+
+    def _decode(self, ordinals: np.ndarray) -> List[np.ndarray]:
+        '''Digits (value positions per key) for an array of ordinals'''
+        dtype = np.int64 if self._total[0] < 2 ** 63 else object
+        rest = ordinals.astype(dtype)
+        satisfied = np.full(len(rest), not self._constrained)
+        digits = []
+        for d, radix in enumerate(self.radix):
+            digit = np.zeros(len(rest), dtype=np.int64)
+            done = np.zeros(len(rest), dtype=bool)
+            truthy = np.asarray(self._truthy[d])
+            for v in range(radix):
+                count = self._completions(d + 1, satisfied | truthy[v])
+                take = ~done & (rest < count)
+                digit[take] = v
+                rest = np.where(done | take, rest, rest - count)
+                done |= take
+            satisfied = satisfied | truthy[digit]
+            digits.append(digit)
+        return digits
+
+    def index(self, combo: Sequence[Any]) -> int:
+        '''Ordinal of a combo (values in key order), ValueError if it is not part of the space'''
+        if len(combo) != len(self.keys):
+            raise ValueError(f'Expected {len(self.keys)} values, got {len(combo)}')
+        ordinal = 0
+        satisfied = not self._constrained
+        for d, value in enumerate(combo):
+            digit = self._lookup[d].get(value)
+            if digit is None:
+                raise ValueError(f'{value!r} is not a value of {self.keys[d]}')
+            for v in range(digit):
+                ordinal += self._completions(d + 1, satisfied or self._truthy[d][v])
+            satisfied = satisfied or self._truthy[d][digit]
+        if not satisfied:
+            raise ValueError(f'{combo} is forbidden: all flags are False')
+        return ordinal
+
+    def get_ordinals(self, combos: Iterable[Sequence[Any]]) -> np.ndarray:
+        '''Ordinals of combos, those outside the space (config changed) are ignored'''
+        ordinals = []
+        for combo in combos:
+            try:
+                ordinals.append(self.index(combo))
+            except ValueError:
+                continue
+        return np.asarray(ordinals, dtype=np.int64)
+
+    def take(self, ordinals: Union[Iterable[int], np.ndarray]) -> Dict[str, List[Any]]:
+        '''Combos for the given ordinals as {key: [values]}'''
+        ordinals = np.asarray(ordinals, dtype=np.int64 if self._size < 2 ** 63 else object).ravel()
+        if len(ordinals) and (ordinals.min() < 0 or ordinals.max() >= self._size):
+            raise IndexError('ParamSpace index out of range')
+        digits = self._decode(ordinals)
+        return {k: [vals[i] for i in digit] for k, vals, digit in zip(self.keys, self.values, digits)}
+
+    def __getitem__(self, item: Union[int, slice]) -> Union[Dict[str, Any], Dict[str, List[Any]]]:
+        if isinstance(item, slice):
+            return self.take(range(*item.indices(self._size)))
+        if item < 0:
+            item += self._size
+        return {k: v[0] for k, v in self.take([item]).items()}
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for batch in self.batches(4096):
+            for combo in zip(*batch.values()):
+                yield dict(zip(self.keys, combo))
+
+    def batches(self, batch_size: int, start: int = 0, stop: Optional[int] = None) -> Iterator[Dict[str, List[Any]]]:
+        stop = self._size if stop is None else min(stop, self._size)
+        for pos in range(start, stop, batch_size):
+            yield self.take(range(pos, min(pos + batch_size, stop)))
+
+
+class OrdinalRanges:
+    '''
+    Set of ordinals as sorted, disjoint [start, stop) runs (shape (runs, 2)). Batches take consecutive ordinals,
+    so what a run has done stays a handful of runs, a finished param space is a single one whatever its size.
+    '''
+    def __init__(self, runs: Optional[Sequence[Sequence[int]]] = None):
+        self.runs = np.asarray(runs if runs is not None else [], dtype=np.int64).reshape(-1, 2)
+
+    @classmethod
+    def from_ordinals(cls, ordinals: Iterable[int]) -> 'OrdinalRanges':
+        ordinals = np.unique(np.asarray(ordinals, dtype=np.int64))
+        if not len(ordinals):
+            return cls()
+        breaks = np.flatnonzero(np.diff(ordinals) != 1) + 1
+        return cls(np.stack([ordinals[np.r_[0, breaks]], ordinals[np.r_[breaks - 1, len(ordinals) - 1]] + 1], axis=1))
+
+    def union(self, other: 'OrdinalRanges') -> 'OrdinalRanges':
+        runs = np.concatenate([self.runs, other.runs])
+        if not len(runs):
+            return OrdinalRanges()
+        runs = runs[np.argsort(runs[:, 0], kind='stable')]
+        ends = np.maximum.accumulate(runs[:, 1])
+        first = np.r_[True, runs[1:, 0] > ends[:-1]]  # overlapping and touching runs are joined
+        last = np.r_[first[1:], True]
+        return OrdinalRanges(np.stack([runs[first, 0], ends[last]], axis=1))
+
+    def _clip(self, start: int, stop: int) -> np.ndarray:
+        lo = np.searchsorted(self.runs[:, 1], start, side='right')
+        hi = np.searchsorted(self.runs[:, 0], stop, side='left')
+        return np.clip(self.runs[lo:hi], start, stop)
+
+    def count(self, start: int = 0, stop: Optional[int] = None) -> int:
+        runs = self._clip(start, stop) if stop is not None else self.runs
+        return int((runs[:, 1] - runs[:, 0]).sum())
+
+    def covers(self, start: int, stop: int) -> bool:
+        return self.count(start, stop) == stop - start
+
+    def get_ordinals(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        '''Ordinals of the set inside [start, stop), sorted'''
+        runs = self._clip(start, stop) if stop is not None else self.runs
+        lengths = runs[:, 1] - runs[:, 0]
+        offsets = np.repeat(runs[:, 0] - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        return np.arange(int(lengths.sum()), dtype=np.int64) + offsets
+
+    def to_list(self) -> List[List[int]]:
+        return self.runs.tolist()
 
 
 class BatchIterator:
+    '''
+    Streams batches of {key: [values]} from a ParamSpace, skipping ordinals already done.
+    start/stop limit the ordinals to [start, stop) (one work unit of the scheduler).
+    '''
     def __init__(
             self,
-            params: Dict[str, List[Any]],
+            space: ParamSpace,
             batch_size: int,
-            flag_forbidden: bool = False,
-            flag_keys: List[str] = None,
-            exclude_combos=None  # список tuple’ов для исключения
+            exclude_ordinals: Optional[np.ndarray] = None,
+            start: int = 0,
+            stop: Optional[int] = None
     ):
-        self.params = params
+        self.space = space
         self.batch_size = batch_size
-        self.flag_forbidden = flag_forbidden
-        self.flag_keys = flag_keys or []
-        self.exclude_combos = set(exclude_combos) if exclude_combos is not None else None
-
-        self._all_combos = list(itertools.product(*(params[k] for k in params)))
-        self._keys = list(params.keys())
-
-        if self.flag_forbidden and self.flag_keys:
-            self._all_combos = [
-                combo for combo in self._all_combos
-                if any(combo[self._keys.index(k)] for k in self.flag_keys)
-            ]
+        self.exclude_ordinals = np.unique(exclude_ordinals) if exclude_ordinals is not None else np.empty(0, dtype=np.int64)
+        # n-th remaining ordinal = n + searchsorted(_shift, n, 'right')
+        self._shift = self.exclude_ordinals - np.arange(len(self.exclude_ordinals))
+        stop = space.size if stop is None else min(stop, space.size)
+        self._start = start - int(np.searchsorted(self.exclude_ordinals, start))
+        self._end = max(stop - int(np.searchsorted(self.exclude_ordinals, stop)), self._start)
+        self._pos = self._start
+        self.ordinals = np.empty(0, dtype=np.int64)  # ordinals of the last batch
 
-        if self.exclude_combos:
-            self._all_combos = [
-                combo for combo in self._all_combos
-                if combo not in self.exclude_combos
-            ]
-
-        self._pos = 0
+    def __len__(self) -> int:
+        return self._end - self._start
 
     def __iter__(self) -> Iterator[Dict[str, List[Any]]]:
         return self
 
     def __next__(self) -> Dict[str, List[Any]]:
-        if self._pos >= len(self._all_combos):
+        if self._pos >= self._end:
             raise StopIteration
-
-        batch_combos = self._all_combos[self._pos:self._pos + self.batch_size]
+        remaining = np.arange(self._pos, min(self._pos + self.batch_size, self._end))
         self._pos += self.batch_size
-
-        result = {k: [] for k in self._keys}
-        for combo in batch_combos:
-            for k, v in zip(self._keys, combo):
-                result[k].append(v)
-
-        return result
+        self.ordinals = remaining + np.searchsorted(self._shift, remaining, side='right')
+        return self.space.take(self.ordinals)
 
 
 
@@ -72,7 +219,10 @@ class ParamCombinationsGenerator: #TODO: Сделать так , чтобы flag
         return p if isinstance(p, list) else [p]
 
     def _prepare_params(self) -> Dict[str, Any]:
-        return {k: self._expand(v) for k, v in self.config.multi.to_dict().items()}
+        params = {k: self._expand(v) for k, v in self.config.multi.to_dict().items()}
+        # memo_params become the outer digits: consecutive ordinals (one batch) share their values
+        outer = [k for k in getattr(self.config.settings, 'memo_params', []) if k in params]
+        return {k: params[k] for k in outer + [k for k in params if k not in outer]}
 
     def _flag_keys(self, params: Dict[str, Any]) -> List[str]:
         return [k for k in params if k.startswith('flag_')]
@@ -80,17 +230,13 @@ class ParamCombinationsGenerator: #TODO: Сделать так , чтобы flag
     def _is_valid(self, combo: Dict[str, Any], flag_keys: List[str]) -> bool:
         return not flag_keys or any(combo.get(k, False) for k in flag_keys)
 
-    def get_total_combinations(self) -> int:
+    def get_space(self) -> ParamSpace:
         params = self._prepare_params()
         flag_forbidden = getattr(self.config.settings, 'flag_forbidden', False)
-        flag_keys = self._flag_keys(params) if flag_forbidden else []
+        return ParamSpace(params, flag_forbidden, self._flag_keys(params))
 
-        total = 0
-        for combo in itertools.product(*(params[k] for k in params)):
-            combo_dict = dict(zip(params, combo))
-            if self._is_valid(combo_dict, flag_keys):
-                total += 1
-        return total
+    def get_total_combinations(self) -> int:
+        return self.get_space().size
 
     def _max_batch_shape(self, params: Dict[str, Any], max_product: int) -> Dict[str, int]:
         list_keys = [k for k, v in params.items() if isinstance(v, list)]
@@ -101,27 +247,22 @@ class ParamCombinationsGenerator: #TODO: Сделать так , чтобы flag
             shape[k] = min(lengths[k], max_product // prod(shape.values()) or 1)
         return shape
 
-    def init_batch(self, batch_size: int,exclude_combos:Optional[pd.MultiIndex]) -> BatchIterator:
-        params = self._prepare_params()
-        flag_forbidden = getattr(self.config.settings, 'flag_forbidden', False)
-        flag_keys = self._flag_keys(params) if flag_forbidden else []
-
-        exclude_combos = list(map(tuple, exclude_combos)) if exclude_combos is not None and not exclude_combos.empty else []
+    def init_batch(self, batch_size: int, done: Optional[OrdinalRanges] = None,
+                   start: int = 0, stop: Optional[int] = None) -> BatchIterator:
+        '''
+        :param done: ordinals of get_space() to skip (see DataHandler.get_done), only those in [start, stop)
+            are expanded
+        :param start, stop: only ordinals in [start, stop)
+        '''
+        space = self.get_space()
         return BatchIterator(
-            params,
+            space,
             batch_size,
-            flag_forbidden,
-            flag_keys,
-            exclude_combos
+            done.get_ordinals(start, space.size if stop is None else stop) if done is not None else None,
+            start,
+            stop
         )
 
 
     def generate_all_combinations(self) -> Generator[Dict[str, Any], None, None]:
-        params = self._prepare_params()
-        flag_forbidden = getattr(self.config.settings, 'flag_forbidden', False)
-        flag_keys = self._flag_keys(params) if flag_forbidden else []
-
-        for combo in itertools.product(*(params[k] for k in params)):
-            combo_dict = dict(zip(params, combo))
-            if self._is_valid(combo_dict, flag_keys):
-                yield combo_dict
+        yield from self.get_space()
@@ -1,6 +1,7 @@
 from typing import Tuple,Dict,List,Union,Optional
 from multiprocessing.managers import DictProxy
-import gc,os,sys
+import gc,os,sys,time,zlib
+from contextlib import nullcontext
 # import psutil
 
 from collections import deque
@@ -11,17 +12,29 @@ import numpy as np
 import pandas as pd
 import vectorbt as vbt
 
-from src.app.backtester.risk_managment import _get_exits
+from src.app.backtester.risk_managment import _get_exits,get_stop_tables
+from src.app.backtester.batch_planner import BatchPlanner
+from src.app.backtester.execution import simulate_portfolio_nb,simulate_grid_nb,DIRECTION_CODES
 from src.app.utils.config_loader import get_param_config
 from src.app.strategies import get_strategy
-from src.app.models import EntryExitResult,MainConfig,TpSlComb,BackTestResult,BackTestData
-from src.app.backtester.combination_generation import ParamCombinationsGenerator
+from src.app.strategies.registry import accepts_memo,get_batch_driver,get_memo_keys
+from src.app.indicators.memo import IndicatorMemo,new_memo
+from src.app.models import EntryExitResult,MainConfig,TpSlComb,BackTestResult,BackTestData,WorkUnit
+from src.app.backtester.combination_generation import ParamCombinationsGenerator,ParamSpace
 from src.app.data.csv_handler import DataHandler
+from src.app.data.shared_data import load_shared_df
 from src.common.loggers import get_logger
-from src.app.data.types import METRICS
+from src.app.data.types import METRICS,SharedData
+from src.app.utils.helpers import product_multiindex
+from src.app.utils.telemetry import Telemetry
 
 logger=get_logger('backtester',False)
 
+ORDER_SIZE=100
+FEES=0.001
+INIT_CASH=10000
+
+_warmed_up=set() # (strategy, engine, signals, direction) already compiled in this process
 
 
 def get_deep_size(obj, seen=None):
@@ -46,35 +59,77 @@ def get_deep_size(obj, seen=None):
 
 class MultiParamPortfolioBacktest:
 
-    def __init__(self, config:MainConfig,pid:int=0,symbols:Optional[List[str]]=None,progress_dict:Optional[DictProxy]=None):
+    def __init__(self, config:MainConfig,pid:int=0,symbols:Optional[List[str]]=None,progress_dict:Optional[DictProxy]=None,
+                 shared_data:Optional[SharedData]=None,locks:Optional[List]=None):
         self.config:MainConfig=config
         self.data_handler=DataHandler(config)
         self.params=get_param_config(config.strategy.name)
         self.indicator=get_strategy(config.strategy.name)
+        self.driver=get_batch_driver(config.strategy.name) if config.processor.signals=='kernel' else None
         self.params_comb=ParamCombinationsGenerator(self.params)
         self.progress_dict=progress_dict if progress_dict else {}
         self.symbols=symbols if symbols else self.config.strategy.symbols.symbols
         self.pid=pid
+        self.shared_data=shared_data
+        self.locks=locks # striped per symbol locks when several workers write the same symbol
+        self.planner:Optional[BatchPlanner]=None
+        self.use_memo=accepts_memo(config.strategy.name)
+        self.memo:Optional[IndicatorMemo]=None # indicator outputs of the current symbol
+        self.memo_keys=list(dict.fromkeys(get_memo_keys(config.strategy.name)+self.params.settings.memo_params)) if self.use_memo else []
+        self.stop_tables:Optional[Tuple[np.ndarray,np.ndarray]]=None # sparse high/low tables of the current symbol for _get_exits
+        self.telemetry=Telemetry(config.processor.telemetry,pid)
 
     def log_mem(self,stage):
-        pass
-        # proc = psutil.Process(os.getpid())
-        # logger.info(f'PID {self.pid} {stage}  {proc.memory_info().rss / 1024**2} "MB"')
+        if self.planner is None:
+            return
+        rss=self.planner.observe()
+        logger.debug(f'PID {self.pid} {stage}  {rss / 1024**2} "MB"')
 
     def _get_entries(self,params:Dict,**kwargs) -> Tuple[pd.DataFrame,pd.DataFrame,pd.MultiIndex]:
         kwargs = {k: v for k, v in kwargs.items() if k in self.indicator.input_names}
         result=tuple()
         try:
-            result=self.indicator.run(**kwargs,
-                                      **params,
-                                      param_product=False)
+            with self.telemetry.stage('indicator',np.size(next(iter(params.values()),0))):
+                memo={'memo':self.memo} if self.memo is not None else {}
+                result=self.indicator.run(**kwargs,
+                                          **params,
+                                          **memo,
+                                          param_product=False)
+        except MemoryError:
+            raise
         except Exception as e:
             logger.exception('Eror in _get_entries)')
         if not result: return result
-        if isinstance(result.buy, pd.Series):
-            return result.buy.to_frame(), result.sell.to_frame(), result.buy.to_frame().columns
+        if isinstance(result.buy, pd.Series): # single combination: restore the param level names vbt drops
+            names=[f'{result.short_name}_{param}' for param in result.param_names]
+            buy,sell=result.buy.to_frame(),result.sell.to_frame()
+            buy.columns.names=sell.columns.names=names
+            return buy, sell, buy.columns
         return result.buy,result.sell,result.buy.columns
 
+    def _get_warm(self,params:Dict,n_cols:int) -> np.ndarray:
+        '''First combination of every distinct memo_keys values: run serially, they fill the memo for the parallel rest'''
+        warm=np.zeros(n_cols,dtype=np.bool_)
+        keys=[np.asarray(params[name],dtype=np.float64) for name in self.memo_keys if name in params]
+        if not keys:
+            warm[0]=True
+            return warm
+        warm[np.unique(np.column_stack(keys),axis=0,return_index=True)[1]]=True
+        return warm
+
+    def _get_signal_matrices(self,params:Dict,**kwargs) -> Tuple[np.ndarray,np.ndarray,Dict[str,np.ndarray]]:
+        '''One compiled call into preallocated (n_bars, n_combos) matrices, the param labels stay plain arrays'''
+        inputs=[np.ascontiguousarray(kwargs[name]) for name in self.indicator.input_names]
+        values=[np.asarray(params[name]) for name in self.indicator.param_names]
+        n_cols=len(values[0]) if values else 1
+        buy=np.zeros((len(inputs[0]),n_cols),dtype=np.bool_)
+        sell=np.zeros((len(inputs[0]),n_cols),dtype=np.bool_)
+        with self.telemetry.stage('indicator',n_cols):
+            memo=(self.memo,self._get_warm(params,n_cols)) if self.memo is not None else ()
+            self.driver(buy,sell,*inputs,*values,*memo)
+        labels={f'{self.config.strategy.name}_{name}':value for name,value in zip(self.indicator.param_names,values)}
+        return buy,sell,labels
+
     def _get_exits(self,long_entries:np.ndarray,short_entries:np.ndarray,**kwargs:np.ndarray) -> Tuple[np.ndarray,np.ndarray]:
         try:
             close = kwargs['close']
@@ -84,73 +139,82 @@ class MultiParamPortfolioBacktest:
             raise ValueError(f"Missing required price array in kwargs: {e}")
         exits = tuple()
         try:
-            exits=_get_exits(
-                close=close,
-                high=high,
-                low=low,
-                long_entries=long_entries,
-                short_entries=short_entries,
-                tp_pct=self.config.strategy.size.tp_pct.fix,
-                sl_pct=self.config.strategy.size.sl_pct.fix
-            )
+            with self.telemetry.stage('exits',long_entries.shape[1]):
+                exits=_get_exits(
+                    close=close,
+                    high=high,
+                    low=low,
+                    long_entries=long_entries,
+                    short_entries=short_entries,
+                    tp_pct=np.array([self.config.strategy.size.tp_pct.fix]),
+                    sl_pct=np.array([self.config.strategy.size.sl_pct.fix]),
+                    tables=self.stop_tables
+                )
+        except MemoryError:
+            raise
         except Exception as e:
             logger.exception('Erro in _get_exits')
-        finally:
-
-            return exits
+        return exits
 
 
 
     def _get_entries_and_exists(self,params:Dict,**kwargs) -> EntryExitResult:
-        long_entries,short_entries,columns=self._get_entries(params,**kwargs)
+        if self.driver is not None:
+            long_entries,short_entries,labels=self._get_signal_matrices(params,**kwargs)
+        else:
+            long_entries,short_entries,_=self._get_entries(params,**kwargs)
+            labels=None
+        self.log_mem('Entries')
         if self.config.strategy.size.use_only_tp_sl:
             long_exits = None
             short_exits = None
         else:
             long_exits, short_exits = self._get_exits(
-                long_entries=long_entries.values,
-                short_entries=short_entries.values,
+                long_entries=np.asarray(long_entries),
+                short_entries=np.asarray(short_entries),
                 **kwargs
             )
+            self.log_mem('Exits')
         return EntryExitResult(long_entries=long_entries,
                                short_entries=short_entries,
                                long_exits=long_exits,
                                short_exits=short_exits,
-                               index=columns)
+                               labels=labels)
 
     def _get_tp_sl(self, entry_exits: EntryExitResult) -> Tuple[EntryExitResult, TpSlComb]:
-        entries = entry_exits.long_entries.values  # numpy
-        short_entries = entry_exits.short_entries.values  # numpy
-        long_exits = entry_exits.long_exits.values if entry_exits.long_exits is not None else None
-        short_exits = entry_exits.short_exits.values if entry_exits.short_exits is not None else None
+        '''
+        vectorbt engine only: vbt.Portfolio simulates one column per (combination, TP/SL pair), so the signals
+        are copied once per pair (bars x combos x pairs). engine: numba walks the stop grid in the kernel instead
+        (run_portfolio_grid), that is the engine for large grids.
+        '''
+        entries = np.asarray(entry_exits.long_entries)
+        short_entries = np.asarray(entry_exits.short_entries)
+        index = pd.RangeIndex(entries.shape[0])
+        long_exits = np.asarray(entry_exits.long_exits) if entry_exits.long_exits is not None else None
+        short_exits = np.asarray(entry_exits.short_exits) if entry_exits.short_exits is not None else None
 
         tp_sl_index = self.config.strategy.size.get_combinations()
         n_tp_sl = len(tp_sl_index)
         n_cols = entries.shape[1]
 
-        multi_index_tuples = [
-            tuple(list(entry_exits.long_entries.columns[i]) + list(tp_sl_index[j]))
-            for i in range(n_cols) for j in range(n_tp_sl)
-        ]
-        multi_index = pd.MultiIndex.from_tuples(
-            multi_index_tuples, names=entry_exits.long_entries.columns.names + tp_sl_index.names
-        )
+        # Column i*n_tp_sl+j is signal column i with tp/sl pair j
+        multi_index = product_multiindex(entry_exits.get_columns(), tp_sl_index)
 
-        entries_expanded = np.tile(entries, (1, n_tp_sl))
-        short_entries_expanded = np.tile(short_entries, (1, n_tp_sl))
+        entries_expanded = np.repeat(entries, n_tp_sl, axis=1)
+        short_entries_expanded = np.repeat(short_entries, n_tp_sl, axis=1)
 
         if long_exits is not None:
-            long_exits_expanded = np.tile(long_exits, (1, n_tp_sl))
-            short_exits_expanded = np.tile(short_exits, (1, n_tp_sl))
+            long_exits_expanded = np.repeat(long_exits, n_tp_sl, axis=1)
+            short_exits_expanded = np.repeat(short_exits, n_tp_sl, axis=1)
 
-            entry_exits.long_exits = pd.DataFrame(long_exits_expanded, columns=multi_index, index=entry_exits.long_exits.index)
-            entry_exits.short_exits = pd.DataFrame(short_exits_expanded, columns=multi_index, index=entry_exits.short_exits.index)
+            entry_exits.long_exits = pd.DataFrame(long_exits_expanded, columns=multi_index, index=index)
+            entry_exits.short_exits = pd.DataFrame(short_exits_expanded, columns=multi_index, index=index)
 
 
-        entry_exits.long_entries = pd.DataFrame(entries_expanded, columns=multi_index, index=entry_exits.long_entries.index)
-        entry_exits.short_entries = pd.DataFrame(short_entries_expanded, columns=multi_index, index=entry_exits.short_entries.index)
-        tp_values = [tp for _ in range(n_cols) for sl, tp in tp_sl_index]
-        sl_values = [sl for _ in range(n_cols) for sl, tp in tp_sl_index]
+        entry_exits.long_entries = pd.DataFrame(entries_expanded, columns=multi_index, index=index)
+        entry_exits.short_entries = pd.DataFrame(short_entries_expanded, columns=multi_index, index=index)
+        tp_values = np.tile(self._get_stop_values(tp_sl_index, 'tp_stop'), n_cols).tolist()
+        sl_values = np.tile(self._get_stop_values(tp_sl_index, 'sl_stop'), n_cols).tolist()
 
         return entry_exits, TpSlComb(tp=tp_values, sl=sl_values)
 
@@ -158,26 +222,106 @@ class MultiParamPortfolioBacktest:
 
     def _combination_via_tp_sl(self,df:pd.DataFrame,entry_exits:EntryExitResult) -> pd.DataFrame:
         dfs=[]
+        entry_exits=entry_exits.to_frames()
         tp_sl_index=self.config.strategy.size.get_combinations()
-        for tp,sl in tp_sl_index:
-            stats=self.run_portfolio(df,entry_exits,TpSlComb(tp=tp,sl=sl))
+        for stops in tp_sl_index:
+            stop=dict(zip(tp_sl_index.names,stops))
+            stats=self.run_portfolio(df,entry_exits,TpSlComb(tp=stop['tp_stop'],sl=stop['sl_stop'],
+                                                             trail=stop.get('trail_stop'),be=stop.get('be_stop')))
             stats.index = pd.MultiIndex.from_tuples(
-                [idx + (sl, tp) for idx in stats.index],
-                names=stats.index.names + ['sl_stop', 'tp_stop']
+                [idx + stops for idx in stats.index],
+                names=stats.index.names + list(tp_sl_index.names)
             )
             dfs.append(stats)
         return pd.concat(dfs)
 
 
     def _prepare_njit(self,data:BackTestData,params:dict):
-        entry_exits=self._get_entries_and_exists(params,close=data.df['Close'].values,
-                                                 open=data.df['Open'].values,
-                                                 high=data.df['High'].values,
-                                                 low=data.df['Low'].values,
-                                                 volume=data.df['Volume'].values)
-        stats=self.run_portfolio(data.df,entry_exits,TpSlComb(tp=0.05,sl=0.03))
+        '''Run the batch path on one combination, so the kernels it uses get compiled (or loaded from the numba cache)'''
+        self.get_result_from_backtest(data,{k:[v] for k,v in params.items()})
+
+    def warm_up(self,data:BackTestData):
+        '''
+        Once per process: later symbols and work units reuse the compiled dispatchers.
+        Timed as a stage of its own, the compile time stays out of the stages of the batches.
+        '''
+        key=(self.config.strategy.name,self.config.processor.engine,self.config.processor.signals,
+             self.config.strategy.type.get_direction())
+        if key in _warmed_up:
+            return
+        telemetry,self.telemetry=self.telemetry,Telemetry()
+        try:
+            with telemetry.stage('warm_up',1):
+                self._prepare_njit(data,self.params.single.to_dict())
+        finally:
+            self.telemetry=telemetry
+        _warmed_up.add(key)
+
+    def _get_kernel_args(self,df:pd.DataFrame,entry_exits: EntryExitResult) -> Dict:
+        no_exits=np.zeros((len(df),0),dtype=np.bool_)
+        long_exits=entry_exits.long_exits if entry_exits.long_exits is not None else no_exits
+        short_exits=entry_exits.short_exits if entry_exits.short_exits is not None else no_exits
+        return dict(
+            open=df['Open'].values.astype(np.float64),
+            high=df['High'].values.astype(np.float64),
+            low=df['Low'].values.astype(np.float64),
+            close=df['Close'].values.astype(np.float64),
+            long_entries=np.asarray(entry_exits.long_entries,dtype=np.bool_),
+            long_exits=np.asarray(long_exits,dtype=np.bool_),
+            short_entries=np.asarray(entry_exits.short_entries,dtype=np.bool_),
+            short_exits=np.asarray(short_exits,dtype=np.bool_),
+            direction=DIRECTION_CODES[self.config.strategy.type.get_direction()],
+            size=ORDER_SIZE,
+            fees=FEES,
+            init_cash=INIT_CASH,
+        )
+
+    @staticmethod
+    def _get_stop_values(tp_sl_index:pd.MultiIndex,name:str) -> np.ndarray:
+        '''NaN (stop disabled) when the level is not part of the grid'''
+        if name not in tp_sl_index.names:
+            return np.full(len(tp_sl_index),np.nan)
+        return tp_sl_index.get_level_values(name).values.astype(np.float64)
+
+    @staticmethod
+    def _kernel_to_stats(total_trades:np.ndarray,win_rate:np.ndarray,total_return:np.ndarray,index:pd.Index) -> pd.DataFrame:
+        return pd.DataFrame({'Total Trades':total_trades,
+                             'Win Rate [%]':win_rate*100,
+                             'Total Return [%]':total_return*100*100}, # same scale as run_portfolio
+                            index=index)
+
+    def run_portfolio_nb(self,df:pd.DataFrame,entry_exits: EntryExitResult,tp_sl: TpSlComb) -> pd.DataFrame:
+        n_cols=entry_exits.long_entries.shape[1]
+        total_trades,win_rate,total_return=simulate_portfolio_nb(
+            tp_stop=np.broadcast_to(np.asarray(tp_sl.tp,dtype=np.float64),(n_cols,)).copy(),
+            sl_stop=np.broadcast_to(np.asarray(tp_sl.sl,dtype=np.float64),(n_cols,)).copy(),
+            trail_stop=np.broadcast_to(np.asarray(tp_sl.trail if tp_sl.trail is not None else np.nan,dtype=np.float64),(n_cols,)).copy(),
+            be_stop=np.broadcast_to(np.asarray(tp_sl.be if tp_sl.be is not None else np.nan,dtype=np.float64),(n_cols,)).copy(),
+            **self._get_kernel_args(df,entry_exits)
+        )
+        return self._kernel_to_stats(total_trades,win_rate,total_return,entry_exits.get_columns())
+
+    def run_portfolio_grid(self,df:pd.DataFrame,entry_exits: EntryExitResult) -> pd.DataFrame:
+        '''
+        Walk the stop grid (TP/SL, plus trailing and break-even when enabled) as its own axis:
+        the signal matrices are passed once, no np.tile.
+        Same rows and index as _get_tp_sl + run_portfolio.
+        '''
+        tp_sl_index=self.config.strategy.size.get_combinations()
+        with self.telemetry.stage('portfolio',entry_exits.long_entries.shape[1]*len(tp_sl_index)): # stats are fused in the kernel
+            total_trades,win_rate,total_return=simulate_grid_nb(
+                tp_stops=self._get_stop_values(tp_sl_index,'tp_stop'),
+                sl_stops=self._get_stop_values(tp_sl_index,'sl_stop'),
+                trail_stops=self._get_stop_values(tp_sl_index,'trail_stop'),
+                be_stops=self._get_stop_values(tp_sl_index,'be_stop'),
+                **self._get_kernel_args(df,entry_exits)
+            )
+        index=product_multiindex(entry_exits.get_columns(),tp_sl_index)
+        return self._kernel_to_stats(total_trades,win_rate,total_return,index)
 
     def run_portfolio(self,df:pd.DataFrame,entry_exits: EntryExitResult,tp_sl: TpSlComb) -> pd.DataFrame: #TODO: Size и size_type исправить на percent 0.1
+        if self.config.processor.engine=='numba':
+            return self.run_portfolio_nb(df,entry_exits,tp_sl)
         direction=self.config.strategy.type.get_direction()
         params={
 
@@ -189,9 +333,9 @@ class MultiParamPortfolioBacktest:
             "upon_opposite_entry":'close',
             "tp_stop":tp_sl.tp,
             "sl_stop":tp_sl.sl,
-            "size":100,
-            "fees":0.001,
-            "init_cash":10000,
+            "size":ORDER_SIZE,
+            "fees":FEES,
+            "init_cash":INIT_CASH,
             "size_type":'value',
             "freq":df.index.freq,
         }
@@ -201,55 +345,111 @@ class MultiParamPortfolioBacktest:
             params.pop('short_entries')
         else:
             params.pop('entries')
-        stats=(vbt.Portfolio.from_signals(
-            close=df['Close'],
-            open=df['Open'],
-            high=df['High'],
-            low=df['Low'],
-            **params
-        )).stats(agg_func=None,metrics=METRICS)
+        n_cols=entry_exits.long_entries.shape[1]
+        with self.telemetry.stage('portfolio',n_cols):
+            pf=vbt.Portfolio.from_signals(
+                close=df['Close'],
+                open=df['Open'],
+                high=df['High'],
+                low=df['Low'],
+                **params
+            )
+        with self.telemetry.stage('stats',n_cols):
+            stats=pf.stats(agg_func=None,metrics=METRICS)
+        self.log_mem('Stats') # before the portfolio is freed
+        del pf
         gc.collect()
         stats['Total Return [%]']=stats['Total Return [%]']*100
         return stats
 
 
-    def get_result_from_backtest(self,data:BackTestData,params:Dict):
+    def get_result_from_backtest(self,data:BackTestData,params:Dict) -> BackTestResult:
         entry_exits=self._get_entries_and_exists(params,close=data.df['Close'].values,
                                                  open=data.df['Open'].values,
                                                  high=data.df['High'].values,
                                                  low=data.df['Low'].values,
                                                  volume=data.df['Volume'].values)
+        self.log_mem('Signals')
+
+        if self.config.processor.engine=='numba':
+            result=self.run_portfolio_grid(data.df,entry_exits)
 
-        if self.config.use_fast():
-            entry_exits,tp_sl=self._get_tp_sl(entry_exits)
+        elif self.config.use_fast():
+            with self.telemetry.stage('tp_sl_expand',entry_exits.long_entries.shape[1]):
+                entry_exits,tp_sl=self._get_tp_sl(entry_exits)
             result=self.run_portfolio(data.df,entry_exits,tp_sl)
 
         else:# self.config.strategy.size.use_fast:
             result=self._combination_via_tp_sl(data.df,entry_exits)
+        self.log_mem('Portfolio')
 
-        backtest_result=BackTestResult(ticker=data.ticker, result=result)
-        self.data_handler.save_result(backtest_result)
+        return BackTestResult(ticker=data.ticker, result=result)
 
+    def _get_lock(self,symbol:str):
+        return self.locks[zlib.crc32(symbol.encode()) % len(self.locks)] if self.locks else nullcontext()
 
-    def run_backtest_one_coin(self,data:BackTestData,total:int,idx_symbol:int):
-        self._prepare_njit(data,self.params.single.to_dict())
-        self._prepare_njit(data,self.params.single.to_dict())
-        total_comb=self.params_comb.get_total_combinations()
-        for idx,params in enumerate(self.params_comb.init_batch(self.config.processor.max_chunks, self.data_handler.get_combination_done(data.ticker))):
+    def save_batch(self,result:BackTestResult,ordinals:np.ndarray,space:ParamSpace):
+        '''Results and their ordinals in one commit, under the symbol lock'''
+        with self._get_lock(result.ticker), self.telemetry.stage('save',len(ordinals)):
+            self.telemetry.add_bytes('save',self.data_handler.save_result(result,ordinals,space))
+
+    def prepare_symbol(self,data:BackTestData):
+        if self.use_memo:
+            self.memo=new_memo(self.config.processor.memo_budget_mb*1024**2)
+        self.stop_tables=None
+        if not self.config.strategy.size.use_only_tp_sl:
+            self.stop_tables=get_stop_tables(data.df['High'].values,data.df['Low'].values)
+        self.warm_up(data)
+        self.planner=BatchPlanner(self.config,len(data.df))
+
+    def _run_batch(self,data:BackTestData,space:ParamSpace,params:Dict,ordinals:np.ndarray):
+        '''On MemoryError the batch is halved and retried, down to a single combination'''
+        try:
+            start=time.perf_counter()
+            self.planner.start_batch(len(ordinals))
+            self.save_batch(self.get_result_from_backtest(data,params),ordinals,space)
+            self.planner.end_batch()
+            self.telemetry.add_batch(data.ticker,len(ordinals),time.perf_counter()-start)
+        except MemoryError:
+            gc.collect()
+            self.planner.on_oom(len(ordinals))
+            if len(ordinals)==1:
+                logger.error(f'Mem is over for a single combination {params} of {data.ticker}, it stays undone for the next run')
+                return
+            half=len(ordinals)//2
+            for part in (ordinals[:half],ordinals[half:]):
+                self._run_batch(data,space,space.take(part),part)
+
+    def run_batches(self,data:BackTestData,total:int,idx:int,start:int=0,stop:Optional[int]=None):
+        space=self.params_comb.get_space()
+        with self._get_lock(data.ticker):
+            done=self.data_handler.get_done(data.ticker,space)
+        batches=self.params_comb.init_batch(self.planner.get_batch_size(),done,start,stop)
+        total_comb=max(len(batches),1)
+        n_done=0
+        for params in batches:
             try:
-                self.get_result_from_backtest(data,params)
-                progress_sym=((idx*self.config.processor.max_chunks)/total_comb)
-                self.progress_dict[self.pid]=(data.ticker, progress_sym, idx_symbol, total)
-                # self.log_mem(f'Memory used')
-                # logger.info(self.progress_dict[self.pid])
-            except MemoryError as mem_er:
-                logger.error(f'Mem is over. \n')
+                self._run_batch(data,space,params,batches.ordinals)
+                n_done+=len(batches.ordinals)
+                self.progress_dict[self.pid]=(data.ticker, n_done/total_comb, idx, total)
             except Exception as e:
-                pass
-                logger.error(f'Error handled\n {e}')
+                logger.error(f'Error handled, combinations stay undone for the next run\n {e}')
             finally:
                 gc.collect()
+                batches.batch_size=self.planner.get_batch_size()
+        if self.memo is not None:
+            logger.info(f'PID {self.pid} {data.ticker} memo: hits = {self.memo.hits}, misses = {self.memo.misses}, '
+                        f'{self.memo.nbytes / 1024**2:.1f} MB')
+
+    def run_backtest_one_coin(self,data:BackTestData,total:int,idx_symbol:int):
+        self.prepare_symbol(data)
+        self.run_batches(data,total,idx_symbol)
+        self.data_handler.compact_result(data.ticker)
+
 
+    def get_df(self,symbol:str) -> pd.DataFrame:
+        df=load_shared_df(self.shared_data,symbol) if self.shared_data else None
+        return df if df is not None else self.data_handler.get_df_with_datetime(symbol,*self.config.get_date())
 
     def run(self):
         total=len(self.symbols)
@@ -257,7 +457,7 @@ class MultiParamPortfolioBacktest:
         try:
             for idx,symbol in enumerate(self.symbols):
                 self.progress_dict[self.pid]=(symbol,0.0,idx,total)
-                df=self.data_handler.get_or_empty_df(symbol)
+                df=self.get_df(symbol)
                 if not df.empty:
                     data=BackTestData(ticker=symbol,df=df)
                     self.run_backtest_one_coin(data,total,idx)
@@ -269,6 +469,37 @@ class MultiParamPortfolioBacktest:
             logger.info(f'Finished PID {self.pid}')
             self.progress_dict[self.pid] = ("done", 1.0, total,total)
 
+    def run_units(self,queue,total:int):
+        '''
+        Scheduler worker: pull WorkUnit (symbol, ordinal range) from the shared queue until None.
+        The symbol data is kept while consecutive units belong to the same symbol.
+        '''
+        data=None
+        symbol=None
+        idx=0
+        try:
+            while True:
+                unit:Optional[WorkUnit]=queue.get()
+                if unit is None:
+                    break
+                if unit.symbol!=symbol:
+                    symbol=unit.symbol
+                    df=self.get_df(symbol)
+                    data=BackTestData(ticker=symbol,df=df) if not df.empty else None
+                    if data is not None:
+                        self.prepare_symbol(data)
+                self.progress_dict[self.pid]=(symbol,0.0,idx,total)
+                if data is not None:
+                    self.run_batches(data,total,idx,unit.start,unit.stop)
+                else:
+                    logger.info(f'Empty dataframe, symbol = {symbol}')
+                idx+=1
+        except Exception as e:
+            logger.exception(f'Critical Error when backtest Ticker = {symbol}\n {e}')
+        finally:
+            logger.info(f'Finished PID {self.pid}')
+            self.progress_dict[self.pid] = ("done", 1.0, idx,total)
+
 
 
 
@@ -1,8 +1,8 @@
-from typing import Tuple,Dict
+from typing import Tuple,Dict,Optional
 
 import numpy as np
 import pandas as pd
-from numba import njit
+from numba import njit,prange
 
 from src.app.utils.config_loader import get_main_config,get_param_config
 from src.app.strategies import get_strategy,get_indicator
@@ -15,49 +15,119 @@ from src.common.loggers import get_logger
 
 
 
-@njit
-def _get_exits(close:np.ndarray,high:np.ndarray,low:np.ndarray,long_entries:np.ndarray,short_entries:np.ndarray,tp_pct:float,sl_pct:float) -> Tuple[np.ndarray,np.ndarray]:
+@njit(cache=True)
+def _sparse_table(src:np.ndarray,is_max:bool) -> np.ndarray:
+    '''
+    table[k, i] = max (or min) of src[i:i + 2**k], NaN ignored. Row 0 is src itself.
+    Kept in the dtype of src: float32 bars (the raw store) give a float32 table, half the memory, same comparisons.
+    '''
+    n=len(src)
+    levels=1
+    while (1 << levels) <= n:
+        levels+=1
+    table=np.full((levels,n),np.nan,dtype=src.dtype)
+    table[0,:]=src
+    for k in range(1,levels):
+        half=1 << (k-1)
+        for i in range(n-(1 << k)+1):
+            a=table[k-1,i]
+            b=table[k-1,i+half]
+            if np.isnan(a) or (not np.isnan(b) and ((b > a) if is_max else (b < a))):
+                a=b
+            table[k,i]=a
+    return table
+
+
+@njit(cache=True)
+def _first_hit(table:np.ndarray,start:int,level:float,above:bool) -> int:
+    '''
+    First index j >= start with src[j] >= level (above) or src[j] <= level (not above), len(src) if none.
+    Binary lifting over the sparse table: O(log n).
+    '''
+    n=table.shape[1]
+    pos=start
+    for k in range(table.shape[0]-1,-1,-1):
+        if pos+(1 << k) <= n:
+            value=table[k,pos]
+            hit=(value >= level) if above else (value <= level)
+            if not hit:
+                pos+=1 << k
+    return pos
+
+
+@njit(cache=True)
+def _next_true(mask:np.ndarray) -> np.ndarray:
+    n=len(mask)
+    result=np.empty(n+1,dtype=np.int64)
+    result[n]=n
+    for i in range(n-1,-1,-1):
+        result[i]=i if mask[i] else result[i+1]
+    return result
+
+
+@njit(cache=True)
+def _resolve_exits(close:np.ndarray,next_entry:np.ndarray,exits:np.ndarray,
+                   tp_table:np.ndarray,sl_table:np.ndarray,
+                   tp_pct:float,sl_pct:float,is_long:bool):
+    n=len(exits)
+    i=next_entry[0]
+    while i < n:
+        entry_price=close[i]
+        if np.isnan(entry_price):
+            i=next_entry[i+1]
+            continue
+        if is_long:
+            j_tp=_first_hit(tp_table,i+1,entry_price*(1+tp_pct),True)
+            j_sl=_first_hit(sl_table,i+1,entry_price*(1-sl_pct),False)
+        else:
+            j_tp=_first_hit(tp_table,i+1,entry_price*(1-tp_pct),False)
+            j_sl=_first_hit(sl_table,i+1,entry_price*(1+sl_pct),True)
+        j=min(j_tp,j_sl)
+        if j >= n:
+            break
+        exits[j]=True
+        i=next_entry[j+1]
+
+
+@njit(cache=True)
+def get_stop_tables(high:np.ndarray,low:np.ndarray) -> Tuple[np.ndarray,np.ndarray]:
+    '''Sparse max table of high and min table of low for _get_exits; they depend on the bars only, build once per symbol'''
+    return _sparse_table(high,True),_sparse_table(low,False)
+
+
+def _get_exits(close:np.ndarray,high:np.ndarray,low:np.ndarray,long_entries:np.ndarray,short_entries:np.ndarray,
+               tp_pct:np.ndarray,sl_pct:np.ndarray,tables:Optional[Tuple[np.ndarray,np.ndarray]]=None) -> Tuple[np.ndarray,np.ndarray]:
+    '''tables: get_stop_tables(high, low) of the symbol, built here when not given'''
+    high_max,low_min=tables if tables is not None else get_stop_tables(high,low)
+    return _get_exits_nb(close,long_entries,short_entries,tp_pct,sl_pct,high_max,low_min)
+
+
+@njit(parallel=True,cache=True)
+def _get_exits_nb(close:np.ndarray,long_entries:np.ndarray,short_entries:np.ndarray,tp_pct:np.ndarray,sl_pct:np.ndarray,
+                  high_max:np.ndarray,low_min:np.ndarray) -> Tuple[np.ndarray,np.ndarray]:
+    '''
+    Exit signals at the first bar after entry where TP or SL (priced off the entry close) is touched.
+
+    One forward pass per column: entries while a position is open are ignored, the next entry is
+    taken strictly after the exit bar. Long and short sides are tracked independently.
+    The first-hit bar is found by binary lifting over sparse max/min tables of high/low, so a column
+    costs O(trades * log n) instead of a scan from every entry.
+
+    tp_pct/sl_pct are equal-length vectors of (tp, sl) pairs; output has n_cols * n_pairs columns,
+    column col * n_pairs + pair.
+    '''
     n_timestamps = long_entries.shape[0]
     n_combinations = long_entries.shape[1]
+    n_pairs = len(tp_pct)
 
-    long_exits = np.zeros_like(long_entries, dtype=np.bool_)
-    short_exits= np.zeros_like(short_entries, dtype=np.bool_)
-    for col_idx in range(n_combinations):
-        entry_price_long = -1.0
-        entry_price_short =-1.0
-        long_col = long_entries[:, col_idx]
-        short_col= short_entries[:,col_idx]
-
-        for i in range(n_timestamps):
-            if long_col[i] and entry_price_long < 0:
-                entry_price_long = close[i]
-                tp_level = entry_price_long * (1 + tp_pct)
-                sl_level = entry_price_long * (1 - sl_pct)
-
-                for j in range(i + 1, n_timestamps):
-                    if high[j] >= tp_level:
-                        long_exits[j, col_idx] = True
-                        entry_price_long = -1.0
-                        break
-                    elif low[j] <= sl_level:
-                        long_exits[j, col_idx] = True
-                        entry_price_long = -1.0
-                        break
-
-            if short_col[i] and entry_price_short < 0:
-                entry_price_short = close[i]
-                tp_level = entry_price_short * (1 - tp_pct)
-                sl_level = entry_price_short * (1 + sl_pct)
-
-                for j in range(i + 1, n_timestamps):
-                    if high[j] <= tp_level:
-                        short_exits[j, col_idx] = True
-                        entry_price_short = -1.0
-                        break
-                    elif low[j] >= sl_level:
-                        short_exits[j, col_idx] = True
-                        entry_price_short = -1.0
-                        break
-
+    long_exits = np.zeros((n_timestamps,n_combinations*n_pairs), dtype=np.bool_)
+    short_exits= np.zeros((n_timestamps,n_combinations*n_pairs), dtype=np.bool_)
+    for col_idx in prange(n_combinations):
+        next_long = _next_true(long_entries[:, col_idx])
+        next_short= _next_true(short_entries[:,col_idx])
+        for pair_idx in range(n_pairs):
+            out_idx=col_idx*n_pairs+pair_idx
+            _resolve_exits(close,next_long,long_exits[:,out_idx],high_max,low_min,tp_pct[pair_idx],sl_pct[pair_idx],True)
+            _resolve_exits(close,next_short,short_exits[:,out_idx],low_min,high_max,tp_pct[pair_idx],sl_pct[pair_idx],False)
 
     return long_exits,short_exits
@@ -0,0 +1,115 @@
+import multiprocessing as mp
+import sys
+from math import ceil
+from multiprocessing.managers import DictProxy
+from typing import Dict, List, Optional
+
+from src.app.backtester.combination_generation import ParamCombinationsGenerator
+from src.app.backtester.engine import MultiParamPortfolioBacktest
+from src.app.data.csv_handler import DataHandler
+from src.app.data.shared_data import SharedDataStore
+from src.app.data.types import SharedData
+from src.app.models import MainConfig, WorkUnit
+from src.app.utils.config_loader import get_param_config
+from src.app.utils.telemetry import get_summary_table, merge_reports
+from src.common.loggers import get_logger, console
+
+log = get_logger('scheduler', False)
+
+UNITS_PER_WORKER = 4  # enough units that idle workers always find work at the end of the run
+LOCK_STRIPES = 64
+
+
+def run_worker(config_dict: Dict, pid: int, queue, locks: List, total: int,
+               progress_dict: Optional[DictProxy], shared_data: Optional[SharedData], telemetry_dir: Optional[str]):
+    config = MainConfig(**config_dict)
+    bt = MultiParamPortfolioBacktest(config, pid, [], progress_dict, shared_data, locks)
+    bt.run_units(queue, total)
+    bt.telemetry.dump(telemetry_dir)
+
+
+class BacktestScheduler:
+    '''
+    Splits every symbol's combo space into (symbol, ordinal range) units and feeds them from one shared queue
+    to max_processors workers, so a worker that finishes early pulls the next unit instead of idling.
+    Longest histories are queued first. Writes of the same symbol are serialized by striped locks,
+    results are compacted once all workers are done.
+    '''
+    def __init__(self, config: MainConfig, symbols: List[str], progress_dict: Optional[DictProxy] = None):
+        self.config = config
+        self.symbols = symbols
+        self.progress_dict = progress_dict
+        self.data_handler = DataHandler(config)
+        self.units: List[WorkUnit] = []
+        self.processes: List[mp.Process] = []
+        self.n_workers = 0
+        self._store: Optional[SharedDataStore] = None
+        self.telemetry_dir: Optional[str] = None
+        self.report: Optional[Dict] = None
+
+    def plan_units(self) -> List[WorkUnit]:
+        space = ParamCombinationsGenerator(get_param_config(self.config.strategy.name)).get_space()
+        if not self.symbols or not space.size:
+            return []
+        max_chunks = self.config.processor.max_chunks
+        n_ranges = ceil(self.config.processor.max_processors * UNITS_PER_WORKER / len(self.symbols))
+        unit_size = ceil(ceil(space.size / n_ranges) / max_chunks) * max_chunks
+        raw_store = self.data_handler.get_raw_store()
+        rows = {symbol: (raw_store.get_manifest(symbol).rows if raw_store.exists(symbol) else 0) for symbol in self.symbols}
+
+        units = []
+        for symbol in sorted(self.symbols, key=lambda symbol: -rows[symbol]):
+            done = self.data_handler.get_done(symbol, space)
+            for start in range(0, space.size, unit_size):
+                stop = min(start + unit_size, space.size)
+                if not done.covers(start, stop):
+                    units.append(WorkUnit(symbol=symbol, start=start, stop=stop))
+        return units
+
+    def __enter__(self) -> 'BacktestScheduler':
+        self.units = self.plan_units()
+        self.n_workers = min(self.config.processor.max_processors, len(self.units))
+        log.info(f'Scheduled {len(self.units)} units on {self.n_workers} workers')
+        if not self.units:
+            return self
+
+        self._store = SharedDataStore(self.data_handler).__enter__()
+        try:
+            shared_data = self._store.load(list(dict.fromkeys(unit.symbol for unit in self.units)))
+            queue = mp.Queue()
+            for unit in self.units:
+                queue.put(unit)
+            for _ in range(self.n_workers):
+                queue.put(None)
+            locks = [mp.Lock() for _ in range(LOCK_STRIPES)]
+
+            config_dict = self.config.to_dict()
+            if self.config.processor.telemetry:
+                self.telemetry_dir = self.data_handler.get_folderpath_telemetry()
+            for pid in range(self.n_workers):
+                if self.progress_dict is not None:
+                    self.progress_dict[pid] = ('idle', 0.0, 0, len(self.units))
+                p = mp.Process(target=run_worker,
+                               args=(config_dict, pid, queue, locks, len(self.units), self.progress_dict, shared_data,
+                                     self.telemetry_dir))
+                p.start()
+                self.processes.append(p)
+        except BaseException:  # the shared files must not outlive a failed start
+            self.__exit__(*sys.exc_info())
+            raise
+        return self
+
+    def is_alive(self) -> bool:
+        return any(p.is_alive() for p in self.processes)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        for p in self.processes:
+            p.join()
+        if self._store is not None:
+            self._store.__exit__(exc_type, exc_val, exc_tb)
+        for symbol in dict.fromkeys(unit.symbol for unit in self.units):
+            self.data_handler.compact_result(symbol)
+        if self.telemetry_dir:
+            self.report = merge_reports(self.telemetry_dir)
+            console.print(get_summary_table(self.report))
+            log.info(f'Telemetry report: {self.telemetry_dir}/report.json')
@@ -0,0 +1,115 @@
+import hashlib
+import io
+import re
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from src.common.loggers import get_logger
+from src.app.models import MainConfig
+from src.app.data.types import KlineArchive
+from src.app.data.csv_handler import DataHandler
+from src.app.data.raw_store import RAW_DTYPE, to_ms
+from src.app.data.coverage import Interval, subtract_intervals
+
+log = get_logger('archives', False)
+
+ARCHIVE_NAME = re.compile(r'^(?P<symbol>[A-Z0-9]+)-(?P<interval>\w+)-(?P<period>\d{4}-\d{2}(?:-\d{2})?)\.zip$')
+MICROSECONDS = 10 ** 14  # open times above this are in µs (spot archives since 2025), futures archives use ms
+
+
+def parse_archive(path: str) -> np.ndarray:
+    '''
+    Records of one archive, parsed column-wise by the pandas C reader straight into int64/float32.
+    The CSV has a header row in newer archives only; <archive>.CHECKSUM (sha256) is verified when it was downloaded too.
+    '''
+    with open(path, 'rb') as f:
+        content = f.read()
+    checksum_path = Path(path + '.CHECKSUM')
+    if checksum_path.exists() and checksum_path.read_text().split()[0] != hashlib.sha256(content).hexdigest():
+        raise ValueError('checksum mismatch')
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        data = archive.read(archive.namelist()[0])
+    df = pd.read_csv(io.BytesIO(data), header=None, skiprows=int(not data[:1].isdigit()), usecols=range(6),
+                     dtype={0: np.int64, **{column: np.float32 for column in range(1, 6)}}, engine='c')
+    records = np.empty(len(df), dtype=RAW_DTYPE)
+    times = df[0].values
+    records['time'] = times // 1000 if len(times) and times[0] > MICROSECONDS else times
+    for column, name in enumerate(RAW_DTYPE.names[1:], start=1):
+        records[name] = df[column].values
+    return records
+
+
+class ArchiveIngestor:
+    '''
+    Bulk import of the kline archives of data.binance.vision from a local folder (any layout below it) into the raw store.
+    Archives are parsed in a process pool; the parent merges every symbol in one write once all its archives are parsed
+    and marks their whole periods covered, so the downloader afterwards only asks the exchange for the rest (the tail
+    after the last archive). Archives of periods already covered are skipped without being read, daily archives
+    inside a monthly one of the same folder too; bars present in both the store and an archive are kept once.
+    '''
+    def __init__(self, config: MainConfig):
+        self.config = config
+        self.settings = config.download
+        self.timeframe = config.strategy.time.get_store_timeframe()
+        self.store = DataHandler(config).get_raw_store()
+
+    def find_archives(self, folder: Path) -> List[KlineArchive]:
+        archives = []
+        for path in sorted(Path(folder).rglob('*.zip')):
+            match = ARCHIVE_NAME.match(path.name)
+            if match is None or match['interval'] != self.timeframe:
+                continue
+            daily = len(match['period']) == 10
+            start = pd.Timestamp(match['period'] if daily else f"{match['period']}-01")
+            end = start + (pd.Timedelta(days=1) if daily else pd.DateOffset(months=1))
+            archives.append(KlineArchive(path=str(path), symbol=match['symbol'], period=match['period'],
+                                         start=to_ms(start), end=to_ms(end) - 1, daily=daily))
+        return archives
+
+    def get_pending(self, archives: List[KlineArchive], coverage: Dict[str, List[Interval]]) -> List[KlineArchive]:
+        monthly = {(archive.symbol, archive.period) for archive in archives if not archive.daily}
+        pending = []
+        for archive in archives:
+            in_month = archive.daily and (archive.symbol, archive.period[:7]) in monthly
+            if not in_month and subtract_intervals(archive.start, archive.end, coverage.get(archive.symbol, [])):
+                pending.append(archive)
+        return pending
+
+    def _write(self, symbol: str, parsed: List[np.ndarray], periods: List[Interval]) -> int:
+        records = np.concatenate(parsed) if parsed else np.empty(0, dtype=RAW_DTYPE)
+        self.store.write_records(symbol, records)
+        self.store.add_coverage(symbol, periods)
+        return len(records)
+
+    def ingest(self, folder: Path) -> int:
+        started = time.perf_counter()
+        archives = self.find_archives(folder)
+        pending = self.get_pending(archives, self.store.get_coverage())
+        log.info(f'{len(archives)} {self.timeframe} archives in {folder}, {len(pending)} not in the raw store yet')
+        remaining: Dict[str, int] = {}
+        for archive in pending:
+            remaining[archive.symbol] = remaining.get(archive.symbol, 0) + 1
+        parsed: Dict[str, List[np.ndarray]] = {symbol: [] for symbol in remaining}
+        periods: Dict[str, List[Interval]] = {symbol: [] for symbol in remaining}
+        rows = 0
+        with ProcessPoolExecutor(max_workers=self.settings.archive_workers) as pool:
+            futures = {pool.submit(parse_archive, archive.path): archive for archive in pending}
+            for future in as_completed(futures):
+                archive = futures[future]
+                try:
+                    parsed[archive.symbol].append(future.result())
+                    periods[archive.symbol].append((archive.start, archive.end))
+                except Exception as e:  # the period stays uncovered, the downloader fetches it
+                    log.error(f'Error reading archive {archive.path}: {e}')
+                remaining[archive.symbol] -= 1
+                if not remaining[archive.symbol]:  # write while the pool parses the next symbols
+                    rows += self._write(archive.symbol, parsed.pop(archive.symbol), periods.pop(archive.symbol))
+        log.info(f'Ingested {rows} klines of {len(remaining)} symbols from {len(pending)} archives '
+                 f'in {time.perf_counter() - started:.1f}s')
+        return rows
@@ -0,0 +1,60 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+Interval = Tuple[int, int]  # [start, end] open times in ms, both inclusive
+
+
+def merge_intervals(intervals: List[Interval]) -> List[Interval]:
+    '''Sorted, disjoint; intervals that touch (next start == end + 1) are joined'''
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(start: int, end: int, covered: List[Interval]) -> List[Interval]:
+    '''Parts of [start, end] outside the sorted disjoint covered intervals'''
+    missing = []
+    for covered_start, covered_end in covered:
+        if covered_end < start:
+            continue
+        if covered_start > end:
+            break
+        if covered_start > start:
+            missing.append((start, covered_start - 1))
+        start = max(start, covered_end + 1)
+        if start > end:
+            return missing
+    if start <= end:
+        missing.append((start, end))
+    return missing
+
+
+class CoverageFile:
+    '''
+    coverage.json of a raw store folder: symbol -> covered intervals. Covered means the store knows every bar there:
+    bars were written, or the exchange was asked and had none (before listing, outages), so it is not asked again.
+    Planning a download of all symbols reads only this file.
+    '''
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def load(self) -> Dict[str, List[Interval]]:
+        if not self.path.exists():
+            return {}
+        with open(self.path) as f:
+            return {symbol: [tuple(interval) for interval in intervals] for symbol, intervals in json.load(f).items()}
+
+    def save(self, coverage: Dict[str, List[Interval]]):
+        tmp_path = self.path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({symbol: [list(interval) for interval in intervals] for symbol, intervals in coverage.items()}, f)
+        os.replace(tmp_path, self.path)
@@ -1,21 +1,23 @@
 import os
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
 from typing import Optional, List, Dict,Tuple
-import pyarrow as pa
-import pyarrow.parquet as pq
 
 
 from src.common.loggers import get_logger
 from src.app.models import MainConfig,BackTestResult
-from src.app.data.types import COLUMNS_RAW,COLUMNS_RESULT,FormatDataReader
-from src.app.strategies.registry import get_strategy
+from src.app.data.types import COLUMNS_RAW,COLUMNS_RESULT,STOP_LEVELS,FormatDataReader
+from src.app.strategies.registry import get_param_names
+from src.app.backtester.combination_generation import OrdinalRanges,ParamSpace
+from src.app.data.raw_store import RawStore,to_ms
+from src.app.data.result_store import ResultStore
 log=get_logger('data_handler',False)
 
 class DataHandler:
     FORMAT=FormatDataReader.PARQUET
-    FOLDER_PATH={'raw':'data/raw/','processed':'data/processed','analysis':'data/analysis'}
+    FOLDER_PATH={'raw':'data/raw/','processed':'data/processed','analysis':'data/analysis','telemetry':'data/telemetry','resampled':'data/resampled'}
 
     def __init__(self,config:MainConfig):
         self.config=config
@@ -27,7 +29,7 @@ class DataHandler:
         levels_to_keep = []
 
         for i, name in enumerate(current_names):
-            if name and ('tp_stop' in name or 'sl_stop' in name):
+            if name and any(stop in name for stop in STOP_LEVELS):
                 continue
             elif name and name.startswith(f'{self.config.strategy.name}_'):
                 new_name = name.split('_',1)[1]
@@ -44,10 +46,32 @@ class DataHandler:
         return multiindex_cleaned
 
     def _get_filepath_raw(self,ticker:str) -> str:
-        folder_path = Path(self.FOLDER_PATH['raw']) / self.config.strategy.time.timeframe
+        '''Old CSV raw file, only read to migrate it into the binary store'''
+        folder_path = Path(self.FOLDER_PATH['raw']) / self.config.strategy.time.get_store_timeframe()
         folder_path.mkdir(parents=True, exist_ok=True)
         return str(folder_path / f'{ticker}.csv')
 
+    def get_raw_store(self) -> RawStore:
+        timeframe=self.config.strategy.time.get_store_timeframe()
+        return RawStore(Path(self.FOLDER_PATH['raw']) / timeframe, timeframe)
+
+    def get_bar_store(self):
+        '''Bars to backtest: the raw store, or with time.base_timeframe the timeframe resampled from it (ResampledStore)'''
+        time=self.config.strategy.time
+        store=self.get_raw_store()
+        if time.get_store_timeframe()==time.timeframe:
+            return store
+        from src.app.data.resample import ResampledStore # numba only where bars are read
+        return ResampledStore(store,Path(self.FOLDER_PATH['resampled']) / time.get_store_timeframe() / time.timeframe,time.timeframe)
+
+    def migrate_raw_csv(self) -> int:
+        '''One-shot migration of every CSV of the current timeframe into the binary store'''
+        store=self.get_raw_store()
+        migrated=0
+        for filepath in sorted(store.folder.glob('*.csv')):
+            migrated+=store.migrate_csv(filepath.stem,filepath)
+        return migrated
+
     def _get_folderpath_result(self) -> os.path:
         start_date=self.config.strategy.time.start_date.date()
         end_date=self.config.strategy.time.end_date.date()
@@ -64,6 +88,14 @@ class DataHandler:
         folder_path_symbol.mkdir(parents=True, exist_ok=True)
         return folder_path
 
+    def get_folderpath_telemetry(self) -> str:
+        start_date=self.config.strategy.time.start_date.date()
+        end_date=self.config.strategy.time.end_date.date()
+        run=datetime.now().strftime('%Y%m%d_%H%M%S')
+        folder_path = Path(self.FOLDER_PATH['telemetry']) / f'{start_date}_{end_date}' / self.config.strategy.time.timeframe / f'{self.config.strategy.name}' / run
+        folder_path.mkdir(parents=True, exist_ok=True)
+        return str(folder_path)
+
     def _get_filepath_analysis(self,name:str,ticker:bool):
         folder_path=self._get_folderpath_analysis()
         return str(folder_path / f'{name}.csv') if not ticker else str(folder_path / 'symbols' / f'{name}.csv')
@@ -73,45 +105,56 @@ class DataHandler:
         return str(folder_path / f'{ticker}.{self.FORMAT}')
 
 
+    def get_result_store(self) -> ResultStore:
+        return ResultStore(self._get_folderpath_result())
+
     def _get_all_symbol_in_folder(self) -> List[str]:
+        if self.FORMAT==FormatDataReader.PARQUET:
+            return self.get_result_store().get_symbols()
         folder_path=self._get_folderpath_result()
         return [file.stem for file in folder_path.glob(f"*.{self.FORMAT}")]
 
 
-    def get_or_empty_df(self,ticker:str) -> pd.DataFrame:
-        filepath=self._get_filepath_raw(ticker)
-        if os.path.exists(filepath):
-            df= pd.read_csv(filepath,index_col='Open Time',parse_dates=True)
-            df = df.sort_index()
-            df = df[~df.index.duplicated(keep='first')]
-            df = df.asfreq(pd.infer_freq(df.index))
-            return df
-        else:
+    def get_or_empty_df(self,ticker:str,start:Optional[datetime]=None,end:Optional[datetime]=None) -> pd.DataFrame:
+        store=self.get_raw_store()
+        filepath=Path(self._get_filepath_raw(ticker))
+        if not store.exists(ticker) and filepath.exists():
+            store.migrate_csv(ticker,filepath)
+        store=self.get_bar_store()
+        records=store.read_records(ticker,
+                                   to_ms(start) if start is not None else None,
+                                   to_ms(end) if end is not None else None)
+        if not len(records):
             return pd.DataFrame(columns=COLUMNS_RAW)
+        df=RawStore.records_to_df(records)
+        if store.step:
+            df = df.asfreq(pd.tseries.frequencies.to_offset(pd.Timedelta(store.step,unit='ms')))
+        elif len(df)>2:
+            df = df.asfreq(pd.infer_freq(df.index))
+        return df
 
 
     def get_index_result_keys(self):
-        return [f'{self.config.strategy.name}_{param}' for param in get_strategy(self.config.strategy.name).param_names]
+        return [f'{self.config.strategy.name}_{param}' for param in get_param_names(self.config.strategy.name)]
 
 
     def get_df_with_datetime(self,ticker:str,start:datetime,end:datetime) -> pd.DataFrame:
-        df= self.get_or_empty_df(ticker)
-        df=df.loc[start:end]
-        return df
+        return self.get_or_empty_df(ticker,start,end)
 
 
     def get_result_or_empty_df(self,ticker:str) -> pd.DataFrame:
         filepath=self._get_filepath_result(ticker)
-        if os.path.exists(filepath):
-            if self.FORMAT==FormatDataReader.CSV:
+        df=None
+        if self.FORMAT==FormatDataReader.CSV:
+            if os.path.exists(filepath):
                 df=pd.read_csv(filepath,index_col=[])
-                param_cols = self.get_index_result_keys() + ['tp_stop', 'sl_stop']
+                param_cols = self.get_index_result_keys() + list(self.config.strategy.size.get_combinations().names)
                 df = df.set_index(param_cols)
-            else:
-                df=pd.read_parquet(filepath,engine='pyarrow')
-
         else:
-            params_names=[f'{self.config.strategy.name}_{param}' for param in get_strategy(self.config.strategy.name).param_names]
+            df=self.get_result_store().read(ticker)
+
+        if df is None:
+            params_names=self.get_index_result_keys()
             index = pd.MultiIndex.from_arrays([[] for _ in params_names], names=params_names)
             df=pd.DataFrame(columns=COLUMNS_RESULT,index=index)
         return df
@@ -137,45 +180,63 @@ class DataHandler:
 
 
 
-    def save_raw_data(self, ticker:str, df:pd.DataFrame):
-        filepath=self._get_filepath_raw(ticker)
-        header=True
-        mode='w'
-        if os.path.exists(filepath):
-            header=False
-            mode='a'
-        df.to_csv(filepath,index=True,mode=mode,header=header,index_label='Open Time')
-
-
-    def save_result(self, result: BackTestResult):
+    def _get_ordinals(self,index:pd.MultiIndex,space:ParamSpace) -> np.ndarray:
+        '''Ordinals of the combos of a cleaned result index'''
+        if set(index.names)==set(space.keys):
+            index=index.reorder_levels(space.keys)
+        return space.get_ordinals(index.unique())
+
+    def get_done(self,ticker:str,space:ParamSpace) -> OrdinalRanges:
+        '''
+        Ordinals of space already saved for ticker, as committed with the result parts (a few [start, stop) runs).
+        Without them (old results or changed param space) they are rebuilt once from the result index.
+        '''
+        if self.FORMAT==FormatDataReader.CSV:
+            index=self.get_combination_done(ticker)
+            return OrdinalRanges.from_ordinals(self._get_ordinals(index,space) if index is not None else [])
+        store=self.get_result_store()
+        fingerprint=space.fingerprint()
+        done=store.get_done(ticker,fingerprint)
+        if done is None:
+            ordinals=[self._get_ordinals(self.clean_multiindex_names(store.read_index(ticker,part)),space)
+                      for part in store.get_manifest(ticker).parts]
+            done=OrdinalRanges.from_ordinals(np.concatenate(ordinals))
+            store.set_done(ticker,done,fingerprint)
+        return done
+
+
+    def save_raw_data(self, ticker:str, records:np.ndarray):
+        '''Raw store records (see RAW_DTYPE)'''
+        store=self.get_raw_store()
+        filepath=Path(self._get_filepath_raw(ticker))
+        if not store.exists(ticker) and filepath.exists():
+            store.migrate_csv(ticker,filepath)
+        store.write_records(ticker,records)
+
+
+    def save_result(self, result: BackTestResult, ordinals:Optional[np.ndarray]=None, space:Optional[ParamSpace]=None) -> int:
+        '''Returns bytes written; ordinals of the result combinations in space are committed with them'''
         filepath = self._get_filepath_result(result.ticker)
+        if (result.result is None) or result.result.empty:
+            return 0
         rounded_columns=['Total Return [%]']
         result.result[rounded_columns] = result.result[rounded_columns].round(2)
-        write_header = not (os.path.exists(filepath) and os.path.getsize(filepath) > 0)
-        if (result.result is not None) and (not result.result.empty):
-            if self.FORMAT==FormatDataReader.CSV:
-                result.result.to_csv(
-                    filepath,
-                    columns=COLUMNS_RESULT,
-                    mode='a',
-                    header=write_header,
-                )
-            else: # Логика для Parquet
-                filtered_data = result.result[COLUMNS_RESULT]
-                table = pa.Table.from_pandas(filtered_data, preserve_index=True)
-
-                if os.path.exists(filepath):
-
-                    existing_table = pq.read_table(filepath)
-
-                    combined_table = pa.concat_tables([existing_table, table])
-
-                    with pq.ParquetWriter(filepath, combined_table.schema) as writer:
-                        writer.write_table(combined_table)
-
-                else:
-                    with pq.ParquetWriter(filepath, table.schema) as writer:
-                        writer.write_table(table)
+        if self.FORMAT==FormatDataReader.CSV:
+            size_before = os.path.getsize(filepath) if os.path.exists(filepath) else 0
+            result.result.to_csv(
+                filepath,
+                columns=COLUMNS_RESULT,
+                mode='a',
+                header=size_before==0,
+            )
+            return os.path.getsize(filepath)-size_before
+        else: # Parquet: one part file per batch, no rewrite of stored results
+            return self.get_result_store().write(result.ticker,result.result[COLUMNS_RESULT],ordinals,
+                                                 space.fingerprint() if space is not None else None)
+
+    def compact_result(self,ticker:str):
+        if self.FORMAT==FormatDataReader.PARQUET:
+            self.get_result_store().compact(ticker)
 
     def save_analysis(self,df:pd.DataFrame,name:str,ticker:bool=False):
         filepath=self._get_filepath_analysis(name,ticker)
@@ -1,30 +1,37 @@
 import asyncio
-import pandas as pd
-from binance import AsyncClient,Client
-from binance.enums import HistoricalKlinesType
+import time
+import aiohttp
+import numpy as np
+import requests
 from datetime import datetime
 import os
-from typing import Union, List
+from typing import Union, List, Tuple, Dict, Any, Optional
 import logging
 
 
 from src.common.loggers import get_logger
 
 from src.app.models import MainConfig
-from src.app.data.types import COLUMNS_RAW,DataCoverage,DataRange
+from src.app.data.types import COLUMNS_RAW
 from src.app.data.csv_handler import DataHandler
+from src.app.data.raw_store import timeframe_to_ms,to_ms
+from src.app.data.rate_limit import WeightLimiter,kline_weight,USED_WEIGHT_HEADER
+from src.app.data.coverage import Interval,subtract_intervals
+from src.app.data.klines import KlineBuffer
 
-
-
+KLINES_PATH='/fapi/v1/klines'
+EXCHANGE_INFO_PATH='/fapi/v1/exchangeInfo'
+EXCHANGE_INFO_WEIGHT=1
+RETRY_STATUSES=(418,429,500,502,503,504)
+FLUSH_ROWS=100_000 # klines of the tail range kept in memory before an in order append to the raw store
+CALENDAR_STEP_MS=31*24*60*60*1000 # longest 1M bar, sizes the request windows of calendar timeframes
 
 
 def get_symbols(config:MainConfig) -> List[str]:
     if config.strategy.symbols.use_all:
-        client=Client()
-        try:
-            exchange_info=client.futures_exchange_info()
-        finally:
-            client.close_connection()
+        response=requests.get(config.download.base_url+EXCHANGE_INFO_PATH,timeout=30)
+        response.raise_for_status()
+        exchange_info=response.json()
         symbols = [
             s['symbol']
             for s in exchange_info['symbols']
@@ -37,27 +44,69 @@ def get_symbols(config:MainConfig) -> List[str]:
 
 
 class BinanceDataDownloader:
+    '''
+    What to fetch comes from the coverage manifest of the raw store (no bar data is read): the parts of
+    start_date..end_date outside the covered intervals, internal gaps included. Every missing range of a symbol
+    is split into request sized windows (download.limit klines), fetched concurrently under the request weight
+    budget of the IP (WeightLimiter) and at most download.max_requests requests in flight, retried with backoff
+    on 429/418/5xx/network errors. A window is marked covered once its klines are stored, also when the exchange
+    had none, so an interrupted download resumes where it stopped and empty history is not asked for again.
+    '''
     def __init__(self,config: MainConfig):
         self.config=config
+        self.settings=config.download
         self.data_handler=DataHandler(config)
+        self.timeframe=config.strategy.time.get_store_timeframe()
+        self.step=timeframe_to_ms(self.timeframe)
+        self.limiter=WeightLimiter(self.settings.weight_limit,self.settings.weight_window)
 
 
         logging.basicConfig(level=logging.INFO)
         self.logger = get_logger('downloader',False)
 
-        self.tasks=[]
+        self.session:Optional[aiohttp.ClientSession]=None
+        self.requests=asyncio.Semaphore(self.settings.max_requests)
 
     async def __aenter__(self):
-        self.client = await AsyncClient.create()
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.client:
-            await self.client.close_connection()
+        if self.session:
+            await self.session.close()
+
+    async def _request(self,path:str,params:Dict[str,Any],weight:int,raw:bool=False) -> Any:
+        '''Decoded JSON, or the body bytes with raw'''
+        if not self.session:
+            raise RuntimeError("Client not initialized")
+        for attempt in range(self.settings.retries+1):
+            delay=self.settings.backoff*2**attempt
+            await self.limiter.acquire(weight)
+            async with self.requests:
+                sent_at=self.limiter.clock()
+                try:
+                    async with self.session.get(self.settings.base_url+path,params=params) as response:
+                        used=response.headers.get(USED_WEIGHT_HEADER)
+                        if used is not None:
+                            self.limiter.update(int(used),sent_at)
+                        if response.status==200:
+                            return await (response.read() if raw else response.json())
+                        if response.status not in RETRY_STATUSES:
+                            raise RuntimeError(f'{path} {params}: HTTP {response.status} {await response.text()}')
+                        if response.status in (418,429): # over the limit: everyone waits, not only this request
+                            delay=float(response.headers.get('Retry-After',delay))
+                            self.limiter.pause(delay)
+                        error=f'HTTP {response.status}'
+                except (aiohttp.ClientError,asyncio.TimeoutError) as e:
+                    error=repr(e)
+            if attempt<self.settings.retries:
+                self.logger.warning(f'{path} {params}: {error}, retry {attempt+1}/{self.settings.retries} in {delay:.1f}s')
+                await asyncio.sleep(delay)
+        raise RuntimeError(f'{path} {params}: {error} after {self.settings.retries} retries')
 
     async def _get_symbols(self) -> List[str]:
         if self.config.strategy.symbols.use_all:
-            exchange_info=await self.client.futures_exchange_info()
+            exchange_info=await self._request(EXCHANGE_INFO_PATH,{},EXCHANGE_INFO_WEIGHT)
             symbols = [
                 s['symbol']
                 for s in exchange_info['symbols']
@@ -67,86 +116,97 @@ class BinanceDataDownloader:
             symbols=self.config.strategy.symbols.symbols
         return symbols
 
-    async def _download_klines(
-            self,
-            symbol: str,
-            start_time: Union[str, datetime, int],
-            end_time: Union[str, datetime, int],
-    ) -> List:
-
-        if not self.client:
-            raise RuntimeError("Client not initialized")
-
-
+    def get_windows(self,start:int,end:int) -> List[Tuple[int,int]]:
+        '''[start, end] open times in ms (both inclusive, as the klines endpoint takes them), one request each'''
+        span=(self.step or CALENDAR_STEP_MS)*self.settings.limit
+        return [(window,min(window+span-1,end)) for window in range(start,end+1,span)]
+
+    async def _download_klines(self,symbol:str,start:int,end:int) -> bytes:
+        '''Body of the response, parsed by KlineBuffer.append'''
+        return await self._request(KLINES_PATH,
+                                   {'symbol':symbol,'interval':self.timeframe,
+                                    'startTime':start,'endTime':end,'limit':self.settings.limit},
+                                   kline_weight(self.settings.limit),raw=True)
+
+    def get_missing(self,symbol:str,coverage:Dict[str,List[Interval]]) -> List[Interval]:
+        start,end=to_ms(self.config.strategy.time.start_date),to_ms(self.config.strategy.time.end_date)
+        return subtract_intervals(start,end,coverage.get(symbol,[]))
+
+    def _save(self,symbol:str,records:np.ndarray,windows:List[Interval]) -> int:
+        '''Store klines, then mark their windows covered up to the last closed bar: the open one is fetched again'''
+        if len(records):
+            self.data_handler.save_raw_data(symbol,records)
+        closed=int(time.time()*1000)-(self.step or CALENDAR_STEP_MS)
+        self.data_handler.get_raw_store().add_coverage(symbol,[(start,min(end,closed)) for start,end in windows if start<=closed])
+        return len(records)
+
+    async def download_ranges(self,symbol:str,ranges:List[Interval],append:bool) -> int:
+        '''
+        append: the range after everything covered, completed windows are appended in time order every FLUSH_ROWS.
+        Otherwise (internal gaps, history before the stored data) all windows are merged into the store in one write.
+        Pages are parsed into one KlineBuffer as they arrive, no Python object per kline is kept.
+        '''
+        windows=[window for start,end in ranges for window in self.get_windows(start,end)]
+        tasks=[asyncio.create_task(self._download_klines(symbol,*window)) for window in windows]
+        buffer=KlineBuffer(FLUSH_ROWS+self.settings.limit)
+        done=[]
+        rows=0
         try:
-            klines = await self.client.get_historical_klines(
-                symbol=symbol,
-                interval=self.config.strategy.time.timeframe,
-                start_str=str(start_time),
-                end_str=str(end_time),
-                klines_type=HistoricalKlinesType.FUTURES
-            )
-            return klines
-
-        except Exception as e:
-            self.logger.error(f"Error donwload data: {e}")
+            for window,task in zip(windows,tasks): # in time order, later windows keep downloading meanwhile
+                buffer.append(await task)
+                done.append(window)
+                if append and len(buffer)>=FLUSH_ROWS:
+                    rows+=self._save(symbol,buffer.take(),done)
+                    done=[]
+        except BaseException:
+            if append: # the windows before the failed one are contiguous, keep them
+                self._save(symbol,buffer.take(),done)
             raise
-
-
-
-    def klines_to_dataframe(self, klines: List) -> pd.DataFrame:
-        if not klines:
-            return pd.DataFrame()
-        data = {
-            'Open': [float(row[1]) for row in klines],
-            'High': [float(row[2]) for row in klines],
-            'Low': [float(row[3]) for row in klines],
-            'Close': [float(row[4]) for row in klines],
-            'Volume': [float(row[5]) for row in klines]
-        }
-
-        index = pd.to_datetime([float(row[0]) for row in klines], unit='ms')
-        df = pd.DataFrame(data, index=index, dtype='float32')
-        return df
-
-    def get_df_coverage(self,symbol:str) -> List[DataRange]:
-        df=self.data_handler.get_or_empty_df(symbol)
-
-        dc=DataCoverage(time_start=self.config.strategy.time.start_date, time_end=self.config.strategy.time.end_date,
-                        data_start=df.index.min() if not df.empty else None, data_end=df.index.max() if not df.empty else None
-                        )
-        return dc.get_overlap()
-
+        finally:
+            for task in tasks:
+                task.cancel()
+        return rows+self._save(symbol,buffer.take(),done)
 
     async def download_and_save(
             self,
-            symbol: str
-    ):
-
-        data_coverages=self.get_df_coverage(symbol)
-        for data_range in data_coverages:
-            klines = await self._download_klines(
-                symbol=symbol,
-                start_time=data_range.start_time,
-                end_time=data_range.end_time,
-            )
-            df = self.klines_to_dataframe(klines)
-            if df.empty:
-                self.logger.info('Take emtry DataFrame')
-                continue
-
-            self.data_handler.save_raw_data(symbol, df)
+            symbol: str,
+            coverage: Optional[Dict[str,List[Interval]]]=None
+    ) -> int:
+        coverage=coverage if coverage is not None else self.data_handler.get_raw_store().get_coverage()
+        missing=self.get_missing(symbol,coverage)
+        covered_end=coverage[symbol][-1][1] if coverage.get(symbol) else None
+        tail=[r for r in missing if covered_end is None or r[0]>covered_end]
+        gaps=[r for r in missing if r not in tail]
+        rows=0
+        if gaps:
+            self.logger.info(f'{symbol}: filling {len(gaps)} gaps, {sum(end-start+1 for start,end in gaps)/60_000:.0f} min')
+            rows+=await self.download_ranges(symbol,gaps,append=False)
+        if tail:
+            rows+=await self.download_ranges(symbol,tail,append=True)
+        if missing and not rows:
+            self.logger.info(f'Take emtry DataFrame, symbol = {symbol}')
+        return rows
 
 
     async def download_multiple_symbols(
             self
     ):
+        self.data_handler.migrate_raw_csv()
         symbols=await self._get_symbols()
-        for symbol in symbols:
-            data_coverages=self.get_df_coverage(symbol)
-            if data_coverages:
-                await asyncio.sleep(0.5)
-                task=asyncio.create_task(self.download_and_save(symbol))
-                self.tasks.append(task)
-
-        await asyncio.gather(*self.tasks)
\ No newline at end of file
+        coverage=self.data_handler.get_raw_store().get_coverage()
+        symbols=[symbol for symbol in symbols if self.get_missing(symbol,coverage)]
+        self.logger.info(f'{len(symbols)} symbols miss klines')
+        started=time.perf_counter()
+        running=asyncio.Semaphore(self.settings.max_symbols)
+
+        async def download(symbol:str) -> int:
+            async with running:
+                try:
+                    return await self.download_and_save(symbol,coverage)
+                except Exception as e:
+                    self.logger.error(f'Error donwload data {symbol}: {e}')
+                    return 0
+
+        rows=await asyncio.gather(*(download(symbol) for symbol in symbols))
+        self.logger.info(f'Downloaded {sum(rows)} klines of {len(symbols)} symbols in {time.perf_counter()-started:.1f}s, '
+                         f'{self.limiter.waited:.1f}s waited for the request weight budget')
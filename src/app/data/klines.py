@@ -0,0 +1,56 @@
+import numpy as np
+
+from src.app.data.raw_store import RAW_DTYPE
+
+KLINE_FIELDS = 12  # open time, OHLCV, close time, quote volume, trades, taker buy base/quote, ignore
+REMOVED = b'[]" \n'
+
+
+def parse_klines(body: bytes) -> np.ndarray:
+    '''
+    Raw body of a /fapi/v1/klines response -> (rows, KLINE_FIELDS) float64, parsed by numpy in C without building
+    a Python object per value. Every field is a number (prices as quoted strings, quotes and brackets are dropped);
+    open times in ms stay exact in float64.
+    '''
+    rows = body.count(b'[') - 1
+    if rows <= 0:
+        return np.empty((0, KLINE_FIELDS))
+    values = np.fromstring(body.translate(None, REMOVED), sep=',')
+    if values.size != rows * KLINE_FIELDS:
+        raise ValueError(f'Unexpected klines response: {body[:200]!r}')
+    return values.reshape(rows, KLINE_FIELDS)
+
+
+class KlineBuffer:
+    '''
+    Growable buffer of raw store records (int64 open time + float32 OHLCV columns). Response pages are parsed
+    straight into its free tail, capacity doubles when full; take() hands the filled part to one store write.
+    '''
+    def __init__(self, capacity: int = 1 << 16):
+        self.records = np.empty(capacity, dtype=RAW_DTYPE)
+        self.rows = 0
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def _reserve(self, rows: int):
+        if self.rows + rows > len(self.records):
+            records = np.empty(max(2 * len(self.records), self.rows + rows), dtype=RAW_DTYPE)
+            records[:self.rows] = self.records[:self.rows]
+            self.records = records
+
+    def append(self, body: bytes) -> int:
+        values = parse_klines(body)
+        rows = len(values)
+        self._reserve(rows)
+        page = self.records[self.rows:self.rows + rows]
+        for field, name in enumerate(RAW_DTYPE.names):
+            page[name] = values[:, field]
+        self.rows += rows
+        return rows
+
+    def take(self) -> np.ndarray:
+        '''Filled records, valid until the next append: write them before the buffer is reused'''
+        records = self.records[:self.rows]
+        self.rows = 0
+        return records
@@ -0,0 +1,64 @@
+import asyncio
+import time
+from typing import Callable
+
+USED_WEIGHT_HEADER = 'X-MBX-USED-WEIGHT-1M'
+
+
+def kline_weight(limit: int) -> int:
+    '''Request weight of /fapi/v1/klines for a given limit'''
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+class WeightLimiter:
+    '''
+    Request weight budget of one IP per minute, counted in fixed windows aligned to the minute as the exchange does.
+    acquire(weight) admits requests in FIFO order once their weight fits into the current window,
+    update() takes the server count (X-MBX-USED-WEIGHT-1M) of the current window when it is ahead of the local one,
+    pause() holds every request after a 429/418 until Retry-After has passed.
+    '''
+    def __init__(self, limit: int, window: float = 60.0, clock: Callable[[], float] = time.time):
+        self.limit = limit
+        self.window = window
+        self.clock = clock
+        self.used = 0
+        self.window_start = 0.0
+        self.paused_until = 0.0
+        self.waited = 0.0  # seconds spent waiting for the budget, for the download report
+        self._lock = asyncio.Lock()
+
+    def _roll(self, now: float):
+        window_start = now - now % self.window
+        if window_start != self.window_start:
+            self.window_start = window_start
+            self.used = 0
+
+    async def acquire(self, weight: int):
+        async with self._lock:
+            while True:
+                now = self.clock()
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                else:
+                    self._roll(now)
+                    if self.used + weight <= self.limit:
+                        self.used += weight
+                        return
+                    delay = self.window_start + self.window - now
+                self.waited += delay
+                await asyncio.sleep(delay)
+
+    def update(self, used_weight: int, sent_at: float):
+        '''sent_at: clock() when the request left; a count from the previous minute must not fill the new one'''
+        self._roll(self.clock())
+        if sent_at >= self.window_start:
+            self.used = max(self.used, used_weight)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, self.clock() + seconds)
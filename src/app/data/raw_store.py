@@ -0,0 +1,169 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.common.loggers import get_logger
+from src.app.data.types import COLUMNS_RAW, RawManifest
+from src.app.data.coverage import CoverageFile, Interval, merge_intervals
+
+log = get_logger('raw_store', False)
+
+COVERAGE_NAME = 'coverage.json'
+RAW_DTYPE = np.dtype([('time', '<i8')] + [(column, '<f4') for column in COLUMNS_RAW[1:]])
+
+
+def timeframe_to_ms(timeframe: str) -> Optional[int]:
+    '''Binance interval -> bar length in ms, None for calendar intervals (1M)'''
+    if timeframe.endswith('M'):
+        return None
+    return int(pd.Timedelta(timeframe.replace('m', 'min') if timeframe.endswith('m') else timeframe).total_seconds() * 1000)
+
+
+def to_ms(value) -> int:
+    return int(pd.Timestamp(value).value // 1_000_000)
+
+
+class RawStore:
+    '''
+    Per symbol binary store of klines: <ticker>.bin holds contiguous records (int64 ms open time + float32 OHLCV),
+    sorted by time without duplicates. <ticker>.json is the manifest (rows, first/last open time, gaps).
+    Reads are memory-mapped, a date window only touches the rows inside it.
+    coverage.json holds the covered intervals of every symbol (see data/coverage.py), updated on every write.
+    '''
+    def __init__(self, folder: Path, timeframe: str):
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.step = timeframe_to_ms(timeframe)
+        self.coverage = CoverageFile(self.folder / COVERAGE_NAME)
+
+    def _get_filepaths(self, ticker: str) -> Tuple[Path, Path]:
+        return self.folder / f'{ticker}.bin', self.folder / f'{ticker}.json'
+
+    def exists(self, ticker: str) -> bool:
+        return all(path.exists() for path in self._get_filepaths(ticker))
+
+    def get_manifest(self, ticker: str) -> Optional[RawManifest]:
+        _, manifest_path = self._get_filepaths(ticker)
+        if not manifest_path.exists():
+            return None
+        with open(manifest_path) as f:
+            return RawManifest(**json.load(f))
+
+    def _get_gaps(self, time: np.ndarray) -> List[Tuple[int, int]]:
+        if self.step is None or len(time) < 2:
+            return []
+        idx = np.flatnonzero(np.diff(time) > self.step)
+        return [(int(time[i]) + self.step, int(time[i + 1])) for i in idx]
+
+    def _get_runs(self, time: np.ndarray) -> List[Interval]:
+        '''Intervals covered by consecutive bars, a bar covers [open, open + step)'''
+        if not len(time):
+            return []
+        if self.step is None:
+            return [(int(time[0]), int(time[-1]))]
+        breaks = np.flatnonzero(np.diff(time) > self.step)
+        starts = np.concatenate(([0], breaks + 1))
+        ends = np.concatenate((breaks, [len(time) - 1]))
+        return [(int(time[i]), int(time[j]) + self.step - 1) for i, j in zip(starts, ends)]
+
+    def _manifest_runs(self, manifest: RawManifest) -> List[Interval]:
+        if not manifest.rows:
+            return []
+        step = manifest.step or 1
+        edges = [manifest.first] + [edge for gap in manifest.gaps for edge in gap] + [manifest.last + step]
+        return [(start, end - 1) for start, end in zip(edges[::2], edges[1::2])]
+
+    def get_coverage(self) -> Dict[str, List[Interval]]:
+        '''Covered intervals of every symbol; a store written before coverage.json is indexed from its manifests'''
+        if not self.coverage.exists():
+            coverage = {}
+            for manifest_path in sorted(self.folder.glob('*.json')):
+                if manifest_path.name != COVERAGE_NAME:
+                    coverage[manifest_path.stem] = self._manifest_runs(self.get_manifest(manifest_path.stem))
+            self.coverage.save(coverage)
+            return coverage
+        return self.coverage.load()
+
+    def add_coverage(self, ticker: str, intervals: List[Interval]):
+        if not intervals:
+            return
+        coverage = self.get_coverage()
+        coverage[ticker] = merge_intervals(coverage.get(ticker, []) + list(intervals))
+        self.coverage.save(coverage)
+
+    def _write_manifest(self, ticker: str, manifest: RawManifest):
+        _, manifest_path = self._get_filepaths(ticker)
+        tmp_path = manifest_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest.model_dump(), f)
+        os.replace(tmp_path, manifest_path)
+
+    def read_records(self, ticker: str, start: Optional[int] = None, end: Optional[int] = None) -> np.ndarray:
+        '''Records with start <= time <= end (ms), memory-mapped; empty array when nothing is stored'''
+        data_path, _ = self._get_filepaths(ticker)
+        manifest = self.get_manifest(ticker)
+        if manifest is None or not manifest.rows:
+            return np.empty(0, dtype=RAW_DTYPE)
+        records = np.memmap(data_path, dtype=RAW_DTYPE, mode='r', shape=(manifest.rows,))
+        lo = np.searchsorted(records['time'], start, side='left') if start is not None else 0
+        hi = np.searchsorted(records['time'], end, side='right') if end is not None else manifest.rows
+        return records[lo:hi]
+
+    @staticmethod
+    def df_to_records(df: pd.DataFrame) -> np.ndarray:
+        records = np.empty(len(df), dtype=RAW_DTYPE)
+        records['time'] = df.index.values.astype('datetime64[ms]').view(np.int64)
+        for column in COLUMNS_RAW[1:]:
+            records[column] = df[column].values
+        return records
+
+    @staticmethod
+    def records_to_df(records: np.ndarray) -> pd.DataFrame:
+        index = pd.DatetimeIndex(records['time'].astype('datetime64[ms]').astype('datetime64[ns]'), name=COLUMNS_RAW[0])
+        return pd.DataFrame({column: np.asarray(records[column]) for column in COLUMNS_RAW[1:]}, index=index)
+
+    def write(self, ticker: str, df: pd.DataFrame):
+        self.write_records(ticker, self.df_to_records(df))
+
+    def write_records(self, ticker: str, records: np.ndarray):
+        '''Append klines; new rows after the stored ones are appended in place, anything else is merged and rewritten'''
+        new = np.sort(records, order='time', kind='stable')
+        new = new[np.concatenate(([True], np.diff(new['time']) > 0))] if len(new) else new
+        if not len(new):
+            return
+        data_path, _ = self._get_filepaths(ticker)
+        manifest = self.get_manifest(ticker)
+        if manifest is not None and manifest.rows and data_path.exists() and new['time'][0] > manifest.last:
+            with open(data_path, 'r+b') as f:
+                f.truncate(manifest.rows * RAW_DTYPE.itemsize)  # drop rows of an append the manifest never saw
+                f.seek(0, os.SEEK_END)
+                new.tofile(f)
+            manifest.gaps += self._get_gaps(np.concatenate(([manifest.last], new['time'])))
+            manifest.rows += len(new)
+            manifest.last = int(new['time'][-1])
+        else:
+            old = np.array(self.read_records(ticker)) if manifest is not None else np.empty(0, dtype=RAW_DTYPE)
+            merged = np.concatenate((new, old))  # new rows win on duplicated open time
+            _, first = np.unique(merged['time'], return_index=True)
+            merged = merged[first]
+            tmp_path = data_path.with_suffix('.bin.tmp')
+            merged.tofile(tmp_path)
+            os.replace(tmp_path, data_path)
+            time = merged['time']
+            manifest = RawManifest(rows=len(time), first=int(time[0]), last=int(time[-1]),
+                                   step=self.step, gaps=self._get_gaps(time))
+        self._write_manifest(ticker, manifest)
+        self.add_coverage(ticker, self._get_runs(new['time']))
+
+    def migrate_csv(self, ticker: str, csv_path: Path) -> bool:
+        '''One-shot import of the old <ticker>.csv, renamed to .csv.bak afterwards'''
+        df = pd.read_csv(csv_path, index_col=COLUMNS_RAW[0], parse_dates=True)
+        if not df.empty:
+            self.write(ticker, df)
+        os.replace(csv_path, csv_path.with_suffix('.csv.bak'))
+        log.info(f'Migrated {csv_path} to binary store, rows = {len(df)}')
+        return not df.empty
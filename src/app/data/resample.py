@@ -0,0 +1,127 @@
+import fcntl
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from numba import njit
+
+from src.common.loggers import get_logger
+from src.app.data.raw_store import RAW_DTYPE, RawStore, timeframe_to_ms
+
+log = get_logger('resample', False)
+
+WEEK_ORIGIN_MS = 4 * 24 * 60 * 60 * 1000  # weekly bars open on Monday 00:00 UTC, the epoch was a Thursday
+
+
+@njit(cache=True)
+def _resample_kernel(time, open, high, low, close, volume, step, origin,
+                     out_time, out_open, out_high, out_low, out_close, out_volume) -> int:
+    '''One pass over sorted base bars; a bin without base bars gives no bar, as a gap in the exchange data does'''
+    n_out = 0
+    bar_volume = 0.0  # summed in float64, stored as float32 once the bar is complete
+    for i in range(len(time)):
+        bin_start = (time[i] - origin) // step * step + origin
+        if n_out == 0 or bin_start != out_time[n_out - 1]:
+            if n_out:
+                out_volume[n_out - 1] = bar_volume
+            out_time[n_out] = bin_start
+            out_open[n_out] = open[i]
+            out_high[n_out] = high[i]
+            out_low[n_out] = low[i]
+            bar_volume = 0.0
+            n_out += 1
+        else:
+            out_high[n_out - 1] = max(out_high[n_out - 1], high[i])
+            out_low[n_out - 1] = min(out_low[n_out - 1], low[i])
+        out_close[n_out - 1] = close[i]
+        bar_volume += volume[i]
+    if n_out:
+        out_volume[n_out - 1] = bar_volume
+    return n_out
+
+
+def resample_records(records: np.ndarray, step: int, origin: int = 0) -> np.ndarray:
+    '''Raw store records -> records of bars step ms long opening at origin + k * step; a trailing bar may be partial'''
+    if not len(records):
+        return np.empty(0, dtype=RAW_DTYPE)
+    time = records['time']
+    n_max = min(len(records), int((time[-1] - origin) // step - (time[0] - origin) // step) + 1)
+    out = np.empty(n_max, dtype=RAW_DTYPE)
+    n_out = _resample_kernel(time, records['Open'], records['High'], records['Low'], records['Close'],
+                             records['Volume'], step, origin, out['time'], out['Open'], out['High'], out['Low'],
+                             out['Close'], out['Volume'])
+    return out[:n_out]
+
+
+class ResampledStore:
+    '''
+    Read side of a timeframe that is not stored but built from the raw store of a finer base (time.base_timeframe).
+    The whole history of a symbol is resampled once into <ticker>.npy (RAW_DTYPE records, memory-mapped on read);
+    <ticker>.json keeps the fingerprint of the base data it was built from, any write to the base rebuilds it.
+    Builds hold <ticker>.lock, so processes reading the same ticker at once build it once; files are written under
+    unique temporary names and atomically replaced. Same read_records/step as RawStore, so DataHandler reads either.
+    '''
+    def __init__(self, base: RawStore, folder: Path, timeframe: str):
+        self.base = base
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.step = timeframe_to_ms(timeframe)
+        if self.step is None or base.step is None or self.step % base.step:
+            raise ValueError(f'{timeframe} cannot be resampled from {base.folder.name} bars')
+        self.origin = WEEK_ORIGIN_MS if timeframe.endswith('w') else 0
+
+    def fingerprint(self, ticker: str) -> Optional[str]:
+        '''Base manifest plus size and mtime of its data file: changes with every write to the base'''
+        manifest = self.base.get_manifest(ticker)
+        data_path, _ = self.base._get_filepaths(ticker)
+        if manifest is None or not data_path.exists():
+            return None
+        stat = data_path.stat()
+        return f'{manifest.rows}:{manifest.first}:{manifest.last}:{stat.st_size}:{stat.st_mtime_ns}'
+
+    def _get_filepaths(self, ticker: str):
+        return self.folder / f'{ticker}.npy', self.folder / f'{ticker}.json'
+
+    def _get_cached(self, ticker: str) -> Optional[str]:
+        data_path, key_path = self._get_filepaths(ticker)
+        if not (key_path.exists() and data_path.exists()):
+            return None
+        with open(key_path) as f:
+            return json.load(f).get('fingerprint')
+
+    @contextmanager
+    def _lock(self, ticker: str):
+        with open(self.folder / f'{ticker}.lock', 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)  # released when the file is closed
+            yield
+
+    def _replace(self, path: Path, write, mode: str):
+        with tempfile.NamedTemporaryFile(mode, dir=self.folder, prefix=f'{path.name}.', suffix='.tmp',
+                                         delete=False) as f:
+            write(f)
+        os.replace(f.name, path)
+
+    def _build(self, ticker: str, fingerprint: str):
+        data_path, key_path = self._get_filepaths(ticker)
+        records = resample_records(self.base.read_records(ticker), self.step, self.origin)
+        self._replace(data_path, lambda f: np.save(f, records), 'wb')
+        self._replace(key_path, lambda f: json.dump({'fingerprint': fingerprint}, f), 'w')
+        log.info(f'Resampled {ticker} to {self.folder.name}, rows = {len(records)}')
+
+    def read_records(self, ticker: str, start: Optional[int] = None, end: Optional[int] = None) -> np.ndarray:
+        '''Bars with start <= open time <= end (ms), rebuilt first when the base changed'''
+        fingerprint = self.fingerprint(ticker)
+        if fingerprint is None:
+            return np.empty(0, dtype=RAW_DTYPE)
+        if self._get_cached(ticker) != fingerprint:
+            with self._lock(ticker):
+                if self._get_cached(ticker) != fingerprint:  # not built by another process meanwhile
+                    self._build(ticker, fingerprint)
+        records = np.load(self._get_filepaths(ticker)[0], mmap_mode='r')
+        lo = np.searchsorted(records['time'], start, side='left') if start is not None else 0
+        hi = np.searchsorted(records['time'], end, side='right') if end is not None else len(records)
+        return records[lo:hi]
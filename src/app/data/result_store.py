@@ -0,0 +1,163 @@
+import json
+import os
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.common.loggers import get_logger
+from src.app.backtester.combination_generation import OrdinalRanges
+from src.app.data.types import ResultManifest
+
+log = get_logger('result_store', False)
+
+MANIFEST_NAME = '_manifest.json'
+SYMBOL_FIELD = 'symbol'  # column of the ticker folder in get_dataset
+
+
+class ResultStore:
+    '''
+    Append-only parquet results: every batch is a new part file under <folder>/<ticker>/.
+    The manifest is the commit marker: a part is visible only after the manifest listing it has been
+    atomically replaced, so a crash leaves at most an orphan file that the next compaction removes.
+    The manifest also holds the param space ordinals of the stored combinations as [start, stop) runs, updated
+    in the same commit as the part, so what is done never disagrees with what is stored.
+    '''
+    def __init__(self, folder: Path):
+        self.folder = Path(folder)
+
+    def _get_folderpath(self, ticker: str) -> Path:
+        return self.folder / ticker
+
+    def _get_filepath_legacy(self, ticker: str) -> Path:
+        return self.folder / f'{ticker}.parquet'
+
+    def get_manifest(self, ticker: str) -> ResultManifest:
+        manifest_path = self._get_folderpath(ticker) / MANIFEST_NAME
+        if not manifest_path.exists():
+            return ResultManifest()
+        with open(manifest_path) as f:
+            return ResultManifest(**json.load(f))
+
+    def _commit(self, ticker: str, manifest: ResultManifest):
+        manifest_path = self._get_folderpath(ticker) / MANIFEST_NAME
+        tmp_path = manifest_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest.model_dump(), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, manifest_path)
+
+    def _adopt_legacy(self, ticker: str):
+        '''Old single <ticker>.parquet becomes the first part'''
+        legacy_path = self._get_filepath_legacy(ticker)
+        if not legacy_path.exists():
+            return
+        folder_path = self._get_folderpath(ticker)
+        folder_path.mkdir(parents=True, exist_ok=True)
+        manifest = self.get_manifest(ticker)
+        part_name = f'part-{manifest.next_part:06d}.parquet'
+        os.replace(legacy_path, folder_path / part_name)
+        manifest.parts.append(part_name)
+        manifest.next_part += 1
+        self._commit(ticker, manifest)
+
+    def get_symbols(self) -> List[str]:
+        symbols = {path.parent.name for path in self.folder.glob(f'*/{MANIFEST_NAME}')}
+        symbols.update(path.stem for path in self.folder.glob('*.parquet'))
+        return sorted(symbols)
+
+    def exists(self, ticker: str) -> bool:
+        return bool(self.get_manifest(ticker).parts) or self._get_filepath_legacy(ticker).exists()
+
+    def write(self, ticker: str, df: pd.DataFrame, ordinals: Optional[np.ndarray] = None,
+              fingerprint: Optional[str] = None) -> int:
+        '''Returns bytes written; ordinals of the combinations of df in the param space of fingerprint'''
+        self._adopt_legacy(ticker)
+        folder_path = self._get_folderpath(ticker)
+        folder_path.mkdir(parents=True, exist_ok=True)
+        manifest = self.get_manifest(ticker)
+        part_name = f'part-{manifest.next_part:06d}.parquet'
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=True), folder_path / part_name)
+        if ordinals is not None and fingerprint is not None and (
+                fingerprint == manifest.fingerprint or not manifest.parts):
+            done = OrdinalRanges(manifest.done).union(OrdinalRanges.from_ordinals(ordinals))
+            manifest.fingerprint, manifest.done = fingerprint, done.to_list()
+        else:  # other param space or unknown combinations: rebuilt from the parts on the next get_done
+            manifest.fingerprint, manifest.done = None, []
+        manifest.parts.append(part_name)
+        manifest.next_part += 1
+        self._commit(ticker, manifest)
+        return (folder_path / part_name).stat().st_size
+
+    def get_done(self, ticker: str, fingerprint: str) -> Optional[OrdinalRanges]:
+        '''Ordinals stored for the param space of fingerprint, None when they have to be rebuilt from the parts'''
+        self._adopt_legacy(ticker)
+        manifest = self.get_manifest(ticker)
+        if not manifest.parts:
+            return OrdinalRanges()
+        return OrdinalRanges(manifest.done) if manifest.fingerprint == fingerprint else None
+
+    def set_done(self, ticker: str, done: OrdinalRanges, fingerprint: str):
+        manifest = self.get_manifest(ticker)
+        manifest.fingerprint, manifest.done = fingerprint, done.to_list()
+        self._commit(ticker, manifest)
+
+    def read_index(self, ticker: str, part_name: str) -> pd.Index:
+        '''Index of a committed part, the other columns are not read'''
+        table = pq.read_table(self._get_folderpath(ticker) / part_name, columns=[], use_pandas_metadata=True)
+        return table.to_pandas().index
+
+    def read_table(self, ticker: str, columns: Optional[List[str]] = None) -> Optional[pa.Table]:
+        self._adopt_legacy(ticker)
+        manifest = self.get_manifest(ticker)
+        if not manifest.parts:
+            return None
+        folder_path = self._get_folderpath(ticker)
+        tables = [pq.read_table(folder_path / part, columns=columns) for part in manifest.parts]
+        return pa.concat_tables(tables, promote_options='default')
+
+    def get_dataset(self, tickers: Optional[List[str]] = None) -> Optional[ds.Dataset]:
+        '''
+        Committed parts of the tickers (all by default) as one lazy dataset, the ticker folder becomes the symbol column.
+        Nothing is read here: scans project columns and push filters down to the parquet row groups.
+        '''
+        paths = []
+        for ticker in tickers if tickers is not None else self.get_symbols():
+            self._adopt_legacy(ticker)
+            paths += [str(self._get_folderpath(ticker) / part) for part in self.get_manifest(ticker).parts]
+        if not paths:
+            return None
+        return ds.dataset(paths, format='parquet', partition_base_dir=str(self.folder),
+                          partitioning=ds.partitioning(pa.schema([(SYMBOL_FIELD, pa.string())])))
+
+    def read(self, ticker: str) -> Optional[pd.DataFrame]:
+        table = self.read_table(ticker)
+        return table.to_pandas() if table is not None else None
+
+    def compact(self, ticker: str, min_parts: int = 2):
+        '''
+        Merge all committed parts into one, rows of the same index kept once (the last written). The new part
+        is committed before the old ones are deleted, files not listed in the manifest (leftovers of a crash)
+        are removed as well. The done runs are kept as they are.
+        '''
+        manifest = self.get_manifest(ticker)
+        if len(manifest.parts) < min_parts:
+            return
+        folder_path = self._get_folderpath(ticker)
+        part_name = f'part-{manifest.next_part:06d}.parquet'
+        df = self.read(ticker)
+        df = df[~df.index.duplicated(keep='last')]
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=True), folder_path / part_name)
+        old_parts = manifest.parts
+        self._commit(ticker, ResultManifest(parts=[part_name], next_part=manifest.next_part + 1,
+                                            fingerprint=manifest.fingerprint, done=manifest.done))
+        for path in folder_path.glob('part-*'):
+            if path.name != part_name:
+                path.unlink(missing_ok=True)
+        log.info(f'Compacted {len(old_parts)} parts of {ticker}')
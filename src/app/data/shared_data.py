@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.common.loggers import get_logger
+from src.app.data.csv_handler import DataHandler
+from src.app.data.types import COLUMNS_RAW, SharedData
+
+log = get_logger('shared_data', False)
+
+SHM_DIR = '/dev/shm'
+
+
+def _get_filepaths(folder: str, symbol: str):
+    return os.path.join(folder, f'{symbol}.time.npy'), os.path.join(folder, f'{symbol}.ohlcv.npy')
+
+
+class SharedDataStore:
+    '''
+    Parent side: read the backtest window (strategy.time) of every symbol once and share it with the workers
+    as memory-mapped .npy files.
+    The files live on /dev/shm when available, so all processes map the same pages of RAM.
+    Use as a context manager, the files are removed on exit. A symbol that does not fit (/dev/shm of a
+    container is 64 MB by default) is not shared, its workers read it from the store themselves.
+    '''
+    def __init__(self, data_handler: DataHandler):
+        self.data_handler = data_handler
+        self.folder: Optional[str] = None
+
+    def __enter__(self) -> 'SharedDataStore':
+        base_dir = SHM_DIR if os.path.isdir(SHM_DIR) and os.access(SHM_DIR, os.W_OK) else None
+        self.folder = tempfile.mkdtemp(prefix='fast_backtest_', dir=base_dir)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.folder:
+            shutil.rmtree(self.folder, ignore_errors=True)
+            self.folder = None
+
+    def load(self, symbols: List[str]) -> SharedData:
+        shared = SharedData(folder=self.folder)
+        start, end = self.data_handler.config.get_date()
+        for symbol in symbols:
+            df = self.data_handler.get_df_with_datetime(symbol, start, end)
+            if df.empty:
+                continue
+            time_path, ohlcv_path = _get_filepaths(self.folder, symbol)
+            try:
+                np.save(time_path, df.index.values.astype('datetime64[ns]').view(np.int64))
+                np.save(ohlcv_path, np.ascontiguousarray(df[COLUMNS_RAW[1:]].values))
+            except OSError as e:
+                log.warning(f'{symbol} not shared, the workers read it themselves: {e}')
+                for path in (time_path, ohlcv_path):
+                    Path(path).unlink(missing_ok=True)
+                continue
+            shared.freq[symbol] = df.index.freqstr
+        log.info(f'Shared {len(shared.freq)}/{len(symbols)} symbols in {self.folder}')
+        return shared
+
+
+def load_shared_df(shared: SharedData, symbol: str) -> Optional[pd.DataFrame]:
+    '''
+    Worker side: zero-copy DataFrame over the parent's arrays (read-only), None if the symbol was not shared.
+    '''
+    if symbol not in shared.freq:
+        return None
+    time_path, ohlcv_path = _get_filepaths(shared.folder, symbol)
+    if not (Path(time_path).exists() and Path(ohlcv_path).exists()):
+        return None
+    index = pd.DatetimeIndex(np.load(time_path, mmap_mode='r').view('datetime64[ns]'),
+                             freq=shared.freq[symbol], name=COLUMNS_RAW[0])
+    return pd.DataFrame(np.load(ohlcv_path, mmap_mode='r'), index=index, columns=COLUMNS_RAW[1:], copy=False)
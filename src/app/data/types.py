@@ -1,13 +1,12 @@
 import pandas as pd
-from pydantic import BaseModel,ConfigDict
+from pydantic import BaseModel
 from dataclasses import dataclass
-from typing import Optional,List,Union,Dict
+from typing import Optional,List,Union,Dict,Tuple
 import numpy as np
-from enum import Enum
-from datetime import datetime
 
 COLUMNS_RAW=['Open Time', 'Open', 'High', 'Low', 'Close', 'Volume']
 COLUMNS_RESULT=['Total Trades','Win Rate [%]','Total Return [%]']#, 'Max Drawdown [%]','Profit Factor','Sharpe Ratio']
+STOP_LEVELS=['sl_stop','tp_stop','trail_stop','be_stop']
 
 metrics_info={'Start': 'start',
  'End': 'end',
@@ -46,59 +45,37 @@ class FormatDataReader:
     PARQUET='parquet'
 
 
-class Types(str, Enum):
-    NONE=0 #do none
-    BOTH=1 #do both
-    UPPER=2 #do upper
-    BOTTOM=3 #do bottom
-    ALL=4 # do all
-
-
-class DataRange(BaseModel):
-    start_time: datetime
-    end_time: datetime
-
-
-class DataCoverage(BaseModel):
-    model_config = ConfigDict(arbitrary_types_allowed=True)
-    time_start: datetime
-    time_end: datetime
-    data_start: Optional[pd.Timestamp]=None
-    data_end: Optional[pd.Timestamp]=None
-    type: Optional[Types]=None
-
-    no_overlap: List[DataRange]=[]
-
-
-    def _get_types(self):
-        if not self.data_start or not self.data_end:
-            self.type=Types.ALL
-            return
-
-
-        if self.time_start<self.data_start and self.data_end<self.time_end:
-            self.type=Types.BOTH
-            return
-        elif self.time_start>=self.data_start and self.data_end>=self.time_end:
-            self.type=Types.NONE
-            return
-        if self.time_start<self.data_start:
-            self.type=Types.BOTTOM
-            return
-        else:
-            self.type=Types.UPPER
-            return
-
-
-
-
-    def get_overlap(self) -> List[DataRange]:
-        self._get_types()
-        if self.type in [Types.BOTTOM,Types.BOTH]:
-            self.no_overlap.append(DataRange(start_time=self.time_start,end_time=self.data_start.to_pydatetime()))
-        if self.type in [Types.UPPER,Types.BOTH]:
-            self.no_overlap.append(DataRange(start_time=self.data_end.to_pydatetime(),end_time=self.time_end))
-        if self.type==Types.ALL:
-            self.no_overlap.append(DataRange(start_time=self.time_start,end_time=self.time_end))
-
-        return self.no_overlap
\ No newline at end of file
+class RawManifest(BaseModel):
+    '''Manifest of a symbol in the binary raw store, times are open times in ms'''
+    rows: int=0
+    first: Optional[int]=None
+    last: Optional[int]=None
+    step: Optional[int]=None # bar length in ms, None for calendar timeframes
+    gaps: List[Tuple[int,int]]=[] # [start, end) of missing bars
+
+
+class ResultManifest(BaseModel):
+    '''Committed part files of a symbol in the result store'''
+    parts: List[str]=[]
+    next_part: int=0
+    fingerprint: Optional[str]=None # param space the done runs refer to, None: to rebuild from the parts
+    done: List[List[int]]=[] # [start, stop) ordinal runs of the combinations in the committed parts
+
+
+class SharedData(BaseModel):
+    '''
+    Symbols loaded once by the parent as memory-mapped .npy files (see data/shared_data.py).
+    freq: symbol -> pandas freq of the index (None when it could not be inferred)
+    '''
+    folder: str
+    freq: Dict[str,Optional[str]]={}
+
+
+class KlineArchive(BaseModel):
+    '''One zipped CSV of data.binance.vision: <SYMBOL>-<interval>-<YYYY-MM>.zip (monthly) or -<YYYY-MM-DD>.zip (daily)'''
+    path: str
+    symbol: str
+    period: str # YYYY-MM or YYYY-MM-DD
+    start: int # first open time of the period in ms
+    end: int # last ms of the period, inclusive
+    daily: bool=False
@@ -1,2 +1,3 @@
 from .aroon import aroon_oscillator,zero_lag,get_sig_line,get_zlma_side
-from .standart import crossunder,crossover,ema
\ No newline at end of file
+from .standart import crossunder,crossover,ema
+from .standart import sma_batch,wma_batch,vwma_batch,ema_batch,highest_batch,lowest_batch
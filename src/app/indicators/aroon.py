@@ -1,12 +1,12 @@
 import numpy as np
 import pandas as pd
 from numba import njit
-import vectorbt as vbt
-from vectorbt.indicators.factory import IndicatorFactory
 
+from src.app.indicators.standart import rolling_extreme_idx
 
 
-@njit
+
+@njit(cache=True)
 def zero_lag(src:np.ndarray, length:int, gain_limit:int) -> np.ndarray:
     alpha = 2.0 / (length + 1)
     gain_factor = gain_limit / 10.0
@@ -24,25 +24,24 @@ def zero_lag(src:np.ndarray, length:int, gain_limit:int) -> np.ndarray:
     return ec
 
 
-@njit
+@njit(cache=True)
 def aroon_oscillator(high:np.ndarray, low:np.ndarray, length:int,smooth:int, gain_limit:int) -> np.ndarray:
     n=len(high)
     aroon_up = np.full_like(high,0)
     aroon_down = np.full_like(high,0)
+    high_idx = rolling_extreme_idx(high, length, True)
+    low_idx = rolling_extreme_idx(low, length, False)
 
-    for i in range(n):
-        if i < length - 1:
-            continue
-        high_idx = np.argmax(high[i - length + 1:i + 1])
-        low_idx = np.argmin(low[i - length + 1:i + 1])
-        aroon_up[i] = 100.0 * (high_idx + 1) / length
-        aroon_down[i] = 100.0 * (low_idx + 1) / length
+    for i in range(length - 1, n):
+        start = i - length + 1
+        aroon_up[i] = 100.0 * (high_idx[i] - start + 1) / length
+        aroon_down[i] = 100.0 * (low_idx[i] - start + 1) / length
 
     osc = aroon_up - aroon_down
     return zero_lag(osc, smooth, gain_limit)
 
 
-@njit
+@njit(cache=True)
 def get_sig_line(close:np.ndarray,aroon_osc:np.ndarray,sign_len:int) -> np.ndarray:
     n=len(close)
     sig_line = np.empty_like(close)
@@ -55,7 +54,7 @@ def get_sig_line(close:np.ndarray,aroon_osc:np.ndarray,sign_len:int) -> np.ndarr
     return sig_line
 
 
-@njit
+@njit(cache=True)
 def get_zlma_side(close:np.ndarray,zlma:np.ndarray) -> np.ndarray:
     zlma_side = np.full_like(close, False, dtype=np.bool_)
     for i in range(3,len(close)):
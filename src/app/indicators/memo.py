@@ -0,0 +1,175 @@
+from typing import NamedTuple, Tuple
+
+import numpy as np
+from numba import njit, types
+from numba.typed import Dict
+
+from src.app.indicators import standart
+
+MEMO_KEY = types.UniTuple(types.float64, 5)  # (function id, input id, param 1, param 2, param 3)
+
+# Input ids of the symbol's OHLCV; a series derived from them needs its own id >= INPUT_DERIVED
+INPUT_OPEN, INPUT_HIGH, INPUT_LOW, INPUT_CLOSE, INPUT_VOLUME = 0, 1, 2, 3, 4
+INPUT_DERIVED = 100
+
+# Function ids of the wrappers below; strategy specific computations use ids >= FUNC_CUSTOM
+FUNC_SMA, FUNC_EMA, FUNC_WMA, FUNC_RMA, FUNC_VWMA, FUNC_HIGHEST, FUNC_LOWEST, FUNC_ATR, FUNC_RSI = range(1, 10)
+FUNC_CUSTOM = 1000
+
+_USED, _BUDGET, _HITS, _MISSES, _FROZEN = range(5)
+
+
+class IndicatorMemo(NamedTuple):
+    '''
+    Per symbol LRU of indicator outputs, passed to strategies that declare a `memo: IndicatorMemo` argument.
+    store is a numba typed dict (insertion ordered: oldest first), state holds used/budget bytes and hit/miss counters.
+    Keys do not hash the input arrays: the engine makes a new memo for every symbol, so (function, input id, params)
+    is unique while it lives. Returned arrays are shared between combinations: read them, never write into them.
+    Frozen (memo_freeze) the memo is read only, lookups neither reorder nor count, misses are computed and not stored:
+    safe to share between the threads of a prange loop.
+    '''
+    store: Dict
+    state: np.ndarray
+
+    @property
+    def hits(self) -> int:
+        return int(self.state[_HITS])
+
+    @property
+    def misses(self) -> int:
+        return int(self.state[_MISSES])
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.state[_USED])
+
+
+def new_memo(budget_bytes: int) -> IndicatorMemo:
+    store = Dict.empty(key_type=MEMO_KEY, value_type=types.float64[:])
+    return IndicatorMemo(store, np.array([0, budget_bytes, 0, 0, 0], dtype=np.int64))
+
+
+@njit(cache=True)
+def memo_freeze(memo, frozen: bool):
+    memo.state[_FROZEN] = frozen
+
+
+@njit(cache=True)
+def memo_get(memo, key) -> Tuple[bool, np.ndarray]:
+    '''(True, value) and the entry becomes the most recent one, (False, empty) on a miss'''
+    if memo.state[_FROZEN]:
+        if key in memo.store:
+            return True, memo.store[key]
+        return False, np.empty(0)
+    if key in memo.store:
+        value = memo.store.pop(key)
+        memo.store[key] = value
+        memo.state[_HITS] += 1
+        return True, value
+    memo.state[_MISSES] += 1
+    return False, np.empty(0)
+
+
+@njit(cache=True)
+def memo_put(memo, key, value: np.ndarray):
+    '''Store value, evicting least recently used entries beyond the byte budget'''
+    if memo.state[_FROZEN] or value.nbytes > memo.state[_BUDGET]:
+        return
+    if key in memo.store:
+        memo.state[_USED] -= memo.store.pop(key).nbytes
+    memo.store[key] = value
+    memo.state[_USED] += value.nbytes
+    while memo.state[_USED] > memo.state[_BUDGET]:
+        for oldest in memo.store.keys():
+            break
+        memo.state[_USED] -= memo.store.pop(oldest).nbytes
+
+
+@njit(cache=True)
+def memo_sma(memo, src: np.ndarray, input_id: int, length: int) -> np.ndarray:
+    key = (float(FUNC_SMA), float(input_id), float(length), 0.0, 0.0)
+    found, value = memo_get(memo, key)
+    if not found:
+        value = standart.sma(src, length).astype(np.float64)
+        memo_put(memo, key, value)
+    return value
+
+
+@njit(cache=True)
+def memo_ema(memo, src: np.ndarray, input_id: int, length: int) -> np.ndarray:
+    key = (float(FUNC_EMA), float(input_id), float(length), 0.0, 0.0)
+    found, value = memo_get(memo, key)
+    if not found:
+        value = standart.ema(src, length).astype(np.float64)
+        memo_put(memo, key, value)
+    return value
+
+
+@njit(cache=True)
+def memo_wma(memo, src: np.ndarray, input_id: int, length: int) -> np.ndarray:
+    key = (float(FUNC_WMA), float(input_id), float(length), 0.0, 0.0)
+    found, value = memo_get(memo, key)
+    if not found:
+        value = standart.wma(src, length).astype(np.float64)
+        memo_put(memo, key, value)
+    return value
+
+
+@njit(cache=True)
+def memo_rma(memo, src: np.ndarray, input_id: int, length: int) -> np.ndarray:
+    key = (float(FUNC_RMA), float(input_id), float(length), 0.0, 0.0)
+    found, value = memo_get(memo, key)
+    if not found:
+        value = standart.rma(src, length).astype(np.float64)
+        memo_put(memo, key, value)
+    return value
+
+
+@njit(cache=True)
+def memo_vwma(memo, src: np.ndarray, volume: np.ndarray, input_id: int, length: int) -> np.ndarray:
+    key = (float(FUNC_VWMA), float(input_id), float(length), 0.0, 0.0)
+    found, value = memo_get(memo, key)
+    if not found:
+        value = standart.vwma(src, volume, length).astype(np.float64)
+        memo_put(memo, key, value)
+    return value
+
+
+@njit(cache=True)
+def memo_highest(memo, src: np.ndarray, input_id: int, length: int) -> np.ndarray:
+    key = (float(FUNC_HIGHEST), float(input_id), float(length), 0.0, 0.0)
+    found, value = memo_get(memo, key)
+    if not found:
+        value = standart.highest(src, length).astype(np.float64)
+        memo_put(memo, key, value)
+    return value
+
+
+@njit(cache=True)
+def memo_lowest(memo, src: np.ndarray, input_id: int, length: int) -> np.ndarray:
+    key = (float(FUNC_LOWEST), float(input_id), float(length), 0.0, 0.0)
+    found, value = memo_get(memo, key)
+    if not found:
+        value = standart.lowest(src, length).astype(np.float64)
+        memo_put(memo, key, value)
+    return value
+
+
+@njit(cache=True)
+def memo_atr(memo, high: np.ndarray, low: np.ndarray, close: np.ndarray, length: int) -> np.ndarray:
+    key = (float(FUNC_ATR), float(INPUT_CLOSE), float(length), 0.0, 0.0)
+    found, value = memo_get(memo, key)
+    if not found:
+        value = standart.atr(high, low, close, length).astype(np.float64)
+        memo_put(memo, key, value)
+    return value
+
+
+@njit(cache=True)
+def memo_rsi(memo, src: np.ndarray, input_id: int, length: int) -> np.ndarray:
+    key = (float(FUNC_RSI), float(input_id), float(length), 0.0, 0.0)
+    found, value = memo_get(memo, key)
+    if not found:
+        value = standart.rsi(src, length)
+        memo_put(memo, key, value)
+    return value
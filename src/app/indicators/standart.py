@@ -1,8 +1,8 @@
 import numpy as np
-from numba import njit
+from numba import njit, prange
 
 
-@njit
+@njit(cache=True)
 def ma_calc(src: np.ndarray, volume: np.ndarray, length: int, ma_type: str) -> np.ndarray:
     if ma_type == "SMA":
         return sma(src, length)
@@ -17,21 +17,51 @@ def ma_calc(src: np.ndarray, volume: np.ndarray, length: int, ma_type: str) -> n
     else:
         return ema(src, length)
 
-@njit
+@njit(cache=True)
+def _prefix_sum(src: np.ndarray) -> np.ndarray:
+    '''float64 running sum with a leading 0, NaN counted as 0: sum(src[a:b]) = out[b] - out[a]'''
+    out = np.zeros(len(src) + 1)
+    for i in range(len(src)):
+        out[i + 1] = out[i] + (src[i] if not np.isnan(src[i]) else 0.0)
+    return out
+
+@njit(cache=True)
+def _prefix_nan(src: np.ndarray) -> np.ndarray:
+    '''Running count of NaN: a window with NaN gives NaN, as np.sum/np.mean over it would'''
+    out = np.zeros(len(src) + 1, dtype=np.int64)
+    for i in range(len(src)):
+        out[i + 1] = out[i] + np.isnan(src[i])
+    return out
+
+@njit(cache=True)
+def _vwma_fill(result: np.ndarray, pv_sum: np.ndarray, v_sum: np.ndarray, nans: np.ndarray, length: int):
+    for i in range(length - 1, len(result)):
+        if nans[i + 1] - nans[i + 1 - length]:
+            result[i] = np.nan
+        else:
+            result[i] = (pv_sum[i + 1] - pv_sum[i + 1 - length]) / (v_sum[i + 1] - v_sum[i + 1 - length])
+
+@njit(cache=True)
 def vwma(src: np.ndarray, volume: np.ndarray, length: int) -> np.ndarray:
     result = np.empty_like(src)
-    for i in range(length - 1, len(src)):
-        pv = src[i - length + 1:i + 1] * volume[i - length + 1:i + 1]
-        result[i] = np.sum(pv) / np.sum(volume[i - length + 1:i + 1])
+    pv = src * volume
+    _vwma_fill(result, _prefix_sum(pv), _prefix_sum(volume), _prefix_nan(pv), length)
     return result
 
-@njit
+@njit(cache=True)
+def _sma_fill(result: np.ndarray, csum: np.ndarray, nans: np.ndarray, length: int):
+    for i in range(length - 1, len(result)):
+        if nans[i + 1] - nans[i + 1 - length]:
+            result[i] = np.nan
+        else:
+            result[i] = (csum[i + 1] - csum[i + 1 - length]) / length
+
+@njit(cache=True)
 def sma(src: np.ndarray, length: int) -> np.ndarray:
     result = np.full_like(src,np.inf)
-    for i in range(length - 1, len(src)):
-        result[i] = np.mean(src[i - length + 1:i + 1])
+    _sma_fill(result, _prefix_sum(src), _prefix_nan(src), length)
     return result
-@njit
+@njit(cache=True)
 def ema(src: np.ndarray, length: int) -> np.ndarray:
     n=len(src)
     result = np.empty_like(src)
@@ -43,18 +73,32 @@ def ema(src: np.ndarray, length: int) -> np.ndarray:
         result[i] = alpha * src[i] + (1.0 - alpha) * result[i - 1]
     return result
 
-@njit
+@njit(cache=True)
+def _wma_fill(result: np.ndarray, src: np.ndarray, csum: np.ndarray, nans: np.ndarray, length: int):
+    '''
+    Weighted sum of the window slides in O(1): every value loses one weight step,
+    the new bar enters with weight length: num[i] = num[i-1] + length*src[i] - sum(src[i-length:i])
+    '''
+    n = len(src)
+    if length > n:
+        return
+    weight_sum = length * (length + 1) / 2
+    num = 0.0
+    for k in range(length):
+        num += (k + 1) * (src[k] if not np.isnan(src[k]) else 0.0)
+    for i in range(length - 1, n):
+        if i >= length:
+            num += length * (src[i] if not np.isnan(src[i]) else 0.0) - (csum[i] - csum[i - length])
+        result[i] = num / weight_sum if nans[i + 1] == nans[i + 1 - length] else np.nan
+
+@njit(cache=True)
 def wma(src: np.ndarray, length: int) -> np.ndarray:
     result = np.empty_like(src)
-    weights = np.arange(1, length + 1)
-    weight_sum = np.sum(weights)
-    for i in range(length - 1, len(src)):
-        result[i] = np.sum(src[i - length + 1:i + 1] * weights) / weight_sum
+    _wma_fill(result, src, _prefix_sum(src), _prefix_nan(src), length)
     return result
 
 
-
-@njit
+@njit(cache=True)
 def rma(src: np.ndarray, length: int) -> np.ndarray:
     result = np.empty_like(src)
     alpha = 1.0 / length
@@ -63,7 +107,7 @@ def rma(src: np.ndarray, length: int) -> np.ndarray:
         result[i] = alpha * src[i] + (1 - alpha) * result[i - 1]
     return result
 
-@njit
+@njit(cache=True)
 def crossover(a: np.ndarray, b: np.ndarray) -> np.ndarray:
     n = len(a)
     out = np.full_like(a,False, dtype=np.bool_)
@@ -72,7 +116,7 @@ def crossover(a: np.ndarray, b: np.ndarray) -> np.ndarray:
             out[i] = True
     return out
 
-@njit
+@njit(cache=True)
 def crossunder(a: np.ndarray, b: np.ndarray) -> np.ndarray:
     n = len(a)
     out = np.full_like(a,False, dtype=np.bool_)
@@ -81,7 +125,7 @@ def crossunder(a: np.ndarray, b: np.ndarray) -> np.ndarray:
             out[i] = True
     return out
 
-@njit
+@njit(cache=True)
 def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, length: int) -> np.ndarray:
     tr_arr = np.empty_like(high)
     tr_arr[0] = high[0] - low[0]
@@ -95,24 +139,154 @@ def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, length: int) -> np
 
 
 
-@njit
+@njit(cache=True)
 def roc_calc(src: np.ndarray, length: int) -> np.ndarray:
     result = np.empty_like(src)
     for i in range(length, len(src)):
         result[i] = ((src[i] - src[i - length]) / src[i - length]) * 100
     return result
 
-@njit
+@njit(cache=True)
+def _dominates(new: float, old: float, is_max: bool) -> bool:
+    '''new makes old unreachable as the window extreme; NaN wins like in np.argmax/np.argmin, the earliest NaN first'''
+    if np.isnan(old):
+        return False
+    if np.isnan(new):
+        return True
+    return new > old if is_max else new < old
+
+@njit(cache=True)
+def rolling_extreme_idx(src: np.ndarray, length: int, is_max: bool) -> np.ndarray:
+    '''
+    Absolute index of np.argmax (is_max) / np.argmin over src[i-length+1:i+1] for every i >= length-1, -1 before.
+    Monotonic deque of candidate indices: each bar is pushed and popped once, O(n) for any length.
+    Ties keep the earliest bar, as argmax does.
+    '''
+    n = len(src)
+    out = np.full(n, -1, dtype=np.int64)
+    dq = np.empty(n, dtype=np.int64)
+    head = 0
+    tail = 0
+    for i in range(n):
+        while tail > head and _dominates(src[i], src[dq[tail - 1]], is_max):
+            tail -= 1
+        dq[tail] = i
+        tail += 1
+        if dq[head] <= i - length:
+            head += 1
+        if i >= length - 1:
+            out[i] = dq[head]
+    return out
+
+@njit(cache=True)
 def highest(src: np.ndarray, length: int) -> np.ndarray:
     result = np.empty_like(src)
+    idx = rolling_extreme_idx(src, length, True)
     for i in range(length - 1, len(src)):
-        result[i] = np.max(src[i - length + 1:i + 1])
+        result[i] = src[idx[i]]
     return result
 
 
-@njit
+@njit(cache=True)
 def lowest(src: np.ndarray, length: int) -> np.ndarray:
     result = np.empty_like(src)
+    idx = rolling_extreme_idx(src, length, False)
     for i in range(length - 1, len(src)):
-        result[i] = np.min(src[i - length + 1:i + 1])
-    return result
\ No newline at end of file
+        result[i] = src[idx[i]]
+    return result
+
+
+# Batch variants: one indicator for a vector of lengths, column j is the single-length result for lengths[j].
+# Shared work (prefix sums) is done once, lengths run in parallel.
+
+@njit(parallel=True,cache=True)
+def sma_batch(src: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    result = np.full((len(src), len(lengths)), np.inf, dtype=src.dtype)
+    csum = _prefix_sum(src)
+    nans = _prefix_nan(src)
+    for j in prange(len(lengths)):
+        _sma_fill(result[:, j], csum, nans, lengths[j])
+    return result
+
+@njit(parallel=True,cache=True)
+def wma_batch(src: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    result = np.empty((len(src), len(lengths)), dtype=src.dtype)
+    csum = _prefix_sum(src)
+    nans = _prefix_nan(src)
+    for j in prange(len(lengths)):
+        _wma_fill(result[:, j], src, csum, nans, lengths[j])
+    return result
+
+@njit(parallel=True,cache=True)
+def vwma_batch(src: np.ndarray, volume: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    result = np.empty((len(src), len(lengths)), dtype=src.dtype)
+    pv = src * volume
+    pv_sum = _prefix_sum(pv)
+    v_sum = _prefix_sum(volume)
+    nans = _prefix_nan(pv)
+    for j in prange(len(lengths)):
+        _vwma_fill(result[:, j], pv_sum, v_sum, nans, lengths[j])
+    return result
+
+@njit(cache=True)
+def ema_batch(src: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    '''One pass over the bars updating every length'''
+    n = len(src)
+    m = len(lengths)
+    result = np.empty((n, m), dtype=src.dtype)
+    if n == 0:
+        return result
+    alpha = 2.0 / (lengths.astype(np.float64) + 1)
+    state = np.full(m, src[0], dtype=src.dtype)  # same rounding as ema on float32 input
+    result[0, :] = state
+    for i in range(1, n):
+        for j in range(m):
+            state[j] = alpha[j] * src[i] + (1.0 - alpha[j]) * state[j]
+            result[i, j] = state[j]
+    return result
+
+@njit(parallel=True,cache=True)
+def highest_batch(src: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    result = np.empty((len(src), len(lengths)), dtype=src.dtype)
+    for j in prange(len(lengths)):
+        length = lengths[j]
+        idx = rolling_extreme_idx(src, length, True)
+        for i in range(length - 1, len(src)):
+            result[i, j] = src[idx[i]]
+    return result
+
+@njit(parallel=True,cache=True)
+def lowest_batch(src: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    result = np.empty((len(src), len(lengths)), dtype=src.dtype)
+    for j in prange(len(lengths)):
+        length = lengths[j]
+        idx = rolling_extreme_idx(src, length, False)
+        for i in range(length - 1, len(src)):
+            result[i, j] = src[idx[i]]
+    return result
+
+@njit(cache=True)
+def rsi(src: np.ndarray, length: int) -> np.ndarray:
+    '''Wilder RSI seeded with the mean of the first length gains/losses, 0 before that'''
+    n = len(src)
+    avg_gain = np.zeros(n)
+    avg_loss = np.zeros(n)
+    if n < length or length < 1:
+        return np.zeros(n)
+    gain_sum = 0.0
+    loss_sum = 0.0
+    for i in range(1, length):
+        delta = src[i] - src[i - 1]
+        gain_sum += max(delta, 0.0)
+        loss_sum += max(-delta, 0.0)
+    avg_gain[length - 1] = gain_sum / length
+    avg_loss[length - 1] = loss_sum / length
+    for i in range(length, n):
+        delta = src[i] - src[i - 1]
+        avg_gain[i] = (avg_gain[i - 1] * (length - 1) + max(delta, 0.0)) / length
+        avg_loss[i] = (avg_loss[i - 1] * (length - 1) + max(-delta, 0.0)) / length
+    result = np.empty(n)
+    for i in range(n):
+        rs = avg_gain[i] / (avg_loss[i] + 1e-8)
+        result[i] = 100 - 100 / (1 + rs)
+    return result
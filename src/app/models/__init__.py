@@ -4,4 +4,5 @@ from .strategy_config_scheme import ParamConfig
 from .types import (EntryExitResult,
                     TpSlComb,
                     BackTestResult,
-                    BackTestData)
\ No newline at end of file
+                    BackTestData,
+                    WorkUnit)
\ No newline at end of file
@@ -1,6 +1,6 @@
 import pandas as pd
-from pydantic import BaseModel, Field
-from typing import List, Dict,Tuple
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Dict,Tuple,Optional
 from datetime import datetime
 import yaml
 import numpy as np
@@ -27,27 +27,40 @@ class TpSlConfig(BaseModel):
     min: float
     max: float
     step: float
-    use_custom: bool
+
+    def get_values(self) -> np.ndarray:
+        return np.arange(self.min, self.max+self.step, self.step) if not self.use_fix else np.array([self.fix])
 
 class SizeConfig(BaseModel):
     use_fast: bool # use for vectorized
     use_only_tp_sl: bool # False for use exit with tp/sl
-    trailing: bool # True - use trailing
+    trailing: bool # True - add trailing stop axis from trail_pct (processor.engine: numba)
     tp_pct: TpSlConfig
     sl_pct: TpSlConfig
+    trail_pct: Optional[TpSlConfig]=None
+    break_even: bool=False # True - add break-even axis from be_pct (processor.engine: numba)
+    be_pct: Optional[TpSlConfig]=None
     amount: float
 
+    def use_custom_stops(self) -> bool:
+        return self.trailing or self.break_even
+
     def get_combinations(self) -> pd.MultiIndex:
         '''
-        Get combination Tp And Sl
-        :return:
+        Get combination Tp And Sl (+ trailing distance and break-even trigger when enabled)
+        :return: MultiIndex with levels sl_stop, tp_stop[, trail_stop][, be_stop], last level varies fastest
         '''
-        tp_stops = np.arange(self.tp_pct.min, self.tp_pct.max+self.tp_pct.step, self.tp_pct.step) if not self.tp_pct.use_fix else self.tp_pct.fix
-        sl_stops = np.arange(self.sl_pct.min, self.sl_pct.max+self.sl_pct.step, self.sl_pct.step) if not self.sl_pct.use_fix else self.sl_pct.fix
-        tp_grid, sl_grid = np.meshgrid(tp_stops, sl_stops)
-        tp_params = tp_grid.flatten()
-        sl_params = sl_grid.flatten()
-        param_index = pd.MultiIndex.from_arrays([sl_params, tp_params], names=['sl_stop', 'tp_stop'])
+        stops = [self.sl_pct.get_values(), self.tp_pct.get_values()]
+        names = ['sl_stop', 'tp_stop']
+        for enabled, config, name in [(self.trailing, self.trail_pct, 'trail_stop'),
+                                      (self.break_even, self.be_pct, 'be_stop')]:
+            if not enabled:
+                continue
+            if config is None:
+                raise ValueError(f'{name} is enabled but its range is not set in config')
+            stops.append(config.get_values())
+            names.append(name)
+        param_index = pd.MultiIndex.from_product(stops, names=names)
 
         return param_index
 
@@ -56,6 +69,10 @@ class TimeConfig(BaseModel):
     start_date: datetime
     end_date: datetime
     timeframe: str
+    base_timeframe: Optional[str] = None # e.g. 1m: only these bars are downloaded and stored, timeframe is resampled from them
+
+    def get_store_timeframe(self) -> str:
+        return self.base_timeframe or self.timeframe
 
 class ModeConfig(BaseModel):
     mode: str
@@ -76,6 +93,26 @@ class StrategyConfig(BaseModel):
 class ProcessorConfig(BaseModel):
     max_processors: int
     max_chunks: int
+    engine: str = 'vectorbt' # 'vectorbt' - full vbt.Portfolio, 'numba' - fused kernel, only result metrics
+    signals: str = 'vectorbt' # 'vectorbt' - IndicatorFactory.run, 'kernel' - one parallel compiled call into (n_bars, n_combos) matrices
+    memory_budget_mb: Optional[int] = None # RAM per worker for adaptive batches, 0 - share of available RAM, None - fixed max_chunks
+    memo_budget_mb: int = 256 # per worker LRU of indicator outputs for strategies with a memo argument, reset per symbol
+    telemetry: bool = False # per stage timings/RSS/bytes, report in data/telemetry and a summary table at the end of the run
+
+class DownloadConfig(BaseModel):
+    base_url: str = 'https://fapi.binance.com' # or a local stand-in: python -m benchmarks.exchange
+    max_symbols: int = 10 # symbols downloaded at once, their windows share the limits below
+    max_requests: int = 20 # kline requests in flight
+    weight_limit: int = 2000 # request weight per minute, Binance futures allow 2400: the rest is headroom for other clients
+    weight_window: float = 60.0 # seconds the weight limit is counted over, shorter only against a stand-in
+    limit: int = 499 # klines per request, 499 costs weight 2 - the most klines per unit of weight
+    retries: int = 5 # per request on 429/418/5xx/network errors
+    backoff: float = 1.0 # seconds before the first retry, doubled on every next one
+    archive_dir: str = 'data/archives' # zipped kline CSVs of data.binance.vision for the ingest command
+    archive_workers: int = 4 # processes parsing archives
+
+class AnalysisConfig(BaseModel):
+    min_trades: int = 0 # rows with fewer trades are skipped by the scan of the results
 
 class StockConfig(BaseModel):
     top: str #500,1000,5000
@@ -93,6 +130,15 @@ class MainConfig(BaseModel): #TODO: Поменять Strategy - на отдел
     strategy: StrategyConfig
     #tickers: TickersConfig
     processor: ProcessorConfig
+    download: DownloadConfig = DownloadConfig()
+    analysis: AnalysisConfig = AnalysisConfig()
+
+    @model_validator(mode='after')
+    def check_engine(self) -> 'MainConfig':
+        '''Rejected on load: in the backtest every worker would fail at start and leave no results'''
+        if self.strategy.size.use_custom_stops() and self.processor.engine!='numba':
+            raise ValueError('trailing/break_even stops are only supported with processor.engine: numba')
+        return self
 
     def __repr__(self):
         # Конвертируем в dict и выводим как YAML с отступами
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, RootModel
-from typing import Union, Dict
+from typing import Union, Dict, List
 
 class ParamRange(BaseModel):
     min: int
@@ -29,6 +29,7 @@ class ParamModeConfig(RootModel[Dict[str, ParamValue]]):
 
 class ParamSettings(BaseModel):
     flag_forbidden: bool
+    memo_params: List[str] = [] # params of memoized sub-computations, iterated slowest so a batch shares them
 
 class ParamConfig(BaseModel):
     multi: ParamModeConfig
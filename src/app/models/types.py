@@ -1,23 +1,48 @@
 import pandas as pd
 from pydantic import BaseModel,ConfigDict
-from typing import Optional,List,Union,TypeVar
+from typing import Optional,List,Union,Dict,Any
 import numpy as np
-import vectorbt as vbt
-
-PortfolioT = TypeVar('PortfolioT', bound=vbt.Portfolio)
 
 
 class EntryExitResult(BaseModel):
+    '''
+    Signals of one batch: DataFrames with param columns (IndicatorFactory) or
+    (n_bars, n_combos) matrices with the param values of every column in labels (level name -> array)
+    '''
     model_config = ConfigDict(arbitrary_types_allowed=True)
-    long_entries: pd.DataFrame
+    long_entries: Union[pd.DataFrame,np.ndarray]
     short_entries: Union[pd.DataFrame,np.ndarray,None]=None
     long_exits: Union[pd.DataFrame,np.ndarray,None]=None
     short_exits: Union[pd.DataFrame,np.ndarray,None]=None
+    labels: Optional[Dict[str,np.ndarray]]=None
+
+    def get_columns(self) -> pd.Index:
+        '''Param index of the signal columns, built only here for matrices'''
+        if isinstance(self.long_entries,pd.DataFrame):
+            return self.long_entries.columns
+        return pd.MultiIndex.from_arrays(list(self.labels.values()),names=list(self.labels))
+
+    def to_frames(self) -> 'EntryExitResult':
+        '''DataFrames with the param columns, for vbt.Portfolio'''
+        if isinstance(self.long_entries,pd.DataFrame):
+            return self
+        columns=self.get_columns()
+        frame=lambda values: pd.DataFrame(values,columns=columns) if values is not None else None
+        return EntryExitResult(long_entries=frame(self.long_entries),short_entries=frame(self.short_entries),
+                               long_exits=frame(self.long_exits),short_exits=frame(self.short_exits))
 
 
 class TpSlComb(BaseModel):
     tp: Union[float,List[float]]
     sl: Union[float,List[float]]
+    trail: Union[float,List[float],None]=None
+    be: Union[float,List[float],None]=None
+
+class WorkUnit(BaseModel):
+    '''Scheduler task: combo ordinals [start, stop) of one symbol'''
+    symbol: str
+    start: int
+    stop: int
 
 class TickerName(BaseModel): #TODO: Change to ticker/ TickerName
     model_config = ConfigDict(arbitrary_types_allowed=True)
@@ -29,4 +54,4 @@ class BackTestData(TickerName):
 
 class BackTestResult(TickerName):
     result: Optional[pd.DataFrame]=None
-    pf: Optional[PortfolioT] = None
\ No newline at end of file
+    pf: Optional[Any] = None # vbt.Portfolio, not imported here: models are loaded by download/analysis too
\ No newline at end of file
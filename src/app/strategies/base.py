@@ -1,10 +1,9 @@
 import numpy as np
-import vectorbt as vbt
 from numba import njit
 
 from .registry import register_indicator
 
-from src.app.indicators.standart import crossover,crossunder
+from src.app.indicators.memo import IndicatorMemo,INPUT_CLOSE,memo_ema,memo_sma,memo_rsi
 
 
 
@@ -20,7 +19,8 @@ def ohlc_indicator(open: np.ndarray,
                    rsi_buy: float = 30,
                    rsi_sell: float = 70,
                    flag_ema:bool=True,
-                   flag_sma:bool=False):
+                   flag_sma:bool=False,
+                   memo:IndicatorMemo=None):
     """
     OHLC Trading Indicator using RSI with EMA/SMA for buy/sell signal generation.
 
@@ -57,6 +57,10 @@ def ohlc_indicator(open: np.ndarray,
         flag_sma : bool, default=False
             Use Simple Moving Average for trend detection
 
+    memo : IndicatorMemo
+        Per symbol cache of indicator outputs (passed by the engine, not a parameter).
+        RSI and EMA/SMA depend only on their lengths, so a rsi_buy/rsi_sell sweep reuses them.
+
     Returns:
     --------
     tuple[np.ndarray, np.ndarray]
@@ -87,48 +91,31 @@ def ohlc_indicator(open: np.ndarray,
     - Function is compiled with @njit for high performance
     - Registered in indicator rфegistry as 'ohlc_indicator'
     - CRITICAL: Must always return (buy, sell) in this exact order
-    - Uses vectorbt library for technical indicator calculations
+    - Indicators come from src.app.indicators through the memo; no signals before the MA window is full
     """
 
-    n = len(close)
+    src = close[:, 0] if close.ndim == 2 else close
+    n = len(src)
 
     buy = np.zeros(n, dtype=np.bool_)
     sell = np.zeros(n, dtype=np.bool_)
 
-
-    # RSI
-    delta = np.diff(close, prepend=close[0])
-    gain = np.maximum(delta, 0)
-    loss = np.maximum(-delta, 0)
-    avg_gain = np.zeros(n)
-    avg_loss = np.zeros(n)
-    avg_gain[rsi_len-1] = np.mean(gain[:rsi_len])
-    avg_loss[rsi_len-1] = np.mean(loss[:rsi_len])
-
-    for i in range(rsi_len, n):
-        avg_gain[i] = (avg_gain[i-1]*(rsi_len-1) + gain[i]) / rsi_len
-        avg_loss[i] = (avg_loss[i-1]*(rsi_len-1) + loss[i]) / rsi_len
-
-    rsi = np.zeros(n)
-    for i in range(n):
-        rs = avg_gain[i] / (avg_loss[i] + 1e-8)
-        rsi[i] = 100 - 100/(1+rs)
+    rsi = memo_rsi(memo, src, INPUT_CLOSE, rsi_len)
 
     if flag_ema:
-        ema = vbt.IndicatorFactory.from_ta('EMAIndicator').run(close, ema_len).ema_indicator
-
-        for i in range(n):
-            if close[i] > ema[i] and rsi[i] < rsi_buy:
+        ema = memo_ema(memo, src, INPUT_CLOSE, ema_len)
+        for i in range(ema_len - 1, n):
+            if src[i] > ema[i] and rsi[i] < rsi_buy:
                 buy[i] = True
-            if close[i] < ema[i] and rsi[i] > rsi_sell:
+            if src[i] < ema[i] and rsi[i] > rsi_sell:
                 sell[i] = True
 
     if flag_sma:
-        sma=vbt.IndicatorFactory.from_ta('SMAIndicator').run(close, ema_len).sma_indicator
-        for i in range(n):
-            if close[i] > ema[i] and rsi[i] < rsi_buy:
+        sma = memo_sma(memo, src, INPUT_CLOSE, ema_len)
+        for i in range(ema_len - 1, n):
+            if src[i] > sma[i] and rsi[i] < rsi_buy:
                 buy[i] = True
-            if close[i] < ema[i] and rsi[i] > rsi_sell:
+            if src[i] < sma[i] and rsi[i] > rsi_sell:
                 sell[i] = True
 
-    return buy, sell
\ No newline at end of file
+    return buy, sell
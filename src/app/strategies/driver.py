@@ -0,0 +1,59 @@
+from typing import Callable, List
+
+import numpy as np
+from numba import njit, prange
+
+from src.app.indicators.memo import memo_freeze
+
+_DRIVER_SOURCE = '''
+def driver(buy, sell, {inputs}):
+    for j in prange(buy.shape[1]):
+        b, s = func({call})
+        _write_column(buy, j, b)
+        _write_column(sell, j, s)
+'''
+
+# warm columns run first, serially, and fill the memo; the others read it frozen in parallel
+_MEMO_DRIVER_SOURCE = '''
+def driver(buy, sell, {inputs}, memo, warm):
+    memo_freeze(memo, False)
+    for j in range(buy.shape[1]):
+        if warm[j]:
+            b, s = func({call})
+            _write_column(buy, j, b)
+            _write_column(sell, j, s)
+    memo_freeze(memo, True)
+    for j in prange(buy.shape[1]):
+        if not warm[j]:
+            b, s = func({call})
+            _write_column(buy, j, b)
+            _write_column(sell, j, s)
+    memo_freeze(memo, False)
+'''
+
+
+@njit(cache=True)
+def _write_column(out: np.ndarray, col: int, values: np.ndarray):
+    if values.ndim == 2:
+        out[:, col] = values[:, 0]
+    else:
+        out[:, col] = values
+
+
+def build_batch_driver(func: Callable, input_names: List[str], param_names: List[str], memo: bool) -> Callable:
+    '''
+    driver(buy, sell, *inputs, *params[, memo, warm]) fills preallocated (n_bars, n_combos) boolean matrices,
+    column j from the params at j. Inputs are 1D (IndicatorFactory passes (n_bars, 1), element access on those is
+    far slower), params are 1D arrays in signature order. Combinations run in prange. With a memo the columns
+    of the bool mask warm (one per distinct get_memo_params values) run serially first and fill it, the rest run
+    in prange on the frozen memo (see memo_freeze). Generated source has no file for the numba cache:
+    compiled once per process.
+    '''
+    call = [f'{arg}={arg}' for arg in input_names] + [f'{arg}={arg}[j]' for arg in param_names]
+    if memo:
+        call.append('memo=memo')
+    source = (_MEMO_DRIVER_SOURCE if memo else _DRIVER_SOURCE).format(inputs=', '.join(input_names + param_names),
+                                                                      call=', '.join(call))
+    namespace = {'func': func, '_write_column': _write_column, 'prange': prange, 'memo_freeze': memo_freeze}
+    exec(source, namespace)
+    return njit(parallel=True)(namespace['driver'])
@@ -0,0 +1,66 @@
+import ast
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+STRATEGIES_DIR = os.path.dirname(__file__)
+_SKIP = ('__init__.py', 'registry.py', 'manifest.py', 'driver.py')
+
+
+class StrategySpec(BaseModel):
+    '''What the CLI, configs and result readers need to know about a strategy, read from its source without importing it'''
+    name: str
+    module: str
+    input_names: List[str]
+    params: Dict[str, str]  # name -> annotation as written ('int', 'float', 'bool'), signature order
+    memo: bool = False
+
+
+def _registered_name(node: ast.FunctionDef) -> Optional[str]:
+    for decorator in node.decorator_list:
+        if not isinstance(decorator, ast.Call) or not decorator.args:
+            continue
+        func = decorator.func
+        func_name = func.id if isinstance(func, ast.Name) else getattr(func, 'attr', None)
+        arg = decorator.args[0]
+        if func_name == 'register_indicator' and isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+            return arg.value
+    return None
+
+
+def _parse_module(path: str, module: str) -> List[StrategySpec]:
+    with open(path) as f:
+        tree = ast.parse(f.read(), filename=path)
+    specs = []
+    for node in tree.body:
+        name = _registered_name(node) if isinstance(node, ast.FunctionDef) else None
+        if name is None:
+            continue
+        spec = StrategySpec(name=name, module=module, input_names=[], params={})
+        for arg in node.args.args:
+            annotation = ast.unparse(arg.annotation) if arg.annotation is not None else ''
+            if annotation.split('.')[-1] == 'ndarray':
+                spec.input_names.append(arg.arg)
+            elif annotation.split('.')[-1] == 'IndicatorMemo':
+                spec.memo = True
+            else:
+                spec.params[arg.arg] = annotation
+        specs.append(spec)
+    return specs
+
+
+@lru_cache(maxsize=1)
+def get_manifest() -> Dict[str, StrategySpec]:
+    '''
+    Strategy name -> spec for every @register_indicator function in src/app/strategies.
+    Built from the AST once per process: listing strategies or reading results does not import vectorbt or numba.
+    '''
+    manifest = {}
+    package = __name__.rsplit('.', 1)[0]
+    for filename in sorted(os.listdir(STRATEGIES_DIR)):
+        if filename.endswith('.py') and filename not in _SKIP:
+            for spec in _parse_module(os.path.join(STRATEGIES_DIR, filename), f'{package}.{filename[:-3]}'):
+                manifest[spec.name] = spec
+    return manifest
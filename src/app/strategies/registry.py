@@ -1,19 +1,26 @@
-from typing import Callable, Dict, Any,List
+from typing import Callable, Dict, Any,List,TYPE_CHECKING
+import importlib
 import inspect
 import numpy as np
-from vectorbt import IndicatorFactory
-from vectorbt.indicators.factory import IndicatorBase
 
+from src.app.strategies.manifest import get_manifest
+
+if TYPE_CHECKING:
+    from vectorbt.indicators.factory import IndicatorBase
 
 
 strategy_registry: Dict[str, Any] = {}
 _cached_indicators = {}
+_batch_drivers = {}
 
 
 def get_list_names(func:Callable,is_params:bool=False):
+    from src.app.indicators.memo import IndicatorMemo
     sig = inspect.signature(func)
     result=[]
     for name,params in sig.parameters.items():
+        if params.annotation is IndicatorMemo:
+            continue
         if params.annotation is np.ndarray and not is_params:
             result.append(name)
         elif (params.annotation is not np.ndarray) and is_params:
@@ -23,26 +30,62 @@ def get_list_names(func:Callable,is_params:bool=False):
 
 def register_indicator(name: str):
     def decorator(obj: Any):
+        if hasattr(obj, 'enable_caching'):  # numba dispatcher: keep compiled strategies in the on-disk cache
+            try:
+                obj.enable_caching()
+            except RuntimeError:  # no source file to key the cache on (REPL, exec)
+                pass
         strategy_registry[name] = obj
+        _cached_indicators.pop(name, None)
+        _batch_drivers.pop(name, None)
         return obj
     return decorator
 
 def get_indicator(name: str) -> Any:
+    '''Imports the strategy module on first use, strategies registered at runtime are found as is'''
+    if name not in strategy_registry and name in get_manifest():
+        importlib.import_module(get_manifest()[name].module)
     if name not in strategy_registry:
         raise ValueError(f"Indicator '{name}' not found.")
     return strategy_registry[name]
 
+def accepts_memo(name: str) -> bool:
+    '''Strategy declares a `memo: IndicatorMemo` argument'''
+    from src.app.indicators.memo import IndicatorMemo
+    func = get_indicator(name)
+    return any(param.annotation is IndicatorMemo for param in inspect.signature(func).parameters.values())
+
+def get_memo_keys(name: str) -> List[str]:
+    '''int and bool params: lengths and flags pick the memoized indicators, float thresholds do not'''
+    return [param for param, annotation in get_param_types(name).items() if annotation in ('int', 'bool')]
+
 def list_indicator() -> list[str]:
-    return list(strategy_registry.keys())
+    return list(dict.fromkeys([*get_manifest(), *strategy_registry]))
+
+def get_param_types(name: str) -> Dict[str, str]:
+    '''Param name -> annotation name in signature order, without importing the strategy when the manifest has it'''
+    if name not in strategy_registry and name in get_manifest():
+        return dict(get_manifest()[name].params)
+    func = get_indicator(name)
+    params = inspect.signature(func).parameters
+    return {param: getattr(params[param].annotation, '__name__', '') for param in get_list_names(func, True)}
 
+def get_param_names(name: str) -> List[str]:
+    return list(get_param_types(name))
 
-def get_strategy(name:str) -> type[IndicatorBase]:
+
+def get_strategy(name:str) -> 'type[IndicatorBase]':
+    '''IndicatorFactory class of the strategy, built once per process'''
+    if name in _cached_indicators:
+        return _cached_indicators[name]
+    from vectorbt import IndicatorFactory
     func=get_indicator(name)
     list_input_names=get_list_names(func,False)
     list_params_names=get_list_names(func,True)
 
     indicator=IndicatorFactory(
         class_name=name,
+        short_name=name, # column level prefix, the same as DataHandler.get_index_result_keys
         input_names=list_input_names,
         param_names=list_params_names,
         output_names=['buy', 'sell']
@@ -50,4 +93,14 @@ def get_strategy(name:str) -> type[IndicatorBase]:
 
     _cached_indicators[name] = indicator
 
-    return indicator
\ No newline at end of file
+    return indicator
+
+
+def get_batch_driver(name: str) -> Callable:
+    '''Compiled (n_bars, n_combos) signal driver of the strategy, see strategies.driver'''
+    if name not in _batch_drivers:
+        from src.app.strategies.driver import build_batch_driver
+        func = get_indicator(name)
+        _batch_drivers[name] = build_batch_driver(func, get_list_names(func, False), get_list_names(func, True),
+                                                  accepts_memo(name))
+    return _batch_drivers[name]
@@ -1,7 +1,6 @@
 import yaml
 from src.app.models.config_schema import MainConfig
 from src.app.models.strategy_config_scheme import ParamConfig
-from src.app.strategies import get_indicator
 from src.scripts.generate_configs import generate_yaml_template
 
 
@@ -19,8 +18,7 @@ def get_param_config(name:str) -> ParamConfig:
         with open(strategy_param_file, "r") as f:
             strategy_params_data = yaml.safe_load(f)
     except FileNotFoundError:
-        func=get_indicator(name)
-        strategy_param_data=generate_yaml_template(func,name)
+        strategy_params_data=yaml.safe_load(generate_yaml_template(name))
     strategy_config = ParamConfig(**strategy_params_data)
 
     return strategy_config
@@ -1,5 +1,24 @@
 from typing import List
 
+import numpy as np
+import pandas as pd
+
+
 def chunkify(lst:List, n:int) -> List[List[str]]:
     k, m = divmod(len(lst), n)
     return [lst[i*k + min(i, m):(i+1)*k + min(i+1, m)] for i in range(n) if lst[i*k + min(i, m):(i+1)*k + min(i+1, m)]]
+
+
+def product_multiindex(outer:pd.MultiIndex, inner:pd.MultiIndex) -> pd.MultiIndex:
+    '''
+    Cartesian product of two MultiIndexes (inner varies fastest), built from integer codes
+    instead of materializing tuples.
+    '''
+    n_outer, n_inner = len(outer), len(inner)
+    outer = outer if isinstance(outer, pd.MultiIndex) else pd.MultiIndex.from_arrays([outer])
+    inner = inner if isinstance(inner, pd.MultiIndex) else pd.MultiIndex.from_arrays([inner])
+    codes = [np.repeat(c, n_inner) for c in outer.codes] + [np.tile(c, n_outer) for c in inner.codes]
+    return pd.MultiIndex(levels=list(outer.levels) + list(inner.levels),
+                         codes=codes,
+                         names=list(outer.names) + list(inner.names),
+                         verify_integrity=False)
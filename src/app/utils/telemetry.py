@@ -0,0 +1,118 @@
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import psutil
+from rich.table import Table
+
+_DISABLED = nullcontext()
+
+STAGES = ['indicator', 'exits', 'tp_sl_expand', 'portfolio', 'stats', 'save']
+
+
+class Telemetry:
+    '''
+    Per worker timings of the backtest hot path: wall time, combinations, peak RSS and bytes written
+    per stage, plus one record per batch. Disabled, stage() returns a shared nullcontext and nothing is measured.
+    '''
+    def __init__(self, enabled: bool = False, pid: int = 0):
+        self.enabled = enabled
+        self.pid = pid
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.batches: List[Dict] = []
+        self._process = psutil.Process(os.getpid()) if enabled else None
+        self._start = time.perf_counter()
+
+    def _get_stage(self, name: str) -> Dict[str, float]:
+        if name not in self.stages:
+            self.stages[name] = {'calls': 0, 'seconds': 0.0, 'combos': 0, 'bytes': 0, 'peak_rss': 0}
+        return self.stages[name]
+
+    def _rss(self) -> int:
+        return self._process.memory_info().rss
+
+    def stage(self, name: str, combos: int = 0):
+        if not self.enabled:
+            return _DISABLED
+        return self._measure(name, combos)
+
+    @contextmanager
+    def _measure(self, name: str, combos: int):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stage = self._get_stage(name)
+            stage['calls'] += 1
+            stage['seconds'] += time.perf_counter() - start
+            stage['combos'] += combos
+            stage['peak_rss'] = max(stage['peak_rss'], self._rss())
+
+    def add_bytes(self, name: str, n_bytes: int):
+        if self.enabled:
+            self._get_stage(name)['bytes'] += n_bytes
+
+    def add_batch(self, symbol: str, combos: int, seconds: float):
+        if self.enabled:
+            self.batches.append({'symbol': symbol, 'combos': combos, 'seconds': seconds, 'rss': self._rss()})
+
+    def to_dict(self) -> Dict:
+        return {'pid': self.pid,
+                'seconds': time.perf_counter() - self._start,
+                'peak_rss': max((stage['peak_rss'] for stage in self.stages.values()), default=0),
+                'stages': self.stages,
+                'batches': self.batches}
+
+    def dump(self, folder: Optional[str]):
+        if not self.enabled or not folder:
+            return
+        Path(folder).mkdir(parents=True, exist_ok=True)
+        with open(Path(folder) / f'worker_{self.pid}.json', 'w') as f:
+            json.dump(self.to_dict(), f)
+
+
+def merge_reports(folder: str) -> Dict:
+    '''Join worker_<pid>.json of a run into report.json'''
+    workers = []
+    for path in sorted(Path(folder).glob('worker_*.json')):
+        with open(path) as f:
+            workers.append(json.load(f))
+    stages: Dict[str, Dict[str, float]] = {}
+    for worker in workers:
+        for name, values in worker['stages'].items():
+            stage = stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'combos': 0, 'bytes': 0, 'peak_rss': 0})
+            for key in ('calls', 'seconds', 'combos', 'bytes'):
+                stage[key] += values[key]
+            stage['peak_rss'] = max(stage['peak_rss'], values['peak_rss'])
+    for stage in stages.values():
+        stage['combos_per_sec'] = stage['combos'] / stage['seconds'] if stage['seconds'] else 0.0
+    combos = sum(batch['combos'] for worker in workers for batch in worker['batches'])
+    wall = max((worker['seconds'] for worker in workers), default=0.0)
+    report = {'workers': len(workers),
+              'wall_seconds': wall,
+              'combos': combos,
+              'combos_per_sec': combos / wall if wall else 0.0,
+              'peak_rss': max((worker['peak_rss'] for worker in workers), default=0),
+              'stages': stages,
+              'per_worker': workers}
+    with open(Path(folder) / 'report.json', 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def get_summary_table(report: Dict) -> Table:
+    table = Table(title=f"Telemetry: {report['combos']} combinations, {report['wall_seconds']:.1f}s, "
+                        f"{report['combos_per_sec']:.1f} comb/s, {report['workers']} workers")
+    for column in ('Stage', 'Calls', 'Time, s', 'Share', 'Comb/s', 'Peak RSS, MB', 'Written, MB'):
+        table.add_column(column, justify='right' if column != 'Stage' else 'left')
+    total = sum(stage['seconds'] for stage in report['stages'].values()) or 1.0
+    names = [name for name in STAGES if name in report['stages']] + [name for name in report['stages'] if name not in STAGES]
+    for name in names:
+        stage = report['stages'][name]
+        table.add_row(name, str(stage['calls']), f"{stage['seconds']:.2f}", f"{stage['seconds'] / total:.0%}",
+                      f"{stage['combos_per_sec']:.1f}", f"{stage['peak_rss'] / 1024 ** 2:.0f}",
+                      f"{stage['bytes'] / 1024 ** 2:.2f}")
+    return table
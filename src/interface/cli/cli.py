@@ -6,8 +6,8 @@ from rich.table import Table
 from src.app.models.config_schema import MainConfig
 from src.app.models.strategy_config_scheme import ParamConfig
 from src.app.utils.config_loader import get_main_config,get_param_config
-from src.interface.cli.live_updater import run_backtest_with_liveupdater
 from src.scripts.run_download import start_download
+from src.scripts.run_ingest import start_ingest
 from src.scripts.generate_configs import generate_all_template
 from src.scripts.run_analysis import start_analysis
 
@@ -29,6 +29,7 @@ def show_menu():
     table.add_column("Description", style="green")
     table.add_row("run", "Run backtest all params.")
     table.add_row("download", "Download data")
+    table.add_row("ingest", "Import Binance kline archives, then download the rest")
     table.add_row("analysis", "Run analysis")
     table.add_row("exit", "Exit from app.")
     console.print(table)
@@ -39,7 +40,10 @@ async def run_cli():
     while True:
         command = Prompt.ask("[bold yellow]Enter command[/]", default="run").strip().lower()
         config=get_main_config()
-        if command in ['run','download']:
+        if command == "ingest":
+            log.info(f"Importing kline archives from {config.download.archive_dir}...")
+            start_ingest(config)
+        if command in ['run','download','ingest']:
             text = '~5 min.' if config.strategy.symbols.use_all else '<1 min.'
             log.info(f"Downloading data. Please wait. Estimated time: {text}")
             await start_download(config)
@@ -51,9 +55,12 @@ async def run_cli():
                      f"Combinations: {total_comb}\n"
                      f"Total combination with TP/SL - {total_comb*total_comb_tp_sl}\n"
                      f"Used chunks {total_comb_tp_sl*config.processor.max_chunks}")
+            from src.interface.cli.live_updater import run_backtest_with_liveupdater # vectorbt/numba only for backtests
             run_backtest_with_liveupdater(config)
             log.info("Backtest completed ✅")
 
+        elif command in ("download", "ingest"):
+            pass
         elif command == "analysis":
             log.info("Starting analysis...")
             start_analysis(config)
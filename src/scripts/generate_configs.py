@@ -1,32 +1,25 @@
-import inspect
 import yaml
 
-from src.app.strategies.registry import strategy_registry
+from src.app.strategies.registry import get_param_types,list_indicator
 import os
 
-from typing import Callable
 
-
-def generate_yaml_template(func:Callable,func_name:str=''):
-    sig = inspect.signature(func)
+def generate_yaml_template(func_name:str):
     config = {"settings":{'flag_forbidden': False},
              "multi":{},
              "single":{}}
-    for name, param in sig.parameters.items():
-        if param.annotation is int:
+    for name, annotation in get_param_types(func_name).items():
+        if annotation == 'int':
             config['multi'][name] = {
                 "min": 10,
                 "max": 50,
                 "step": 1
             }
             config['single'][name]=10
-        elif param.annotation is bool:
+        elif annotation == 'bool':
             config['multi'][name] = False
             config['single'][name]=False
 
-    if func_name=='':
-        func_name=((func.__name__.split('_'))[1])
-
     with open(f'config/{func_name}_strategy_config.yaml', "w") as f:
         yaml.dump(config, f, sort_keys=False, allow_unicode=True)
     return yaml.dump(config)
@@ -34,9 +27,9 @@ def generate_yaml_template(func:Callable,func_name:str=''):
 
 
 def generate_all_template():
-    for name,func in strategy_registry.items():
+    for name in list_indicator():
         if not os.path.exists(f'config/{name}_strategy_config.yaml'):
-            generate_yaml_template(func,name)
+            generate_yaml_template(name)
 
 
 if __name__=='__main__':
@@ -0,0 +1,15 @@
+from src.common.loggers import get_logger
+from src.app.models import MainConfig
+from src.app.data.csv_handler import DataHandler
+from src.app.utils.config_loader import get_main_config
+
+log=get_logger('raw_store',True)
+
+
+def migrate_raw_data(config:MainConfig):
+    migrated=DataHandler(config).migrate_raw_csv()
+    log.info(f'Migrated {migrated} CSV files of {config.strategy.time.get_store_timeframe()} to the binary raw store')
+
+
+if __name__ == '__main__':
+    migrate_raw_data(get_main_config())
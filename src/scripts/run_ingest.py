@@ -0,0 +1,20 @@
+from pathlib import Path
+
+from src.common.loggers import get_logger
+from src.app.models.config_schema import MainConfig
+from src.app.data.archives import ArchiveIngestor
+from src.app.utils.config_loader import get_main_config
+
+log=get_logger('archives',True)
+
+
+def start_ingest(config:MainConfig) -> int:
+    folder=Path(config.download.archive_dir)
+    if not folder.is_dir():
+        log.warning(f'No archive folder {folder}, nothing to ingest')
+        return 0
+    return ArchiveIngestor(config).ingest(folder)
+
+
+if __name__ == '__main__':
+    start_ingest(get_main_config())